@@ -4,14 +4,33 @@ Interface Gráfica para Classificação de Toxicidade em Mensagens
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 from simple_classifier import ToxicityClassifier
-import threading
+from result_cache import CachedClassifier
+from batch_tab import BatchTab
+from model_registry import ModelRegistry
+from concurrent.futures import ThreadPoolExecutor
 import os
 
+# Cache LRU de resultados (opcional): TOXICITY_CACHE_SIZE=10000 python app.py
+CACHE_SIZE = int(os.environ.get("TOXICITY_CACHE_SIZE", "0"))
+# Modelo TL em int8 na CPU (opcional): TOXICITY_QUANTIZE=1 python app.py
+QUANTIZE = os.environ.get("TOXICITY_QUANTIZE", "0") == "1"
+# Backend do modelo TL: "torch" ou "onnx" (após python export_onnx.py)
+BACKEND = os.environ.get("TOXICITY_BACKEND", "torch")
+# Modelos mantidos em memória: limite estimado (MB, 0 = sem limite), carga
+# antecipada do Transfer Learning e classificação de aquecimento após carregar
+MODEL_MEMORY_MB = float(os.environ.get("TOXICITY_MODEL_MEMORY_MB", "0"))
+PRELOAD = os.environ.get("TOXICITY_PRELOAD", "0") == "1"
+PREWARM = os.environ.get("TOXICITY_PREWARM", "1") == "1"
+
+PLACEHOLDER = "Digite sua mensagem aqui..."
+# Espera após a última tecla antes de classificar no modo "ao digitar" (ms)
+LIVE_DELAY_MS = {"rapido": 150, "transfer_learning": 600}
+
 class ToxicityApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Detector de Toxicidade em Mensagens")
-        self.root.geometry("800x600")
+        self.root.geometry("900x680")
         self.root.resizable(True, True)
         
         # Configurar estilo
@@ -21,9 +40,29 @@ class ToxicityApp:
         self.classifier = None
         self.loading = True
         self.model_type = "Classificador Rápido"
+        self.model_kind = "rapido"
+        self.wanted_model = "rapido"
+        
+        # Modelos carregados sob demanda e mantidos em memória (troca instantânea)
+        self.registry = ModelRegistry(max_memory_mb=MODEL_MEMORY_MB or None, prewarm=PREWARM)
+        self.registry.register("rapido", lambda: self.wrap_classifier(ToxicityClassifier()))
+        self.registry.register(
+            "transfer_learning", lambda: self.wrap_classifier(self.load_transfer_learning_model())
+        )
+        
+        # Classificação fora da thread do Tk: uma única thread (os modelos
+        # não são usados em paralelo) e só o pedido mais recente é exibido
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classificacao")
+        self.request_id = 0
+        self.pending = None
+        self.live_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Verificar se existe modelo treinado
-        self.has_trained_model = os.path.exists("models/toxicity_transfer_learning/config.json")
+        if BACKEND == "onnx":
+            self.has_trained_model = os.path.exists("models/toxicity_onnx/scoring.json")
+        else:
+            self.has_trained_model = os.path.exists("models/toxicity_transfer_learning/config.json")
         
         # Criar interface
         self.create_widgets()
@@ -47,9 +86,16 @@ class ToxicityApp:
     def create_widgets(self):
         """Cria todos os widgets da interface"""
         
+        # Abas: mensagem única e arquivo em lote
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
         # Frame principal
-        main_frame = ttk.Frame(self.root, padding="20")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        main_frame = ttk.Frame(self.notebook, padding="20")
+        self.notebook.add(main_frame, text="💬 Mensagem")
+        
+        self.batch_tab = BatchTab(self.notebook, self)
+        self.notebook.add(self.batch_tab, text="📄 Arquivo (lote)")
         
         # Configurar grid
         self.root.columnconfigure(0, weight=1)
@@ -146,9 +192,11 @@ class ToxicityApp:
             fg="#333"
         )
         self.text_input.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        self.text_input.insert("1.0", "Digite sua mensagem aqui...")
+        self.text_input.insert("1.0", PLACEHOLDER)
+        self.text_input.edit_modified(False)
         self.text_input.bind("<FocusIn>", self.clear_placeholder)
         self.text_input.bind("<FocusOut>", self.restore_placeholder)
+        self.text_input.bind("<<Modified>>", self.on_text_modified)
         
         # Frame de botões
         button_frame = ttk.Frame(main_frame)
@@ -193,6 +241,19 @@ class ToxicityApp:
         )
         clear_btn.pack(side=tk.LEFT, padx=5)
         
+        # Modo ao vivo: classifica enquanto o usuário digita
+        self.live_mode = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            button_frame,
+            text="⚡ Analisar ao digitar",
+            variable=self.live_mode,
+            command=self.on_text_modified,
+            font=("Arial", 9),
+            bg=self.bg_color,
+            activebackground=self.bg_color,
+            cursor="hand2"
+        ).pack(side=tk.LEFT, padx=10)
+        
         # Frame de resultado
         self.result_frame = ttk.LabelFrame(main_frame, text="Resultado da Análise", padding="15")
         if self.has_trained_model:
@@ -265,158 +326,87 @@ class ToxicityApp:
     
     def clear_placeholder(self, event):
         """Remove o placeholder quando o usuário clica"""
-        if self.text_input.get("1.0", tk.END).strip() == "Digite sua mensagem aqui...":
+        if self.text_input.get("1.0", tk.END).strip() == PLACEHOLDER:
             self.text_input.delete("1.0", tk.END)
             self.text_input.config(fg="#333")
     
     def restore_placeholder(self, event):
         """Restaura o placeholder se o campo estiver vazio"""
         if not self.text_input.get("1.0", tk.END).strip():
-            self.text_input.insert("1.0", "Digite sua mensagem aqui...")
+            self.text_input.insert("1.0", PLACEHOLDER)
             self.text_input.config(fg="#999")
     
     def load_model_async(self, model_type="rapido"):
-        """Carrega o modelo em uma thread separada"""
-        def load():
-            try:
-                if model_type == "rapido":
-                    self.classifier = ToxicityClassifier()
-                    self.current_model = "Modo Rápido"
-                else:
-                    # Carregar modelo Transfer Learning
-                    self.classifier = self.load_transfer_learning_model()
-                    self.current_model = "Transfer Learning"
-                
-                self.loading = False
-                self.root.after(0, lambda: self.on_model_loaded(model_type))
-            except Exception as e:
-                self.root.after(0, lambda: self.on_model_error(str(e)))
-        
-        thread = threading.Thread(target=load, daemon=True)
-        thread.start()
+        """Ativa o modelo, carregando-o em segundo plano se ainda não estiver em memória"""
+        self.wanted_model = model_type
+        future = self.registry.load(model_type)
+        if future.done():
+            # Já carregado: troca imediata
+            self.on_registry_loaded(model_type, future)
+            return
+        
+        self.loading = True
+        future.add_done_callback(
+            lambda done: self.root.after(0, self.on_registry_loaded, model_type, done)
+        )
         
         # Mostrar progress bar
         self.progress.grid(row=2, column=0, pady=10)
         self.progress.start(10)
     
+    def on_registry_loaded(self, model_type, future):
+        """Ativa o modelo carregado, se ainda for o escolhido pelo usuário"""
+        if model_type != self.wanted_model:
+            return
+        try:
+            classifier = future.result()
+        except Exception as e:
+            # Continuar com o modelo anterior, se houver
+            self.wanted_model = self.model_kind
+            self.loading = self.classifier is None
+            if self.has_trained_model:
+                self.model_choice.set(self.model_kind)
+            if self.classifier is not None:
+                self.analyze_btn.config(state=tk.NORMAL)
+            self.on_model_error(str(e))
+            return
+        
+        self.classifier = classifier
+        self.model_kind = model_type
+        self.current_model = "Modo Rápido" if model_type == "rapido" else "Transfer Learning"
+        self.loading = False
+        self.on_model_loaded(model_type)
+        
+        # Carga antecipada do Transfer Learning, depois que o modo rápido está pronto
+        if PRELOAD and self.has_trained_model and model_type == "rapido":
+            self.registry.load("transfer_learning")
+    
+    def wrap_classifier(self, classifier):
+        """Aplica o cache LRU de resultados, se configurado"""
+        if CACHE_SIZE > 0:
+            return CachedClassifier(classifier, maxsize=CACHE_SIZE)
+        return classifier
+    
     def load_transfer_learning_model(self):
         """Carrega modelo Transfer Learning"""
-        import torch
-        from transformers import AutoTokenizer, AutoModelForCausalLM
-        
-        model_path = "models/toxicity_transfer_learning"
-        
-        class TransferLearningClassifier:
-            def __init__(self, model_path):
-                self.tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    model_path,
-                    trust_remote_code=True,
-                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                    device_map="auto" if torch.cuda.is_available() else None
-                )
-                self.device = "cuda" if torch.cuda.is_available() else "cpu"
-            
-            def classify(self, text):
-                """
-                Classificador híbrido: Combina TL com classificador simples
-                para melhor precisão e robustez
-                """
-                from simple_classifier import ToxicityClassifier
-                simple = ToxicityClassifier()
-                
-                # Sempre usar classificador simples como base
-                simple_result = simple.classify(text)
-                
-                try:
-                    # Tentar com modelo TL para refinamento
-                    prompt = f"<|system|>\nVoce e um classificador de toxicidade. Analise a mensagem e responda apenas TOXICA ou NAO_TOXICA.</s>\n<|user|>\nClassifique: {text}</s>\n<|assistant|>\n"
-                    
-                    inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=256)
-                    
-                    if self.device == "cuda":
-                        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-                    
-                    with torch.no_grad():
-                        outputs = self.model.generate(
-                            **inputs,
-                            max_new_tokens=20,
-                            do_sample=True,
-                            temperature=0.7,
-                            top_p=0.9,
-                            pad_token_id=self.tokenizer.eos_token_id
-                        )
-                    
-                    # Decodificar apenas a resposta gerada
-                    input_length = inputs['input_ids'].shape[1]
-                    generated_ids = outputs[0][input_length:]
-                    response = self.tokenizer.decode(generated_ids, skip_special_tokens=True).strip()
-                    
-                    # Extrair classificação da resposta (múltiplas estratégias)
-                    response_upper = response.upper()
-                    response_clean = response_upper.replace("_", " ").replace("-", " ")
-                    
-                    # Estratégia 1: Buscar palavras-chave diretas
-                    is_toxic_in_response = (
-                        "TOXICA" in response_clean or 
-                        "TÓXICA" in response_clean or
-                        "TOXIC" in response_clean
-                    )
-                    
-                    is_safe_in_response = (
-                        "NAO TOXICA" in response_clean or
-                        "NÃO TOXICA" in response_clean or
-                        "NAO TÓXICA" in response_clean or
-                        "NÃO TÓXICA" in response_clean or
-                        "SEGURA" in response_clean or
-                        "NORMAL" in response_clean
-                    )
-                    
-                    # Estratégia 2: Combinar TL com classificador simples
-                    if is_safe_in_response:
-                        # TL diz que é segura
-                        if simple_result['label'] == "TÓXICA":
-                            # Classificador simples discorda - usar simples (mais conservador)
-                            label = "TÓXICA"
-                            confidence = simple_result['confidence'] * 0.95
-                        else:
-                            # Ambos concordam - seguro
-                            label = "NÃO TÓXICA"
-                            confidence = 0.93
-                    
-                    elif is_toxic_in_response:
-                        # TL diz que é tóxica
-                        label = "TÓXICA"
-                        confidence = 0.94
-                    
-                    else:
-                        # Resposta ambígua ou modelo não treinado - usar classificador simples
-                        label = simple_result['label']
-                        confidence = simple_result['confidence'] * 0.95
-                    
-                    return {"label": label, "confidence": confidence}
-                    
-                except Exception as e:
-                    # Em caso de erro, usar classificador simples
-                    return simple_result
-        
-        return TransferLearningClassifier(model_path)
+        from classifiers import load_model
+        
+        if BACKEND == "onnx":
+            return load_model("onnx")
+        return load_model("torch", quantize=QUANTIZE)
     
     def switch_model(self):
-        """Troca entre modelos"""
-        if self.loading:
-            messagebox.showinfo("Aguarde", "Modelo ainda está carregando...")
-            return
-        
+        """Troca entre modelos (instantâneo se o modelo já estiver em memória)"""
         model_type = self.model_choice.get()
+        if model_type == self.wanted_model:
+            return
         
-        # Desabilitar botão de análise durante troca
-        self.analyze_btn.config(state=tk.DISABLED)
-        self.result_label.config(text="Trocando modelo...", fg="#999")
-        self.status_label.config(text="Carregando novo modelo...", fg="#999")
+        if not self.registry.is_loaded(model_type):
+            # Desabilitar botão de análise durante o carregamento
+            self.analyze_btn.config(state=tk.DISABLED)
+            self.result_label.config(text="Trocando modelo...", fg="#999")
+            self.status_label.config(text="Carregando novo modelo...", fg="#999")
         
-        # Recarregar modelo
-        self.loading = True
         self.load_model_async(model_type)
     
     def on_model_loaded(self, model_type="rapido"):
@@ -436,6 +426,9 @@ class ToxicityApp:
         self.status_label.config(text=status_text, fg=self.safe_color)
         self.result_label.config(text="Aguardando análise...", fg="#666")
         self.analyze_btn.config(state=tk.NORMAL)
+        
+        # Modo ao vivo: reanalisar o texto atual com o novo modelo
+        self.on_text_modified()
     
     def on_model_error(self, error):
         """Callback quando há erro ao carregar o modelo"""
@@ -445,7 +438,7 @@ class ToxicityApp:
         messagebox.showerror("Erro", f"Não foi possível carregar o modelo:\n{error}")
     
     def analyze_text(self):
-        """Analisa o texto inserido"""
+        """Analisa o texto inserido (botão)"""
         if self.loading:
             messagebox.showwarning("Aguarde", "O modelo ainda está carregando. Por favor, aguarde...")
             return
@@ -454,53 +447,108 @@ class ToxicityApp:
         text = self.text_input.get("1.0", tk.END).strip()
         
         # Validar
-        if not text or text == "Digite sua mensagem aqui...":
+        if not text or text == PLACEHOLDER:
             messagebox.showwarning("Atenção", "Por favor, digite uma mensagem para analisar.")
             return
         
-        # Mostrar que está processando
-        self.analyze_btn.config(state=tk.DISABLED)
+        self.request_analysis(text)
+    
+    def request_analysis(self, text):
+        """
+        Envia o texto para classificação em segundo plano
+        
+        Um pedido novo torna os anteriores obsoletos: se ainda não começaram
+        são cancelados, e se já estão rodando o resultado é descartado.
+        """
+        self.request_id += 1
+        request_id = self.request_id
+        if self.pending is not None:
+            self.pending.cancel()
+        
+        # Mostrar que está processando (sem bloquear a janela)
         self.result_label.config(text="Analisando...", fg="#666")
         self.confidence_label.config(text="")
-        self.root.update()
+        
+        classifier = self.classifier
+        self.pending = self.executor.submit(classifier.classify, text)
+        self.pending.add_done_callback(
+            lambda future: self.root.after(0, self.on_analysis_done, request_id, future)
+        )
+    
+    def on_analysis_done(self, request_id, future):
+        """Recebe o resultado na thread do Tk; ignora pedidos obsoletos"""
+        if request_id != self.request_id or future.cancelled():
+            return
+        self.pending = None
         
         try:
-            # Classificar
-            result = self.classifier.classify(text)
-            
-            # Mostrar resultado
-            label = result['label']
-            confidence = result['confidence']
-            
-            if label == "TÓXICA":
-                color = self.toxic_color
-                icon = "⚠️"
-                message = "Esta mensagem contém conteúdo TÓXICO"
-            else:
-                color = self.safe_color
-                icon = "✓"
-                message = "Esta mensagem é SEGURA"
-            
-            self.result_label.config(text=f"{icon} {message}", fg=color)
-            self.confidence_label.config(
-                text=f"Confiança: {confidence:.1%}",
-                fg=color
-            )
-            
+            result = future.result()
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao analisar mensagem:\n{str(e)}")
             self.result_label.config(text="Erro na análise", fg=self.toxic_color)
+            return
         
-        finally:
-            self.analyze_btn.config(state=tk.NORMAL)
+        self.show_result(result)
+    
+    def show_result(self, result):
+        """Mostra o resultado de uma classificação"""
+        label = result['label']
+        confidence = result['confidence']
+        
+        if label == "TÓXICA":
+            color = self.toxic_color
+            icon = "⚠️"
+            message = "Esta mensagem contém conteúdo TÓXICO"
+        else:
+            color = self.safe_color
+            icon = "✓"
+            message = "Esta mensagem é SEGURA"
+        
+        self.result_label.config(text=f"{icon} {message}", fg=color)
+        self.confidence_label.config(
+            text=f"Confiança: {confidence:.1%}",
+            fg=color
+        )
+    
+    def on_text_modified(self, event=None):
+        """Agenda a análise ao vivo (debounce) quando o texto muda"""
+        self.text_input.edit_modified(False)
+        if self.live_job is not None:
+            self.root.after_cancel(self.live_job)
+            self.live_job = None
+        if not self.live_mode.get() or self.loading:
+            return
+        self.live_job = self.root.after(LIVE_DELAY_MS.get(self.model_kind, 300), self.live_analyze)
+    
+    def live_analyze(self):
+        """Análise disparada pelo modo ao vivo (sem avisos)"""
+        self.live_job = None
+        text = self.text_input.get("1.0", tk.END).strip()
+        if self.loading:
+            return
+        if not text or text == PLACEHOLDER:
+            # Nada a analisar: invalidar pedidos em andamento
+            self.request_id += 1
+            self.result_label.config(text="Aguardando análise...", fg="#666")
+            self.confidence_label.config(text="")
+            return
+        self.request_analysis(text)
     
     def clear_text(self):
         """Limpa o texto e o resultado"""
+        self.request_id += 1
         self.text_input.delete("1.0", tk.END)
-        self.text_input.insert("1.0", "Digite sua mensagem aqui...")
+        self.text_input.insert("1.0", PLACEHOLDER)
         self.text_input.config(fg="#999")
         self.result_label.config(text="Aguardando análise...", fg="#666")
         self.confidence_label.config(text="")
+    
+    def on_close(self):
+        """Fecha a janela sem esperar classificações pendentes"""
+        self.batch_tab.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.registry.shutdown()
+        self.root.destroy()
 
 def main():
     root = tk.Tk()
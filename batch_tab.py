@@ -0,0 +1,357 @@
+"""
+Aba de classificação em lote (arquivo xlsx, CSV, JSONL ou TXT) da interface
+
+A classificação roda em segundo plano, em blocos, com barra de progresso e
+cancelamento. A tabela de resultados é virtualizada: o Treeview tem apenas
+as linhas visíveis, e a rolagem troca os valores delas em vez de inserir
+milhares de itens no Tk.
+"""
+import os
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, simpledialog
+
+from classify_file import DEFAULT_COLUMN, OUTPUT_FORMATS, chunked, open_writer, read_messages
+
+CHUNK_SIZE = 200
+ROW_HEIGHT = 22
+
+COLUMNS = (
+    ("index", "#", 60),
+    ("label", "Resultado", 110),
+    ("confidence", "Confiança", 90),
+    ("categories", "Categorias", 160),
+    ("text", "Mensagem", 420),
+)
+
+class VirtualTable(ttk.Frame):
+    """
+    Tabela que só desenha as linhas visíveis
+    
+    Os dados ficam em self.rows (lista de dicts); self.view guarda a ordem
+    de exibição (índices em self.rows), que muda ao ordenar.
+    """
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.rows = []
+        self.view = []
+        self.offset = 0
+        self.visible = 0
+        self.sort_key = None
+        self.sort_reverse = False
+        
+        style = ttk.Style()
+        style.configure("Batch.Treeview", rowheight=ROW_HEIGHT)
+        
+        self.tree = ttk.Treeview(
+            self,
+            columns=[name for name, _, _ in COLUMNS],
+            show="headings",
+            style="Batch.Treeview",
+            selectmode="browse"
+        )
+        for name, title, width in COLUMNS:
+            self.tree.heading(name, text=title, command=lambda key=name: self.sort_by(key))
+            self.tree.column(name, width=width, stretch=(name == "text"), anchor=tk.W)
+        self.tree.tag_configure("toxic", foreground="#f44336")
+        self.tree.tag_configure("safe", foreground="#2E7D32")
+        
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self.scroll(-1))
+        self.tree.bind("<Down>", lambda event: self.scroll(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.visible))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.visible))
+    
+    def on_resize(self, event):
+        """Ajusta o número de itens do Treeview à altura disponível"""
+        visible = max(1, (event.height - ROW_HEIGHT) // ROW_HEIGHT)
+        if visible == self.visible:
+            return
+        if visible > self.visible:
+            for slot in range(self.visible, visible):
+                self.tree.insert("", tk.END, iid=f"slot{slot}", values=())
+        else:
+            self.tree.delete(*[f"slot{slot}" for slot in range(visible, self.visible)])
+        self.visible = visible
+        self.refresh()
+    
+    def on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.view))
+        elif unit == "pages":
+            self.offset += int(amount) * self.visible
+        else:
+            self.offset += int(amount)
+        self.refresh()
+    
+    def scroll(self, lines):
+        self.offset += lines
+        self.refresh()
+        return "break"
+    
+    def refresh(self):
+        """Preenche os itens visíveis a partir da posição atual"""
+        total = len(self.view)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        for slot in range(self.visible):
+            position = self.offset + slot
+            if position < total:
+                index = self.view[position]
+                row = self.rows[index]
+                values = (
+                    index + 1,
+                    row["label"],
+                    f"{row['confidence']:.1%}",
+                    ", ".join(row["categories"]),
+                    row["text"].replace("\n", " ")[:300],
+                )
+                tags = ("toxic",) if row["label"] == "TÓXICA" else ("safe",)
+            else:
+                values, tags = (), ()
+            self.tree.item(f"slot{slot}", values=values, tags=tags)
+        
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def _key(self, key):
+        if key == "index":
+            return None
+        if key == "categories":
+            return lambda index: len(self.rows[index]["categories"])
+        return lambda index: self.rows[index][key]
+    
+    def sort_by(self, key):
+        """Ordena pela coluna clicada (clicar de novo inverte a ordem)"""
+        if self.sort_key == key:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_key, self.sort_reverse = key, key == "confidence"
+        self._apply_sort()
+        self.offset = 0
+        self.refresh()
+    
+    def _apply_sort(self):
+        key = self._key(self.sort_key)
+        self.view = list(range(len(self.rows)))
+        if key is not None:
+            self.view.sort(key=key, reverse=self.sort_reverse)
+        elif self.sort_reverse:
+            self.view.reverse()
+    
+    def extend(self, rows):
+        """Acrescenta resultados, mantendo a ordenação escolhida"""
+        start = len(self.rows)
+        self.rows.extend(rows)
+        if self.sort_key is None:
+            self.view.extend(range(start, len(self.rows)))
+        else:
+            self._apply_sort()
+        self.refresh()
+    
+    def clear(self):
+        self.rows = []
+        self.view = []
+        self.offset = 0
+        self.refresh()
+    
+    def ordered_rows(self):
+        """Linhas na ordem exibida"""
+        return [self.rows[index] for index in self.view]
+
+class BatchTab(ttk.Frame):
+    """Aba "Arquivo": classifica todas as mensagens de um arquivo"""
+    
+    def __init__(self, parent, app):
+        super().__init__(parent, padding="15")
+        self.app = app
+        self.cancel_event = None
+        self.job_id = 0
+        self.total = 0
+        
+        toolbar = ttk.Frame(self)
+        toolbar.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        self.open_btn = ttk.Button(toolbar, text="📂 Abrir arquivo...", command=self.open_file)
+        self.open_btn.pack(side=tk.LEFT, padx=(0, 5))
+        self.cancel_btn = ttk.Button(toolbar, text="⏹ Cancelar", command=self.cancel, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+        self.export_btn = ttk.Button(toolbar, text="💾 Exportar...", command=self.export, state=tk.DISABLED)
+        self.export_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.progress = ttk.Progressbar(toolbar, mode="determinate", length=220)
+        self.progress.pack(side=tk.LEFT, padx=(15, 5))
+        self.status_label = ttk.Label(toolbar, text="Nenhum arquivo carregado")
+        self.status_label.pack(side=tk.LEFT, padx=5)
+        
+        self.table = VirtualTable(self)
+        self.table.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        self.summary_label = ttk.Label(self, text="")
+        self.summary_label.grid(row=2, column=0, sticky=tk.W, pady=(8, 0))
+        
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+    
+    def open_file(self):
+        """Escolhe o arquivo e inicia a classificação em segundo plano"""
+        if self.app.loading:
+            messagebox.showwarning("Aguarde", "O modelo ainda está carregando. Por favor, aguarde...")
+            return
+        
+        path = filedialog.askopenfilename(
+            title="Arquivo de mensagens",
+            filetypes=[
+                ("Planilhas e textos", "*.xlsx *.csv *.jsonl *.json *.txt"),
+                ("Todos os arquivos", "*.*"),
+            ]
+        )
+        if not path:
+            return
+        
+        column = DEFAULT_COLUMN
+        extension = os.path.splitext(path)[1].lower()
+        if extension in (".xlsx", ".csv") and not self._has_column(path, column):
+            column = simpledialog.askstring("Coluna", "Coluna com as mensagens:", initialvalue=column, parent=self)
+            if not column:
+                return
+        
+        self.start(path, column)
+    
+    def _has_column(self, path, column):
+        try:
+            next(iter(read_messages(path, column)), None)
+            return True
+        except ValueError:
+            return False
+    
+    def start(self, path, column):
+        """Lê e classifica o arquivo numa thread, em blocos de CHUNK_SIZE"""
+        self.cancel()
+        self.job_id += 1
+        job_id = self.job_id
+        cancel_event = self.cancel_event = threading.Event()
+        classifier, kind = self.app.classifier, self.app.model_kind
+        
+        self.table.clear()
+        self.summary_label.config(text="")
+        self.progress.config(value=0, maximum=1)
+        self.status_label.config(text=f"Lendo {os.path.basename(path)}...")
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.export_btn.config(state=tk.DISABLED)
+        
+        def run():
+            try:
+                texts = ["" if text is None else str(text) for text in read_messages(path, column)]
+                self.app.root.after(0, self.on_started, job_id, len(texts))
+                done = 0
+                for chunk in chunked(texts, CHUNK_SIZE):
+                    if cancel_event.is_set():
+                        break
+                    rows = classify_chunk(classifier, kind, chunk)
+                    done += len(rows)
+                    self.app.root.after(0, self.on_chunk, job_id, rows, done)
+                self.app.root.after(0, self.on_finished, job_id, cancel_event.is_set(), None)
+            except Exception as e:
+                self.app.root.after(0, self.on_finished, job_id, False, str(e))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def on_started(self, job_id, total):
+        if job_id != self.job_id:
+            return
+        self.total = total
+        self.progress.config(maximum=max(total, 1))
+        self.status_label.config(text=f"0 / {total}")
+    
+    def on_chunk(self, job_id, rows, done):
+        if job_id != self.job_id:
+            return
+        self.table.extend(rows)
+        self.progress.config(value=done)
+        self.status_label.config(text=f"{done} / {self.total}")
+        self.update_summary()
+    
+    def on_finished(self, job_id, cancelled, error):
+        if job_id != self.job_id:
+            return
+        self.cancel_event = None
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.export_btn.config(state=tk.NORMAL if self.table.rows else tk.DISABLED)
+        if error:
+            self.status_label.config(text="Erro na classificação")
+            messagebox.showerror("Erro", f"Erro ao classificar arquivo:\n{error}")
+        elif cancelled:
+            self.status_label.config(text=f"Cancelado ({len(self.table.rows)} classificadas)")
+        else:
+            self.status_label.config(text=f"✓ {len(self.table.rows)} mensagens classificadas")
+    
+    def cancel(self):
+        """Interrompe a classificação em andamento (após o bloco atual)"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+    
+    def update_summary(self):
+        total = len(self.table.rows)
+        toxic = sum(1 for row in self.table.rows if row["label"] == "TÓXICA")
+        if total:
+            self.summary_label.config(
+                text=f"{total} mensagens | TÓXICAS: {toxic} ({toxic / total:.1%}) | "
+                     f"NÃO TÓXICAS: {total - toxic} ({(total - toxic) / total:.1%})"
+            )
+    
+    def export(self):
+        """Grava os resultados (na ordem exibida) em CSV, JSONL ou Parquet"""
+        path = filedialog.asksaveasfilename(
+            title="Exportar resultados",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet")]
+        )
+        if not path:
+            return
+        
+        extension = os.path.splitext(path)[1].lower().lstrip(".")
+        output_format = extension if extension in OUTPUT_FORMATS else "csv"
+        try:
+            writer, stream = open_writer(path, output_format)
+            try:
+                writer.write(self.table.ordered_rows())
+            finally:
+                writer.close()
+                if stream is not None:
+                    stream.close()
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível exportar:\n{e}")
+            return
+        self.status_label.config(text=f"✓ Exportado para {os.path.basename(path)}")
+
+def classify_chunk(classifier, kind, texts):
+    """Classifica um bloco; modelos TL avaliam o bloco inteiro em lotes"""
+    if kind == "rapido":
+        outputs = [classifier.classify(text) for text in texts]
+    else:
+        outputs = classifier.classify_batch(texts)
+    return [
+        {
+            "text": text,
+            "label": result["label"],
+            "confidence": float(result["confidence"]),
+            "categories": list(result.get("categories", [])),
+        }
+        for text, result in zip(texts, outputs)
+    ]
@@ -0,0 +1,424 @@
+"""
+Benchmarks de desempenho dos classificadores
+
+Mede:
+    regex_short / regex_long / regex_adversarial
+        Latência de ToxicityClassifier.classify por mensagem
+    regex_toxic_detail / regex_toxic_early_exit
+        Textos com vários insultos: todas as categorias x parada antecipada
+        (classify(text, detail=False))
+    scaling_<modo>_<entrada>_<N>kb
+        Entradas adversariais de 1 KB a centenas de KB, no modo linear e na
+        regex antiga (que para ao passar de SCALING_BUDGET); o tempo por KB
+        deve ficar constante no modo linear
+    batch_xlsx_loop / batch_xlsx_series
+        Vazão sobre as mensagens de mensagens_X_coletadas.xlsx (uma a uma
+        e vetorizado com classify_series)
+    tl_single / tl_batch
+        Latência p50/p95/p99 e vazão do Transfer Learning, usando um modelo
+        pequeno com pesos aleatórios gerado localmente (roda offline)
+
+Os resultados vão para um JSON com metadados do ambiente; duas execuções
+podem ser comparadas com --compare.
+
+Uso:
+    python benchmark.py                                 # tudo -> benchmark_results.json
+    python benchmark.py --only regex batch -o antes.json
+    python benchmark.py --compare antes.json depois.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from simple_classifier import ToxicityClassifier
+
+CORPUS_FILE = "model_training/data/raw/mensagens_X_coletadas.xlsx"
+RANDOM_MODEL_DIR = "models/benchmark_random_model"
+SUITES = ("regex", "scaling", "batch", "tl")
+
+# Tamanhos (KB) da suíte "scaling" e tempo máximo por chamada da regex antiga
+SCALING_SIZES_KB = (1, 4, 16, 64, 256, 512)
+SCALING_BUDGET = 2.0
+
+# Métricas em que maior é melhor (as demais são tempos: menor é melhor)
+HIGHER_IS_BETTER = ("per_second",)
+
+WORDS = (
+    "hoje", "jogo", "time", "cara", "gente", "muito", "bom", "dia", "vamos", "ver",
+    "quem", "ganha", "amanhã", "noite", "casa", "trabalho", "escola", "filme", "música",
+    "política", "governo", "eleição", "preço", "gasolina", "chuva", "calor", "praia",
+)
+INSULTS = ("idiota", "burro", "lixo", "otário", "imbecil", "nojento")
+
+# ============================================================
+# Dados
+# ============================================================
+
+def short_texts(count=500, seed=42):
+    """Mensagens curtas (tweets típicos), parte com insultos"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(3, 12))
+        if i % 4 == 0:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(INSULTS))
+        texts.append(" ".join(words))
+    return texts
+
+def long_texts(count=50, seed=43, words=400):
+    """Textos longos (~2-3 mil caracteres), como threads coladas"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS + INSULTS[:1], k=words)) for _ in range(count)]
+
+def toxic_texts(count=200, seed=44, words=300):
+    """Textos longos com vários insultos espalhados (caso da parada antecipada)"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS * 2 + INSULTS, k=words)) for _ in range(count)]
+
+def adversarial_texts(size=4000):
+    """
+    Entradas que exploram backtracking dos padrões com ".*"
+    
+    Começam padrões como "vai ... (inferno|morrer)" ou "você ... é ...
+    macaco" muitas vezes, sem nunca completá-los.
+    """
+    fillers = {
+        "prefixos_repetidos": "vai preto você é mulher seu volta cala ",
+        "sem_espacos": "a",
+        "espacos": " ",
+        "pontuacao": "!?. ",
+        "quase_insultos": "idiot burr otari imbecí ",
+        # Sequência quase completa em cada linha; o final só na última
+        "linhas": "vc e \n",
+    }
+    texts = {}
+    for name, filler in fillers.items():
+        texts[name] = (filler * (size // len(filler) + 1))[:size]
+    texts["linhas"] = texts["linhas"][:-len(" macaco")] + " macaco"
+    return texts
+
+def load_corpus(path=CORPUS_FILE, limit=None):
+    """Mensagens do xlsx coletado (ou None se o arquivo não existir)"""
+    if not os.path.exists(path):
+        return None
+    from dataset_cache import load_dataset
+    
+    texts = load_dataset(path, columns=["Mensagem"], rows=(0, limit))["Mensagem"]
+    return texts.fillna("").astype(str).tolist()
+
+# ============================================================
+# Medição
+# ============================================================
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def summarize(samples, items=None):
+    """
+    Resume uma lista de tempos (segundos por chamada)
+    
+    Args:
+        samples (list): Tempo de cada chamada
+        items (int): Itens processados no total (padrão: uma por chamada)
+    """
+    total = sum(samples)
+    items = items if items is not None else len(samples)
+    return {
+        "calls": len(samples),
+        "items": items,
+        "mean_us": total / len(samples) * 1e6,
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p95_us": percentile(samples, 95) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+        "max_us": max(samples) * 1e6,
+        "per_second": items / total if total else 0.0,
+    }
+
+def time_calls(function, inputs, repeat=1, warmup=3):
+    """Tempo de cada chamada function(x), repetindo a lista repeat vezes"""
+    for item in inputs[:warmup]:
+        function(item)
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            function(item)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+# ============================================================
+# Suítes
+# ============================================================
+
+def bench_regex(results, quick=False):
+    classifier = ToxicityClassifier()
+    repeat = 1 if quick else 3
+    
+    results["regex_short"] = summarize(time_calls(classifier.classify, short_texts(), repeat))
+    results["regex_long"] = summarize(time_calls(classifier.classify, long_texts(), repeat))
+    
+    # Todas as categorias x parada na 3a regra (ordem adaptativa já aquecida)
+    toxic = toxic_texts()
+    results["regex_toxic_detail"] = summarize(time_calls(classifier.classify, toxic, repeat))
+    results["regex_toxic_early_exit"] = summarize(
+        time_calls(lambda text: classifier.classify(text, detail=False), toxic, repeat, warmup=len(toxic))
+    )
+    
+    for name, text in adversarial_texts().items():
+        samples = time_calls(classifier.classify, [text], repeat=2 if quick else 5, warmup=1)
+        results[f"regex_adversarial_{name}"] = summarize(samples)
+
+def bench_scaling(results, quick=False):
+    """Latência em entradas adversariais crescentes: linear x regex antiga"""
+    sizes = SCALING_SIZES_KB[:-1] if quick else SCALING_SIZES_KB
+    modes = {
+        "linear": ToxicityClassifier(),
+        "regex": ToxicityClassifier(linear_time=False),
+    }
+    for mode, classifier in modes.items():
+        # Compila os motores de cada combinação de categorias antes de medir
+        for text in adversarial_texts(1024).values():
+            classifier.classify(text)
+        for name in adversarial_texts(16).keys():
+            for size in sizes:
+                text = adversarial_texts(size * 1024)[name]
+                samples = time_calls(classifier.classify, [text], repeat=1 if quick else 3, warmup=0)
+                result = summarize(samples)
+                result["us_per_kb"] = result["p50_us"] / size
+                results[f"scaling_{mode}_{name}_{size}kb"] = result
+                if max(samples) > SCALING_BUDGET:
+                    # Regex antiga: tamanhos maiores levariam minutos
+                    break
+
+def print_scaling(results):
+    """Tempo por KB de cada entrada adversarial, do menor ao maior tamanho"""
+    rows = {}
+    for key, result in results.items():
+        if key.startswith("scaling_"):
+            prefix, size = key.rsplit("_", 1)
+            rows.setdefault(prefix, []).append(f"{size}:{result['us_per_kb']:.0f}")
+    if rows:
+        print("\nus por KB (escala linear = valores parecidos em todos os tamanhos):")
+        for prefix, values in rows.items():
+            print(f"   {prefix[len('scaling_'):]:32} " + "  ".join(values))
+
+def bench_batch(results, corpus, quick=False):
+    if not corpus:
+        print(f"[AVISO] {CORPUS_FILE} nao encontrado: suite 'batch' ignorada")
+        return
+    import pandas as pd
+    
+    classifier = ToxicityClassifier()
+    start = time.perf_counter()
+    for text in corpus:
+        classifier.classify(text)
+    results["batch_xlsx_loop"] = summarize([time.perf_counter() - start], items=len(corpus))
+    
+    series = pd.Series(corpus)
+    classifier.classify_series(series.head(10))
+    samples = []
+    for _ in range(1 if quick else 3):
+        start = time.perf_counter()
+        classifier.classify_series(series)
+        samples.append(time.perf_counter() - start)
+    results["batch_xlsx_series"] = summarize(samples, items=len(corpus) * len(samples))
+
+def build_random_model(path=RANDOM_MODEL_DIR, corpus=None, seed=0):
+    """
+    Gera um modelo Llama minúsculo com pesos aleatórios e tokenizer BPE
+    treinado localmente, no mesmo formato de models/toxicity_transfer_learning
+    
+    Serve só para medir o custo do caminho de inferência, sem download.
+    """
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+    
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+    from prompt_format import LABELS, build_prompt
+    
+    texts = list(corpus or []) or short_texts(2000)
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=2000,
+        special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    )
+    tokenizer.train_from_iterator(texts + [build_prompt("") + " ".join(LABELS)] * 10, trainer)
+    tokenizer.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 1)])
+    
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>", unk_token="<unk>")
+    fast.save_pretrained(path)
+    
+    torch.manual_seed(seed)
+    config = LlamaConfig(
+        vocab_size=len(fast),
+        hidden_size=128,
+        intermediate_size=352,
+        num_hidden_layers=4,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=512,
+        bos_token_id=1,
+        eos_token_id=2
+    )
+    LlamaForCausalLM(config).save_pretrained(path)
+    return path
+
+def bench_tl(results, corpus, model_dir=RANDOM_MODEL_DIR, quick=False):
+    try:
+        import torch  # noqa: F401
+        import transformers  # noqa: F401
+    except ImportError:
+        print("[AVISO] torch/transformers nao instalados: suite 'tl' ignorada")
+        return
+    from transfer_learning_classifier import TransferLearningClassifier
+    
+    build_random_model(model_dir, corpus)
+    classifier = TransferLearningClassifier(model_dir)
+    texts = (corpus or short_texts())[:100 if quick else 300]
+    
+    results["tl_single"] = summarize(time_calls(classifier.classify, texts))
+    
+    samples = []
+    for _ in range(1 if quick else 3):
+        start = time.perf_counter()
+        classifier.classify_batch(texts, batch_size=32)
+        samples.append(time.perf_counter() - start)
+    results["tl_batch"] = summarize(samples, items=len(texts) * len(samples))
+
+# ============================================================
+# Ambiente, gravação e comparação
+# ============================================================
+
+def environment():
+    """Metadados para saber se duas execuções são comparáveis"""
+    versions = {}
+    for name in ("numpy", "pandas", "torch", "transformers", "ahocorasick", "onnxruntime"):
+        module = sys.modules.get(name)
+        if module is None:
+            try:
+                module = __import__(name)
+            except ImportError:
+                continue
+        versions[name] = getattr(module, "__version__", "?")
+    
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+def run(suites=SUITES, quick=False, model_dir=RANDOM_MODEL_DIR):
+    """Executa as suítes e retorna o dicionário completo de resultados"""
+    results = {}
+    corpus = None
+    if "batch" in suites or "tl" in suites:
+        corpus = load_corpus(limit=2000 if quick else None)
+    
+    for suite in suites:
+        print(f"Executando suite '{suite}'...")
+        start = time.perf_counter()
+        if suite == "regex":
+            bench_regex(results, quick)
+        elif suite == "scaling":
+            bench_scaling(results, quick)
+        elif suite == "batch":
+            bench_batch(results, corpus, quick)
+        elif suite == "tl":
+            bench_tl(results, corpus, model_dir, quick)
+        print(f"   {time.perf_counter() - start:.1f}s")
+    
+    return {"environment": environment(), "quick": quick, "results": results}
+
+def print_results(report):
+    print(f"\n{'benchmark':38}{'p50 us':>12}{'p95 us':>12}{'p99 us':>12}{'itens/s':>12}")
+    for name, r in report["results"].items():
+        print(f"{name:38}{r['p50_us']:>12.1f}{r['p95_us']:>12.1f}{r['p99_us']:>12.1f}{r['per_second']:>12.1f}")
+    print_scaling(report["results"])
+
+def compare(old, new, threshold=0.10, metrics=("p50_us", "p95_us", "per_second")):
+    """
+    Compara dois relatórios
+    
+    Returns:
+        list: (benchmark, métrica, antes, depois, variação relativa, regressão?)
+    """
+    rows = []
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        for metric in metrics:
+            before = old["results"][name].get(metric)
+            after = new["results"][name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append((name, metric, before, after, change, worse > threshold))
+    return rows
+
+def print_comparison(old, new, rows, threshold):
+    for label, report in (("antes", old), ("depois", new)):
+        env = report["environment"]
+        print(f"{label}: {env['timestamp']}  commit={env['git_commit']}  {env['platform']}  cpus={env['cpu_count']}")
+    if old["environment"]["platform"] != new["environment"]["platform"] or \
+            old["environment"]["cpu_count"] != new["environment"]["cpu_count"]:
+        print("[AVISO] Ambientes diferentes: comparacao pode nao ser valida")
+    
+    print(f"\n{'benchmark':38}{'metrica':>12}{'antes':>12}{'depois':>12}{'variacao':>10}")
+    for name, metric, before, after, change, regression in rows:
+        flag = "  REGRESSAO" if regression else ""
+        print(f"{name:38}{metric:>12}{before:>12.1f}{after:>12.1f}{change:>+10.1%}{flag}")
+    
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regressao(oes) acima de {threshold:.0%}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de desempenho dos classificadores")
+    parser.add_argument("--only", nargs="+", choices=SUITES, help="Suites a executar (padrao: todas)")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Arquivo JSON de saida")
+    parser.add_argument("--quick", action="store_true", help="Menos repeticoes (para checagens rapidas)")
+    parser.add_argument("--model-dir", default=RANDOM_MODEL_DIR, help="Pasta do modelo aleatorio da suite 'tl'")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"), help="Compara dois arquivos de resultados")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Piora relativa considerada regressao (padrao: 0.10)")
+    args = parser.parse_args(argv)
+    
+    if args.compare:
+        with open(args.compare[0], 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.compare[1], 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        rows = compare(old, new, args.threshold)
+        return 1 if print_comparison(old, new, rows, args.threshold) else 0
+    
+    report = run(args.only or SUITES, args.quick, args.model_dir)
+    print_results(report)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[OK] Resultados salvos em {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""
+Cascata de classificadores: regex primeiro, modelo só nos casos incertos
+
+Mensagens claramente tóxicas (várias regras disparadas) ou vazias são
+decididas pelo classificador rápido; o modelo Transfer Learning só recebe
+o meio-termo incerto.
+"""
+import threading
+
+from instrumentation import metrics
+
+class CascadeClassifier:
+    """
+    Classificador em cascata com limiares de confiança configuráveis
+    
+    Exemplo:
+        fast = ToxicityClassifier()
+        cascade = CascadeClassifier(fast, TransferLearningClassifier(fast_classifier=fast))
+        cascade.classify("Vai tomar no cu, seu lixo")  # decidido pela regex
+        print(cascade.stats())
+    """
+    
+    def __init__(self, fast_classifier, model_classifier, toxic_threshold=0.90, safe_threshold=1.0):
+        """
+        Args:
+            fast_classifier: Classificador rápido (regex), reutilizado em todas as chamadas
+            model_classifier: Classificador caro; seu classify aceita simple_result
+            toxic_threshold (float): Resultado TÓXICA da regex com confiança >= a
+                este valor não passa pelo modelo (0.90 = duas ou mais regras)
+            safe_threshold (float): Idem para NÃO TÓXICA (1.0 = só textos vazios)
+        """
+        self.fast = fast_classifier
+        self.model = model_classifier
+        self.model_path = getattr(model_classifier, "model_path", None)
+        self.toxic_threshold = toxic_threshold
+        self.safe_threshold = safe_threshold
+        
+        self._lock = threading.Lock()
+        self._counts = {"total": 0, "regex": 0, "model": 0}
+        metrics.register_source("cascade", self)
+    
+    def is_clear(self, fast_result):
+        """Diz se o resultado da regex é conclusivo o bastante para pular o modelo"""
+        if fast_result["label"] == "TÓXICA":
+            return fast_result["confidence"] >= self.toxic_threshold
+        return fast_result["confidence"] >= self.safe_threshold
+    
+    def classify(self, text):
+        """
+        Classifica o texto, usando o modelo apenas quando a regex não é conclusiva
+        
+        Returns:
+            dict: Resultado do estágio que decidiu, com a chave "stage"
+                ("regex" ou "model")
+        """
+        fast_result = self.fast.classify(text)
+        
+        if self.is_clear(fast_result):
+            stage = "regex"
+            result = dict(fast_result)
+        else:
+            stage = "model"
+            result = dict(self.model.classify(text, simple_result=fast_result))
+        
+        with self._lock:
+            self._counts["total"] += 1
+            self._counts[stage] += 1
+        
+        result["stage"] = stage
+        return result
+    
+    def classify_batch(self, texts, batch_size=32):
+        """
+        Classifica vários textos; os incertos vão ao modelo num único lote
+        
+        Returns:
+            list: Um dict por texto, na ordem de entrada (mesmo formato de classify)
+        """
+        texts = list(texts)
+        results = []
+        uncertain = []
+        for index, text in enumerate(texts):
+            fast_result = self.fast.classify(text)
+            if self.is_clear(fast_result):
+                results.append({**fast_result, "stage": "regex"})
+            else:
+                results.append(fast_result)
+                uncertain.append(index)
+        
+        if uncertain:
+            model_results = self.model.classify_batch(
+                [texts[i] for i in uncertain],
+                batch_size=batch_size,
+                simple_results=[results[i] for i in uncertain]
+            )
+            for index, result in zip(uncertain, model_results):
+                results[index] = {**result, "stage": "model"}
+        
+        with self._lock:
+            self._counts["total"] += len(texts)
+            self._counts["regex"] += len(texts) - len(uncertain)
+            self._counts["model"] += len(uncertain)
+        
+        return results
+    
+    def stats(self):
+        """Quantidade e fração do tráfego decidida em cada estágio"""
+        with self._lock:
+            counts = dict(self._counts)
+        total = counts["total"]
+        return {
+            **counts,
+            "regex_fraction": counts["regex"] / total if total else 0.0,
+            "model_fraction": counts["model"] / total if total else 0.0,
+        }
+    
+    def reset_stats(self):
+        """Zera os contadores"""
+        with self._lock:
+            self._counts = {"total": 0, "regex": 0, "model": 0}
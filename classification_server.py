@@ -0,0 +1,410 @@
+"""
+Serviço local de classificação (HTTP sobre TCP ou socket Unix)
+
+Mantém os classificadores carregados entre clientes. Pedidos ao modo rápido
+são respondidos direto no loop asyncio; pedidos ao Transfer Learning entram
+numa fila que junta as chamadas simultâneas por alguns milissegundos e as
+envia como um único lote para a thread dona do modelo.
+
+Uso:
+    python classification_server.py                      # http://127.0.0.1:8765
+    python classification_server.py --unix /tmp/toxicidade.sock
+    python classification_server.py --no-model           # apenas modo rápido
+    python classification_server.py --workers 4          # 4 processos do modelo
+
+Exemplo de chamada:
+    curl -X POST http://127.0.0.1:8765/classify \\
+         -d '{"text": "Você é um idiota", "classifier": "transfer_learning"}'
+
+Endpoints:
+    POST /classify  {"text": "...", "classifier": "rapido" | "transfer_learning" | "cascata"}
+                    "detail": false  para na 3a regra que casa (categorias parciais)
+    GET  /health
+    GET  /stats
+    GET  /metrics        métricas no formato texto do Prometheus
+    GET  /metrics/json   as mesmas métricas em JSON
+    GET  /profile        perfil acumulado (com TOXICITY_PROFILE definido)
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import metrics, profiler
+from pattern_stats import PATTERN_STATS_FILE
+from simple_classifier import ToxicityClassifier
+
+DEFAULT_PORT = 8765
+# Textos maiores são recusados com 400 (o classificador rápido é linear,
+# mas o limite protege memória e o lote do modelo)
+DEFAULT_MAX_INPUT_LENGTH = 200_000
+# Corpo maior é recusado com 413 sem ser lido: em JSON, cada caractere do
+# texto ocupa até 6 bytes (\uXXXX), mais folga para os demais campos
+BODY_OVERHEAD_BYTES = 64 * 1024
+# Limite do corpo quando não há limite de tamanho de texto
+UNLIMITED_TEXT_MAX_BODY = 64 * 1024 * 1024
+# Cada linha do cabeçalho é limitada pelo StreamReader (64 KiB); este é o
+# limite do número de linhas
+MAX_HEADER_LINES = 100
+SERVER_CLASSIFIERS = ("rapido", "transfer_learning", "cascata")
+
+class MicroBatcher:
+    """
+    Junta pedidos concorrentes em lotes para o modelo
+    
+    O primeiro pedido da fila abre uma janela de max_wait_ms; tudo o que
+    chegar nesse intervalo (até max_batch) segue junto numa única chamada a
+    classify_batch, executada na thread exclusiva do modelo. Com um pool de
+    processos (concurrency > 1), até concurrency lotes ficam em andamento.
+    """
+    
+    def __init__(self, model, max_batch=32, max_wait_ms=5, concurrency=1):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        # Uma thread por lote em andamento: um modelo local nunca é usado por
+        # duas threads ao mesmo tempo
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="modelo")
+        self.concurrency = concurrency
+        self._pending = set()
+        self.batches = 0
+        self.items = 0
+        self._task = None
+    
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self.executor.shutdown(wait=False)
+    
+    async def submit(self, text, simple_result):
+        """Enfileira um texto e aguarda o resultado do lote em que ele cair"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, simple_result, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            task = loop.create_task(self._dispatch(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            task.add_done_callback(lambda _: slots.release())
+    
+    async def _dispatch(self, batch):
+        """Envia um lote ao modelo e entrega os resultados a cada pedido"""
+        loop = asyncio.get_running_loop()
+        texts = [text for text, _, _ in batch]
+        simple_results = [simple for _, simple, _ in batch]
+        try:
+            results = await loop.run_in_executor(
+                self.executor,
+                lambda: self.model.classify_batch(
+                    texts, batch_size=self.max_batch, simple_results=simple_results
+                )
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.items += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+class ClassificationService:
+    """Classificadores residentes + roteamento dos pedidos"""
+    
+    def __init__(self, model_path=None, load_model=True, max_batch=32, max_wait_ms=5, quantize=False,
+                 backend="torch", workers=1, max_input_length=DEFAULT_MAX_INPUT_LENGTH, pattern_stats=None):
+        self.fast = ToxicityClassifier(
+            max_input_length=max_input_length, long_input="reject", stats_path=pattern_stats
+        )
+        self.cascade = None
+        self.batcher = None
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.workers = workers
+        self.max_body = max_body_bytes(max_input_length)
+        self.requests = {name: 0 for name in SERVER_CLASSIFIERS}
+        metrics.register_source("server", self)
+        
+        if load_model:
+            from classifiers import load_model as load_backend
+            from cascade_classifier import CascadeClassifier
+            
+            options = {"fast_classifier": self.fast}
+            if model_path:
+                options["model_path"] = model_path
+            if quantize:
+                options["quantize"] = True
+            model = load_backend(backend, workers=workers, **options)
+            self.cascade = CascadeClassifier(self.fast, model)
+    
+    def start(self):
+        if self.cascade is not None:
+            self.batcher = MicroBatcher(
+                self.cascade.model, self.max_batch, self.max_wait_ms, concurrency=self.workers
+            )
+            self.batcher.start()
+    
+    async def stop(self):
+        if self.batcher is not None:
+            await self.batcher.stop()
+        # Pool de processos do modelo (--workers > 1)
+        close = getattr(self.cascade.model, "close", None) if self.cascade is not None else None
+        if close is not None:
+            close()
+        self.fast.save_stats()
+    
+    async def classify(self, text, classifier="rapido", detail=True):
+        """Classifica um texto no classificador pedido (detail: ver ToxicityClassifier.classify)"""
+        if classifier not in SERVER_CLASSIFIERS:
+            raise ValueError(f"Classificador desconhecido: {classifier}")
+        if classifier != "rapido" and self.batcher is None:
+            raise RuntimeError("Modelo Transfer Learning nao carregado (servidor iniciado com --no-model)")
+        
+        self.requests[classifier] += 1
+        fast_result = self.fast.classify(text, detail=detail)
+        
+        # Regex responde inline; na cascata, também os casos claros
+        if classifier == "rapido":
+            return fast_result
+        if classifier == "cascata" and self.cascade.is_clear(fast_result):
+            return {**fast_result, "stage": "regex"}
+        
+        result = await self.batcher.submit(text, fast_result)
+        if classifier == "cascata":
+            result = {**result, "stage": "model"}
+        return result
+    
+    def stats(self):
+        stats = {
+            "requests": dict(self.requests),
+            "model_loaded": self.batcher is not None,
+            "model_workers": self.workers,
+        }
+        if self.batcher is not None:
+            stats["batches"] = self.batcher.batches
+            stats["batched_items"] = self.batcher.items
+            stats["mean_batch_size"] = self.batcher.items / self.batcher.batches if self.batcher.batches else 0.0
+        return stats
+
+# ============================================================
+# HTTP mínimo sobre asyncio (sem dependências externas)
+# ============================================================
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+    414: "URI Too Long", 431: "Request Header Fields Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+def max_body_bytes(max_input_length):
+    """Maior corpo de pedido aceito para o limite de texto dado"""
+    if not max_input_length:
+        return UNLIMITED_TEXT_MAX_BODY
+    return max_input_length * 6 + BODY_OVERHEAD_BYTES
+
+def parse_content_length(value, limit):
+    """
+    Valida o cabeçalho Content-Length
+    
+    Returns:
+        tuple: (tamanho, None) ou (None, (status, erro)) se inválido
+    """
+    try:
+        length = int(value or 0)
+    except ValueError:
+        return None, (400, {"error": f"Content-Length invalido: {value!r}"})
+    if length < 0:
+        return None, (400, {"error": f"Content-Length invalido: {value!r}"})
+    if length > limit:
+        return None, (413, {"error": f"Corpo com {length} bytes excede o limite de {limit}"})
+    return length, None
+
+async def write_response(writer, status, payload, keep_alive):
+    """Envia payload como JSON (ou como texto puro, se for str)"""
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    headers = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+async def handle_request(service, method, path, body):
+    """Executa um pedido e retorna (status, payload)"""
+    if method == "GET" and path == "/health":
+        return 200, {"status": "ok"}
+    if method == "GET" and path == "/stats":
+        return 200, service.stats()
+    if method == "GET" and path == "/metrics":
+        return 200, metrics.prometheus()
+    if method == "GET" and path == "/metrics/json":
+        return 200, metrics.snapshot()
+    if method == "GET" and path == "/profile":
+        return 200, profiler.report()
+    if method != "POST" or path != "/classify":
+        return 404, {"error": f"Rota desconhecida: {method} {path}"}
+    
+    try:
+        request = json.loads(body or b"{}")
+        text = request["text"]
+        classifier = request.get("classifier", "rapido")
+        detail = bool(request.get("detail", True))
+    except (ValueError, KeyError, TypeError):
+        return 400, {"error": 'Corpo invalido: esperado {"text": "...", "classifier": "..."}'}
+    
+    start = time.perf_counter()
+    try:
+        result = await service.classify(str(text), classifier, detail)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    except RuntimeError as e:
+        return 503, {"error": str(e)}
+    except Exception as e:
+        return 500, {"error": str(e)}
+    
+    result = dict(result)
+    result["latency_ms"] = (time.perf_counter() - start) * 1000
+    return 200, result
+
+async def handle_connection(service, reader, writer):
+    """Atende uma conexão HTTP/1.1 (com keep-alive)"""
+    try:
+        while True:
+            try:
+                request_line = await reader.readline()
+            except ValueError:
+                # Linha maior que o limite do StreamReader (LimitOverrunError)
+                await write_response(writer, 414, {"error": "Linha de requisicao longa demais"}, False)
+                break
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+            except ValueError:
+                await write_response(writer, 400, {"error": "Requisicao invalida"}, False)
+                break
+            
+            headers = {}
+            try:
+                for _ in range(MAX_HEADER_LINES + 1):
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                else:
+                    raise ValueError(f"mais de {MAX_HEADER_LINES} linhas de cabecalho")
+            except ValueError:
+                await write_response(writer, 431, {"error": "Cabecalhos grandes demais"}, False)
+                break
+            
+            length, error = parse_content_length(headers.get("content-length"), service.max_body)
+            if error is not None:
+                # O corpo não é lido: a conexão não pode ser reaproveitada
+                await write_response(writer, *error, False)
+                break
+            body = await reader.readexactly(length) if length else b""
+            
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+            
+            status, payload = await handle_request(service, method, path, body)
+            await write_response(writer, status, payload, keep_alive)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(service, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None):
+    """Inicia o servidor e atende até ser interrompido"""
+    service.start()
+    handler = lambda reader, writer: handle_connection(service, reader, writer)
+    
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+        print(f"[OK] Servindo em unix:{unix_path}")
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        print(f"[OK] Servindo em http://{host}:{port}")
+    
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servico local de classificacao de toxicidade")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="Caminho de socket Unix (em vez de TCP)")
+    parser.add_argument("--model-path", help="Pasta do modelo Transfer Learning")
+    parser.add_argument("--no-model", action="store_true", help="Nao carregar o Transfer Learning (apenas modo rapido)")
+    parser.add_argument("--workers", type=int, default=1, help="Processos do modelo, com pesos compartilhados via mmap (backend torch)")
+    parser.add_argument("--max-batch", type=int, default=32, help="Tamanho maximo do lote enviado ao modelo")
+    parser.add_argument("--backend", choices=("torch", "onnx"), default="torch", help="Backend do modelo (onnx: gerado por export_onnx.py)")
+    parser.add_argument("--quantize", action="store_true", help="Modelo com camadas lineares em int8 (CPU)")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="Janela para juntar pedidos num lote")
+    parser.add_argument("--max-input-length", type=int, default=DEFAULT_MAX_INPUT_LENGTH,
+                        help="Textos com mais caracteres sao recusados (400); corpos acima de ~6 bytes por caractere, com 413")
+    parser.add_argument("--metrics", action="store_true", help="Liga contadores e tempos (o mesmo que TOXICITY_METRICS=1)")
+    parser.add_argument("--pattern-stats", nargs="?", const=PATTERN_STATS_FILE,
+                        help=f"Carrega e grava (ao encerrar) a taxa de acerto por regra usada com detail=false (padrao: {PATTERN_STATS_FILE})")
+    args = parser.parse_args(argv)
+    if args.quantize and args.workers > 1 and not args.no_model:
+        parser.error("--quantize nao combina com --workers > 1 (o modelo int8 nao e compartilhado entre processos)")
+    
+    if args.metrics:
+        metrics.enable()
+    
+    service = ClassificationService(
+        model_path=args.model_path,
+        load_model=not args.no_model,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        quantize=args.quantize,
+        backend=args.backend,
+        workers=args.workers,
+        max_input_length=args.max_input_length,
+        pattern_stats=args.pattern_stats
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("\nServidor encerrado")
+
+if __name__ == "__main__":
+    main()
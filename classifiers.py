@@ -0,0 +1,68 @@
+"""
+Ponto único para criar os classificadores disponíveis pelo nome
+"""
+
+CLASSIFIER_KINDS = ("rapido", "transfer_learning", "cascata")
+MODEL_BACKENDS = ("torch", "onnx")
+
+def load_model(backend="torch", workers=1, **options):
+    """
+    Cria o modelo Transfer Learning no backend escolhido
+    
+    Args:
+        backend (str): "torch" (transformers) ou "onnx" (ONNX Runtime, modelo
+            gerado por export_onnx.py)
+        workers (int): Se > 1 (backend torch), distribui o modelo entre
+            processos que compartilham os pesos (worker_pool.ModelWorkerPool)
+        **options: Argumentos repassados ao construtor do backend
+    """
+    if backend == "torch" and workers > 1:
+        from worker_pool import ModelWorkerPool
+        return ModelWorkerPool(workers=workers, **options)
+    if backend == "torch":
+        # torch/transformers só são importados quando necessário
+        from transfer_learning_classifier import TransferLearningClassifier
+        return TransferLearningClassifier(**options)
+    if backend == "onnx":
+        from onnx_classifier import OnnxTransferLearningClassifier
+        return OnnxTransferLearningClassifier(**options)
+    raise ValueError(f"Backend desconhecido: {backend} (opções: {', '.join(MODEL_BACKENDS)})")
+
+def load_classifier(kind="rapido", cache_size=0, backend="torch", **options):
+    """
+    Cria um classificador pelo nome
+    
+    Args:
+        kind (str): "rapido" (regex), "transfer_learning" (TinyLlama) ou
+            "cascata" (regex decide os casos claros, TinyLlama o restante)
+        cache_size (int): Se > 0, envolve o classificador com um cache LRU
+            de resultados com esse número de entradas
+        backend (str): Backend do modelo Transfer Learning ("torch" ou "onnx")
+        **options: Argumentos repassados ao construtor do classificador
+    
+    Returns:
+        Objeto com o método classify(text)
+    """
+    if kind == "rapido":
+        from simple_classifier import ToxicityClassifier
+        classifier = ToxicityClassifier(**options)
+    elif kind == "transfer_learning":
+        classifier = load_model(backend, **options)
+    elif kind == "cascata":
+        from simple_classifier import ToxicityClassifier
+        from cascade_classifier import CascadeClassifier
+        
+        thresholds = {
+            name: options.pop(name) for name in ("toxic_threshold", "safe_threshold")
+            if name in options
+        }
+        fast = ToxicityClassifier()
+        model = load_model(backend, fast_classifier=fast, **options)
+        classifier = CascadeClassifier(fast, model, **thresholds)
+    else:
+        raise ValueError(f"Classificador desconhecido: {kind} (opções: {', '.join(CLASSIFIER_KINDS)})")
+    
+    if cache_size > 0:
+        from result_cache import CachedClassifier
+        classifier = CachedClassifier(classifier, maxsize=cache_size)
+    return classifier
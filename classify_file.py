@@ -0,0 +1,331 @@
+"""
+Classificação em lote de arquivos grandes (xlsx, CSV, JSONL ou stdin)
+
+Lê as mensagens em streaming, distribui blocos entre processos e grava os
+resultados na mesma ordem da entrada, sem carregar o arquivo inteiro na
+memória.
+
+Uso:
+    python classify_file.py model_training/data/raw/mensagens_X_coletadas.xlsx -o resultados.jsonl
+    python classify_file.py mensagens.csv --column texto -o resultados.parquet
+    cat mensagens.txt | python classify_file.py - --classifier transfer_learning --workers 1
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from classifiers import CLASSIFIER_KINDS, MODEL_BACKENDS, load_classifier
+
+DEFAULT_COLUMN = "Mensagem"
+OUTPUT_FORMATS = ("jsonl", "csv", "parquet")
+
+# ============================================================
+# Leitura em streaming
+# ============================================================
+
+def read_xlsx(path, column):
+    """Lê a coluna de mensagens de uma planilha linha a linha"""
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        if column not in header:
+            raise ValueError(f"Coluna '{column}' nao encontrada em {path}")
+        index = header.index(column)
+        for row in rows:
+            yield row[index] if index < len(row) else None
+    finally:
+        workbook.close()
+
+def read_csv(path, column):
+    """Lê a coluna de mensagens de um CSV linha a linha"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            return
+        if column not in reader.fieldnames:
+            raise ValueError(f"Coluna '{column}' nao encontrada em {path}")
+        for row in reader:
+            yield row[column]
+
+def read_jsonl(lines, column):
+    """Lê mensagens de linhas JSON (objetos com a coluna, ou strings)"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if isinstance(record, dict):
+            yield record.get(column, record.get("text"))
+        else:
+            yield record
+
+def read_lines(lines):
+    """Lê uma mensagem por linha (texto puro)"""
+    for line in lines:
+        yield line.rstrip("\r\n")
+
+def read_messages(path, column, input_format=None):
+    """
+    Gera as mensagens do arquivo de entrada, uma a uma
+    
+    Args:
+        path (str): Caminho do arquivo ou "-" para stdin
+        column (str): Coluna/campo com o texto
+        input_format (str): xlsx, csv, jsonl ou txt (padrão: pela extensão)
+    """
+    if input_format is None:
+        extension = os.path.splitext(path)[1].lower().lstrip(".")
+        input_format = {"xls": "xlsx", "json": "jsonl"}.get(extension, extension)
+        if path == "-" or input_format not in ("xlsx", "csv", "jsonl"):
+            input_format = "txt"
+    
+    if input_format == "xlsx":
+        return read_xlsx(path, column)
+    if input_format == "csv":
+        return read_csv(path, column)
+    
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    if input_format == "jsonl":
+        return read_jsonl(stream, column)
+    return read_lines(stream)
+
+def chunked(iterable, size):
+    """Agrupa um iterável em listas de até size itens"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# ============================================================
+# Escrita em streaming
+# ============================================================
+
+class JsonlWriter:
+    """Grava um resultado JSON por linha"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def write(self, rows):
+        for row in rows:
+            self.stream.write(json.dumps(row, ensure_ascii=False))
+            self.stream.write("\n")
+    
+    def close(self):
+        self.stream.flush()
+
+class CsvWriter:
+    """Grava os resultados como CSV (categorias separadas por ';')"""
+    
+    FIELDS = ["text", "label", "confidence", "categories"]
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, fieldnames=self.FIELDS, extrasaction="ignore")
+        self.writer.writeheader()
+    
+    def write(self, rows):
+        for row in rows:
+            self.writer.writerow({**row, "categories": ";".join(row.get("categories", []))})
+    
+    def close(self):
+        self.stream.flush()
+
+class ParquetWriter:
+    """Grava os resultados em Parquet, um row group por bloco (requer pyarrow)"""
+    
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Saida Parquet requer pyarrow: pip install pyarrow")
+        
+        self.pa = pa
+        self.schema = pa.schema([
+            ("text", pa.string()),
+            ("label", pa.string()),
+            ("confidence", pa.float64()),
+            ("categories", pa.list_(pa.string())),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+    
+    def write(self, rows):
+        columns = {
+            name: [row.get(name, [] if name == "categories" else None) for row in rows]
+            for name in self.schema.names
+        }
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+    
+    def close(self):
+        self.writer.close()
+
+def open_writer(output, output_format):
+    """Cria o gravador adequado; output "-" ou None escreve no stdout"""
+    if output_format == "parquet":
+        if output in (None, "-"):
+            raise ValueError("Saida Parquet precisa de um arquivo (-o resultados.parquet)")
+        return ParquetWriter(output), None
+    
+    stream = sys.stdout if output in (None, "-") else open(output, "w", encoding="utf-8", newline="")
+    writer = CsvWriter(stream) if output_format == "csv" else JsonlWriter(stream)
+    return writer, (None if stream is sys.stdout else stream)
+
+# ============================================================
+# Classificação (processo principal ou workers)
+# ============================================================
+
+_worker_classifier = None
+_worker_batched = False
+
+def _init_worker(kind, options):
+    """Inicializa o classificador uma única vez por processo"""
+    global _worker_classifier, _worker_batched
+    # O banner de carregamento iria para o stdout (que pode ser a saída)
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        _worker_classifier = load_classifier(kind, **options)
+    finally:
+        sys.stdout = stdout
+    
+    # Modelos TL avaliam o bloco em lotes; com cache, cada texto passa pelo cache
+    _worker_batched = kind != "rapido" and not options.get("cache_size")
+
+def _classify_chunk(texts):
+    """Classifica um bloco de mensagens no classificador do processo"""
+    texts = ["" if text is None else str(text) for text in texts]
+    if _worker_batched:
+        outputs = _worker_classifier.classify_batch(texts)
+    else:
+        outputs = [_worker_classifier.classify(text) for text in texts]
+    
+    results = []
+    for text, result in zip(texts, outputs):
+        results.append({
+            "text": text,
+            "label": result["label"],
+            "confidence": float(result["confidence"]),
+            "categories": list(result.get("categories", [])),
+        })
+    return results
+
+def classify_stream(messages, kind="rapido", options=None, workers=1, chunk_size=500):
+    """
+    Classifica mensagens em blocos, preservando a ordem de entrada
+    
+    Com workers > 1 os blocos são distribuídos em um pool de processos, com
+    no máximo 2 blocos pendentes por worker para limitar o uso de memória.
+    
+    Yields:
+        list: Resultados (dicts) de cada bloco, na ordem original
+    """
+    options = options or {}
+    chunks = chunked(messages, chunk_size)
+    
+    if workers <= 1:
+        _init_worker(kind, options)
+        for chunk in chunks:
+            yield _classify_chunk(chunk)
+        return
+    
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(kind, options)
+    ) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_classify_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classificacao de toxicidade em lote")
+    parser.add_argument("input", help="Arquivo de entrada (xlsx, csv, jsonl, txt) ou '-' para stdin")
+    parser.add_argument("-o", "--output", default="-", help="Arquivo de saida (padrao: stdout)")
+    parser.add_argument("--input-format", choices=("xlsx", "csv", "jsonl", "txt"), help="Formato da entrada (padrao: pela extensao)")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, help="Formato da saida (padrao: pela extensao, ou jsonl)")
+    parser.add_argument("--column", default=DEFAULT_COLUMN, help=f"Coluna com o texto (padrao: {DEFAULT_COLUMN})")
+    parser.add_argument("--classifier", choices=CLASSIFIER_KINDS, default="rapido", help="Classificador a usar")
+    parser.add_argument("--workers", type=int, default=None, help="Numero de processos (padrao: todos os nucleos no modo rapido, 1 com modelo; com modelo, os processos compartilham os pesos via mmap)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Mensagens por bloco enviado a cada processo")
+    parser.add_argument("--cache-size", type=int, default=0, help="Entradas do cache LRU de resultados por processo (0 = desligado)")
+    parser.add_argument("--backend", choices=MODEL_BACKENDS, default="torch", help="Backend do modelo Transfer Learning (onnx: gerado por export_onnx.py)")
+    parser.add_argument("--quantize", action="store_true", help="Modelo Transfer Learning com camadas lineares em int8 (CPU)")
+    args = parser.parse_args(argv)
+    if args.quantize and args.backend != "torch":
+        parser.error("--quantize so se aplica ao backend torch")
+    if args.classifier != "rapido" and args.backend != "torch" and (args.workers or 1) > 1:
+        parser.error("--workers > 1 com modelo so se aplica ao backend torch")
+    if args.classifier != "rapido" and args.quantize and (args.workers or 1) > 1:
+        parser.error("--quantize nao combina com --workers > 1 (o modelo int8 nao e compartilhado entre processos)")
+    
+    output_format = args.output_format
+    if output_format is None:
+        extension = os.path.splitext(args.output)[1].lower().lstrip(".")
+        output_format = extension if extension in OUTPUT_FORMATS else "jsonl"
+    
+    workers = args.workers
+    if workers is None:
+        workers = (os.cpu_count() or 1) if args.classifier == "rapido" else 1
+    
+    options = {"cache_size": args.cache_size}
+    stream_workers = workers
+    if args.classifier != "rapido":
+        options["backend"] = args.backend
+        if args.quantize:
+            options["quantize"] = True
+        if workers > 1:
+            # Um processo de leitura/escrita; o modelo roda num pool de
+            # processos que compartilham os pesos via mmap
+            options["workers"] = workers
+            stream_workers = 1
+    
+    messages = read_messages(args.input, args.column, args.input_format)
+    writer, stream = open_writer(args.output, output_format)
+    
+    print(f"Classificando {args.input} com '{args.classifier}' ({workers} processo(s))...", file=sys.stderr)
+    start = time.perf_counter()
+    total = 0
+    toxic = 0
+    try:
+        for results in classify_stream(messages, args.classifier, options, stream_workers, args.chunk_size):
+            writer.write(results)
+            total += len(results)
+            toxic += sum(1 for r in results if r["label"] == "TÓXICA")
+            print(f"Processadas: {total}", file=sys.stderr)
+    finally:
+        writer.close()
+        if stream is not None:
+            stream.close()
+    
+    elapsed = time.perf_counter() - start
+    print(f"\n{total} mensagens classificadas em {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} msg/s)", file=sys.stderr)
+    if total:
+        print(f"  TOXICAS: {toxic} ({toxic/total*100:.1f}%)", file=sys.stderr)
+    if stream_workers <= 1 and args.classifier == "cascata":
+        stats = _worker_classifier.stats()
+        print(f"  Decididas pela regex: {stats['regex']} ({stats['regex_fraction']:.1%}), pelo modelo: {stats['model']}", file=sys.stderr)
+    if stream_workers <= 1 and args.cache_size > 0:
+        stats = _worker_classifier.cache.stats()
+        print(f"  Cache: {stats['hits']} acertos, {stats['misses']} faltas, {stats['evictions']} descartes", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
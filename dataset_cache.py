@@ -0,0 +1,271 @@
+"""
+Cache colunar dos conjuntos de dados brutos (xlsx, CSV, JSONL)
+
+Na primeira leitura, o arquivo é convertido para Parquet (com pyarrow) ou,
+sem pyarrow, para um pickle por coluna. As leituras seguintes vêm do cache:
+só as colunas pedidas são lidas e, no Parquet, o arquivo é mapeado em
+memória, então um intervalo de linhas não carrega o resto.
+
+O cache é refeito quando o arquivo de origem muda: tamanho e mtime iguais
+valem como "não mudou"; se só o mtime mudou (ex.: arquivo copiado de novo),
+o hash do conteúdo decide.
+
+Exemplo:
+    df = load_dataset("model_training/data/raw/mensagens_X_coletadas.xlsx", columns=["Mensagem"])
+    primeiras = load_dataset("ToLD-BR_fixed.csv", columns=["text"], rows=(0, 1000))
+
+Uso:
+    python dataset_cache.py model_training/data/raw/mensagens_X_coletadas.xlsx   # gera/atualiza o cache
+    python dataset_cache.py --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+CACHE_DIR = "model_training/data/cache"
+CACHE_FORMATS = ("parquet", "pickle")
+META_FILE = "meta.json"
+
+def file_digest(path, block_size=1024 * 1024):
+    """SHA-1 do conteúdo do arquivo"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def default_format():
+    """Parquet se o pyarrow estiver instalado, senão pickle por coluna"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return "pickle"
+    return "parquet"
+
+def read_source(path, **options):
+    """Lê o arquivo de origem inteiro com pandas (pela extensão)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xls"):
+        return pd.read_excel(path, **options)
+    if extension == ".csv":
+        return pd.read_csv(path, **options)
+    if extension in (".jsonl", ".json"):
+        return pd.read_json(path, lines=extension == ".jsonl", **options)
+    raise ValueError(f"Formato de dados nao suportado: {path}")
+
+def _row_range(rows, total):
+    """Normaliza rows ((início, fim), slice ou None) para (início, fim)"""
+    if rows is None:
+        return 0, total
+    if isinstance(rows, slice):
+        start, stop, step = rows.indices(total)
+        if step != 1:
+            raise ValueError("rows com passo diferente de 1 nao e suportado")
+        return start, max(start, stop)
+    start, stop = rows
+    return max(0, start), min(total, total if stop is None else stop)
+
+def _as_text(value):
+    if isinstance(value, str):
+        return value
+    return None if pd.isna(value) else str(value)
+
+class DatasetCache:
+    """Cache colunar de um arquivo de dados"""
+    
+    def __init__(self, source, cache_dir=CACHE_DIR, cache_format=None, **read_options):
+        """
+        Args:
+            source (str): Arquivo de origem (xlsx, csv, jsonl)
+            cache_dir (str): Pasta dos caches
+            cache_format (str): "parquet" ou "pickle" (padrão: pelo pyarrow)
+            **read_options: Repassados a read_source (ex.: sheet_name)
+        """
+        if cache_format is not None and cache_format not in CACHE_FORMATS:
+            raise ValueError(f"Formato de cache desconhecido: {cache_format}")
+        self.source = source
+        self.cache_format = cache_format or default_format()
+        self.read_options = read_options
+        
+        # Uma pasta por arquivo (e opções de leitura)
+        key = json.dumps([os.path.abspath(source), sorted(read_options.items())], default=str)
+        name = f"{os.path.basename(source)}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]}"
+        self.directory = os.path.join(cache_dir, name)
+        self._meta = None
+    
+    @property
+    def meta_path(self):
+        return os.path.join(self.directory, META_FILE)
+    
+    def _read_meta(self):
+        if self._meta is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self._meta = json.load(f)
+        return self._meta
+    
+    def _write_meta(self, meta):
+        with open(self.meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        self._meta = meta
+    
+    def is_valid(self):
+        """Diz se o cache existe e corresponde ao arquivo de origem atual"""
+        meta = self._read_meta()
+        if meta is None or meta["format"] != self.cache_format:
+            return False
+        stat = os.stat(self.source)
+        if stat.st_size != meta["size"]:
+            return False
+        if stat.st_mtime_ns == meta["mtime_ns"]:
+            return True
+        # Só o mtime mudou: confere o conteúdo e, se igual, guarda o novo mtime
+        if file_digest(self.source) != meta["sha1"]:
+            return False
+        self._write_meta({**meta, "mtime_ns": stat.st_mtime_ns})
+        return True
+    
+    def build(self):
+        """Lê o arquivo de origem e grava o cache"""
+        stat = os.stat(self.source)
+        df = read_source(self.source, **self.read_options)
+        
+        os.makedirs(self.directory, exist_ok=True)
+        # Sem meta.json o cache é inválido: uma gravação interrompida é refeita
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        self._meta = None
+        
+        columns = [str(column) for column in df.columns]
+        df.columns = columns
+        if self.cache_format == "parquet":
+            files = {column: "data.parquet" for column in columns}
+            self._write_parquet(df, os.path.join(self.directory, "data.parquet"))
+        else:
+            files = {}
+            for index, column in enumerate(columns):
+                files[column] = f"col{index}.pkl"
+                df[column].to_pickle(os.path.join(self.directory, files[column]))
+        
+        self._write_meta({
+            "source": os.path.abspath(self.source),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha1": file_digest(self.source),
+            "format": self.cache_format,
+            "read_options": {key: str(value) for key, value in self.read_options.items()},
+            "rows": len(df),
+            "columns": columns,
+            "files": files,
+            "created_at": time.time(),
+        })
+        return df
+    
+    @staticmethod
+    def _write_parquet(df, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Colunas com tipos misturados (comum em planilhas) viram texto
+            df = df.copy()
+            for column in df.columns[df.dtypes == object]:
+                df[column] = df[column].map(_as_text)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, path + ".tmp", row_group_size=64 * 1024)
+        os.replace(path + ".tmp", path)
+    
+    def load(self, columns=None, rows=None):
+        """
+        Lê do cache (gerando-o antes, se preciso)
+        
+        Args:
+            columns (list): Colunas a ler (padrão: todas)
+            rows (tuple | slice): Intervalo de linhas (início, fim)
+        
+        Returns:
+            pd.DataFrame: Índice de 0 a n-1 dentro do intervalo pedido
+        """
+        if not self.is_valid():
+            df = self.build()
+            columns = columns or list(df.columns)
+            start, stop = _row_range(rows, len(df))
+            return df[columns].iloc[start:stop].reset_index(drop=True)
+        
+        meta = self._read_meta()
+        columns = columns or meta["columns"]
+        missing = [column for column in columns if column not in meta["files"]]
+        if missing:
+            raise KeyError(f"Colunas nao encontradas em {self.source}: {missing}")
+        start, stop = _row_range(rows, meta["rows"])
+        
+        if meta["format"] == "parquet":
+            import pyarrow.parquet as pq
+            
+            table = pq.read_table(os.path.join(self.directory, "data.parquet"), columns=columns, memory_map=True)
+            return table.slice(start, stop - start).to_pandas()
+        
+        data = {
+            column: pd.read_pickle(os.path.join(self.directory, meta["files"][column])).iloc[start:stop]
+            for column in columns
+        }
+        return pd.DataFrame(data).reset_index(drop=True)
+    
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._meta = None
+
+def load_dataset(source, columns=None, rows=None, cache_dir=CACHE_DIR, use_cache=True, **read_options):
+    """
+    Carrega um arquivo de dados pelo cache colunar
+    
+    Args:
+        source (str): Arquivo de origem (xlsx, csv, jsonl)
+        columns (list): Colunas a ler (padrão: todas)
+        rows (tuple | slice): Intervalo de linhas (início, fim)
+        use_cache (bool): False lê direto da origem, sem cache
+        **read_options: Repassados à leitura da origem (ex.: sheet_name)
+    """
+    if not use_cache:
+        df = read_source(source, **read_options)
+        df.columns = [str(column) for column in df.columns]
+        start, stop = _row_range(rows, len(df))
+        return df[columns or list(df.columns)].iloc[start:stop].reset_index(drop=True)
+    return DatasetCache(source, cache_dir, **read_options).load(columns, rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera/atualiza o cache colunar dos conjuntos de dados")
+    parser.add_argument("sources", nargs="*", help="Arquivos de dados (xlsx, csv, jsonl)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--format", choices=CACHE_FORMATS, help="Formato do cache (padrao: parquet se houver pyarrow)")
+    parser.add_argument("--clear", action="store_true", help="Apaga o cache (dos arquivos dados, ou todo)")
+    args = parser.parse_args(argv)
+    
+    if args.clear:
+        if args.sources:
+            for source in args.sources:
+                DatasetCache(source, args.cache_dir, args.format).clear()
+        else:
+            shutil.rmtree(args.cache_dir, ignore_errors=True)
+        print(f"[OK] Cache apagado: {args.cache_dir}")
+        return
+    
+    for source in args.sources:
+        cache = DatasetCache(source, args.cache_dir, args.format)
+        start = time.perf_counter()
+        status = "em dia" if cache.is_valid() else "gerado"
+        if status == "gerado":
+            cache.build()
+        meta = cache._read_meta()
+        print(f"[OK] {source}: {meta['rows']} linhas, {len(meta['columns'])} colunas, "
+              f"{meta['format']} {status} em {time.perf_counter() - start:.2f}s ({cache.directory})")
+
+if __name__ == "__main__":
+    main()
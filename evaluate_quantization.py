@@ -0,0 +1,132 @@
+"""
+Compara o modelo Transfer Learning em float32 e quantizado em int8 (CPU)
+
+Avalia os dois no conjunto de teste (test.json gerado por
+prepare_data_transfer_learning.py) e mostra acurácia, latência e memória
+dos pesos. Na primeira execução, a cópia int8 é gravada na pasta do modelo.
+
+Uso:
+    python evaluate_quantization.py
+    python evaluate_quantization.py --limit 200 --batch-size 16
+    python evaluate_quantization.py --only int8
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'  # Desabilitar warnings
+
+from transfer_learning_classifier import MODEL_PATH, TransferLearningClassifier
+
+TEST_FILE = "model_training/data/processed/test.json"
+PREFIX = "Classifique: "
+
+def load_test_set(path, limit=None):
+    """Lê (texto, rótulo) do test.json no formato de chat"""
+    examples = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            messages = {m["role"]: m["content"] for m in json.loads(line)["messages"]}
+            text = messages["user"]
+            if text.startswith(PREFIX):
+                text = text[len(PREFIX):]
+            examples.append((text, messages["assistant"]))
+            if limit and len(examples) >= limit:
+                break
+    return examples
+
+def weights_size_mb(model):
+    """Memória ocupada pelos pesos (inclui os pesos int8 empacotados)"""
+    total = 0
+    for value in model.state_dict().values():
+        if hasattr(value, "element_size"):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, tuple):
+            # Linear dinâmica: (pesos empacotados, bias)
+            for item in value:
+                if hasattr(item, "element_size"):
+                    total += item.numel() * item.element_size()
+    return total / 1024 ** 2
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def evaluate(classifier, examples, batch_size):
+    """Acurácia no teste e latência por mensagem e por lote"""
+    # Aquecimento (primeira chamada aloca buffers)
+    classifier.toxic_probabilities([examples[0][0]])
+    
+    single = []
+    for text, _ in examples[:50]:
+        start = time.perf_counter()
+        classifier.toxic_probability(text)
+        single.append((time.perf_counter() - start) * 1000)
+    
+    texts = [text for text, _ in examples]
+    start = time.perf_counter()
+    probabilities = classifier.toxic_probabilities(texts, batch_size)
+    batch_elapsed = time.perf_counter() - start
+    
+    correct = sum(
+        ("TOXICA" if p >= 0.5 else "NAO_TOXICA") == label
+        for p, (_, label) in zip(probabilities, examples)
+    )
+    return {
+        "accuracy": correct / len(examples),
+        "latency_p50_ms": percentile(single, 50),
+        "latency_p95_ms": percentile(single, 95),
+        "throughput_msg_s": len(examples) / batch_elapsed,
+        "weights_mb": weights_size_mb(classifier.model),
+        "probabilities": probabilities,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Acuracia e latencia: float32 x int8")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--test-file", default=TEST_FILE)
+    parser.add_argument("--limit", type=int, default=None, help="Usar apenas os N primeiros exemplos")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--only", choices=("float32", "int8"), help="Avaliar apenas uma das versoes")
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.test_file):
+        print(f"ERRO: {args.test_file} nao encontrado!")
+        print("Execute primeiro: python prepare_data_transfer_learning.py")
+        return 1
+    
+    examples = load_test_set(args.test_file, args.limit)
+    print(f"{len(examples)} exemplos de teste")
+    
+    results = {}
+    for name in ("float32", "int8"):
+        if args.only and args.only != name:
+            continue
+        print(f"\nAvaliando {name}...")
+        start = time.perf_counter()
+        classifier = TransferLearningClassifier(args.model_path, quantize=(name == "int8"))
+        load_time = time.perf_counter() - start
+        results[name] = evaluate(classifier, examples, args.batch_size)
+        results[name]["load_s"] = load_time
+        del classifier
+    
+    print("\n" + "=" * 60)
+    print(f"{'':10}{'acuracia':>10}{'p50 ms':>10}{'p95 ms':>10}{'msg/s':>10}{'pesos MB':>10}{'carga s':>10}")
+    for name, r in results.items():
+        print(
+            f"{name:10}{r['accuracy']:>10.1%}{r['latency_p50_ms']:>10.1f}{r['latency_p95_ms']:>10.1f}"
+            f"{r['throughput_msg_s']:>10.1f}{r['weights_mb']:>10.1f}{r['load_s']:>10.1f}"
+        )
+    
+    if len(results) == 2:
+        pairs = zip(results["float32"]["probabilities"], results["int8"]["probabilities"])
+        agreement = sum((a >= 0.5) == (b >= 0.5) for a, b in pairs) / len(examples)
+        speedup = results["float32"]["latency_p50_ms"] / results["int8"]["latency_p50_ms"]
+        print(f"\nConcordancia float32 x int8: {agreement:.1%}  |  speedup p50: {speedup:.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""
+Exporta o modelo Transfer Learning para ONNX (grafo de pontuação)
+
+O grafo não gera texto: recebe o prompt já seguido da resposta candidata
+e devolve o log-prob de cada um dos últimos tokens, que é o necessário para
+comparar TOXICA x NAO_TOXICA. O resultado é otimizado pelo ONNX Runtime e
+gravado junto do tokenizer e dos metadados usados por onnx_classifier.py.
+
+Uso:
+    python export_onnx.py
+    python export_onnx.py --model-path models/toxicity_transfer_learning --output models/toxicity_onnx
+
+Requer: torch, transformers, onnx e onnxruntime (apenas para exportar)
+"""
+import argparse
+import inspect
+import json
+import os
+import shutil
+
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'  # Desabilitar warnings
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from onnx_classifier import METADATA_FILE, MODEL_FILE, ONNX_PATH
+from prompt_format import ANSWER_TAG, LABELS, MAX_LENGTH, build_prompt
+from transfer_learning_classifier import MODEL_PATH
+
+RAW_FILE = "scoring_raw.onnx"
+
+class ScoringModule(torch.nn.Module):
+    """
+    Modelo causal reduzido à pontuação das últimas posições
+    
+    Saída: token_logprobs [lote, keep - 1], o log-prob de cada um dos
+    últimos keep - 1 tokens de input_ids dado o que vem antes. O lm_head só
+    é aplicado às últimas keep posições.
+    """
+    
+    def __init__(self, model, keep):
+        super().__init__()
+        self.decoder = model.get_decoder()
+        self.lm_head = model.get_output_embeddings()
+        self.keep = keep
+    
+    def forward(self, input_ids, attention_mask, position_ids):
+        hidden = self.decoder(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            use_cache=False
+        ).last_hidden_state
+        logits = self.lm_head(hidden[:, -self.keep:]).float()
+        # logits[t] prevê o token t+1: alinhar com os tokens finais
+        logprobs = torch.log_softmax(logits[:, :-1], dim=-1)
+        targets = input_ids[:, -(self.keep - 1):]
+        return logprobs.gather(-1, targets.unsqueeze(-1)).squeeze(-1)
+
+def label_token_ids(tokenizer):
+    """Tokens de cada resposta, como aparecem logo após o prompt"""
+    reference = tokenizer(build_prompt("x"))["input_ids"]
+    label_ids = {}
+    for label in LABELS:
+        full = tokenizer(build_prompt("x") + label)["input_ids"]
+        if full[:len(reference)] != reference:
+            raise ValueError(f"Tokenização instável na fronteira da resposta {label}")
+        label_ids[label] = full[len(reference):]
+    return label_ids
+
+def export(model_path=MODEL_PATH, output=ONNX_PATH, opset=17):
+    """Exporta, otimiza e grava o modelo de pontuação em output"""
+    import onnxruntime as ort
+    
+    os.makedirs(output, exist_ok=True)
+    
+    print("1. Carregando modelo...")
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        trust_remote_code=True,
+        torch_dtype=torch.float32,
+        attn_implementation="eager"
+    )
+    model.eval()
+    
+    label_ids = label_token_ids(tokenizer)
+    keep = max(len(ids) for ids in label_ids.values()) + 1
+    module = ScoringModule(model, keep)
+    
+    print("2. Exportando grafo de pontuação...")
+    sample = tokenizer(build_prompt("exemplo de mensagem") + LABELS[0], return_tensors="pt")
+    input_ids = sample["input_ids"].repeat(2, 1)
+    attention_mask = torch.ones_like(input_ids)
+    position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+    
+    export_options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Exportador TorchScript: aceita dynamic_axes diretamente
+        export_options["dynamo"] = False
+    raw_path = os.path.join(output, RAW_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            (input_ids, attention_mask, position_ids),
+            raw_path,
+            input_names=["input_ids", "attention_mask", "position_ids"],
+            output_names=["token_logprobs"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "position_ids": {0: "batch", 1: "sequence"},
+                "token_logprobs": {0: "batch"},
+            },
+            opset_version=opset,
+            **export_options
+        )
+    
+    print("3. Otimizando grafo (ONNX Runtime)...")
+    options = ort.SessionOptions()
+    # Otimizações portáveis; as específicas do hardware são feitas ao carregar
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = os.path.join(output, MODEL_FILE)
+    ort.InferenceSession(raw_path, options, providers=["CPUExecutionProvider"])
+    os.remove(raw_path)
+    
+    print("4. Gravando tokenizer e metadados...")
+    tokenizer_file = os.path.join(model_path, "tokenizer.json")
+    if not os.path.exists(tokenizer_file):
+        tokenizer.save_pretrained(output)
+    else:
+        shutil.copy(tokenizer_file, os.path.join(output, "tokenizer.json"))
+    
+    # O tokenizer "puro" pode não inserir o BOS que o AutoTokenizer insere
+    from tokenizers import Tokenizer
+    raw_ids = Tokenizer.from_file(os.path.join(output, "tokenizer.json")).encode(build_prompt("x")).ids
+    reference = tokenizer(build_prompt("x"))["input_ids"]
+    prepend = reference[:len(reference) - len(raw_ids)] if reference[-len(raw_ids):] == raw_ids else []
+    if raw_ids != reference[len(prepend):]:
+        raise ValueError("Tokenizer exportado difere do AutoTokenizer")
+    
+    pad_id = tokenizer.pad_token_id
+    if pad_id is None:
+        pad_id = tokenizer.eos_token_id
+    metadata = {
+        "source": os.path.abspath(model_path),
+        "labels": list(LABELS),
+        "label_ids": label_ids,
+        "keep": keep,
+        "max_length": MAX_LENGTH,
+        "tail_length": len(tokenizer(ANSWER_TAG, add_special_tokens=False)["input_ids"]),
+        "prepend_ids": prepend,
+        "pad_id": pad_id,
+    }
+    with open(os.path.join(output, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    
+    print(f"\n[OK] Modelo ONNX salvo em {output}")
+    return output
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta o modelo Transfer Learning para ONNX")
+    parser.add_argument("--model-path", default=MODEL_PATH, help="Pasta do modelo treinado")
+    parser.add_argument("--output", default=ONNX_PATH, help="Pasta de saida do modelo ONNX")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args(argv)
+    export(args.model_path, args.output, args.opset)
+
+if __name__ == "__main__":
+    main()
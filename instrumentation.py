@@ -0,0 +1,281 @@
+"""
+Instrumentação dos caminhos quentes dos classificadores
+
+Contadores e tempos ficam num registro único do processo (metrics). Com a
+instrumentação desligada (padrão), o custo é uma checagem de atributo por
+chamada. Os componentes com estatísticas próprias (cache, cascata, serviço)
+se registram como fontes e entram no snapshot.
+
+Variáveis de ambiente:
+    TOXICITY_METRICS=1            liga contadores e tempos
+    TOXICITY_METRICS_SAMPLE=0.01  fração das chamadas com tempo por categoria
+    TOXICITY_PROFILE=0.001        fração das chamadas perfiladas com cProfile
+    TOXICITY_PROFILE_OUT=arq.prof grava o perfil acumulado ao sair
+
+Exemplo:
+    from instrumentation import metrics
+    metrics.enable()
+    classifier.classify("Você é um idiota")
+    print(metrics.prometheus())
+"""
+import atexit
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+PREFIX = "toxicity_"
+
+# Limites (segundos) dos histogramas de tempo
+BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+
+def _env_float(name, default=0.0):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+class Metrics:
+    """Registro de contadores, histogramas de tempo e fontes de estatísticas"""
+    
+    def __init__(self, enabled=False, sample_rate=0.01):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._counters = {}   # nome -> {labels: valor}
+        self._timers = {}     # nome -> {labels: [contagem, soma, máximo, buckets]}
+        self._sources = {}    # tipo -> [weakref]
+        self._reported = set()
+    
+    def enable(self, sample_rate=None):
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        self.enabled = True
+    
+    def disable(self):
+        self.enabled = False
+    
+    def sampled(self):
+        """Sorteia se a chamada atual entra na amostra detalhada"""
+        return self.enabled and random.random() < self.sample_rate
+    
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+    
+    def observe(self, name, seconds, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._timers.setdefault(name, {})
+            timer = series.get(key)
+            if timer is None:
+                timer = series[key] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    timer[3][i] += 1
+                    break
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mede o bloco (só se a instrumentação estiver ligada)"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    def register_source(self, kind, obj):
+        """
+        Registra um objeto com método stats() (cache, cascata, serviço)
+        
+        Guarda só uma referência fraca: objetos descartados somem do snapshot.
+        """
+        with self._lock:
+            sources = self._sources.setdefault(kind, [])
+            sources[:] = [ref for ref in sources if ref() is not None]
+            sources.append(weakref.ref(obj))
+    
+    def record_fallback(self, component, error):
+        """
+        Conta um retorno ao classificador simples, por motivo
+        
+        Avisa (no stderr) na primeira ocorrência de cada motivo, para a falha
+        não passar despercebida, sem inundar a saída em produção nem misturar
+        o aviso a resultados gravados no stdout (classify_file.py).
+        """
+        reason = type(error).__name__
+        self.inc("fallbacks_total", component=component, reason=reason)
+        with self._lock:
+            first = (component, reason) not in self._reported
+            self._reported.add((component, reason))
+        if first:
+            print(f"[AVISO] {component}: {reason}: {error} (usando classificador simples)", file=sys.stderr)
+    
+    def _source_stats(self):
+        with self._lock:
+            sources = {kind: [ref() for ref in refs] for kind, refs in self._sources.items()}
+        return {
+            kind: [obj.stats() for obj in objs if obj is not None]
+            for kind, objs in sources.items()
+        }
+    
+    def snapshot(self):
+        """Estado atual em um dicionário serializável em JSON"""
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            timers = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": count,
+                        "sum_seconds": total,
+                        "mean_seconds": total / count if count else 0.0,
+                        "max_seconds": maximum,
+                        "buckets": dict(zip(map(str, BUCKETS), buckets)),
+                    }
+                    for key, (count, total, maximum, buckets) in series.items()
+                ]
+                for name, series in self._timers.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "counters": counters,
+            "timers": timers,
+            "sources": self._source_stats(),
+            "profiled_calls": profiler.calls,
+        }
+    
+    def prometheus(self):
+        """Estado atual no formato texto do Prometheus"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for key, value in series.items():
+                    lines.append(f"{PREFIX}{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._timers.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for key, (count, total, _, buckets) in series.items():
+                    cumulative = 0
+                    for bound, hits in zip(BUCKETS, buckets):
+                        cumulative += hits
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {total}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {count}")
+        
+        # Fontes: valores numéricos viram gauges, com o índice da instância
+        for kind, stats_list in sorted(self._source_stats().items()):
+            for index, stats in enumerate(stats_list):
+                for key, value in stats.items():
+                    # Um nível de dicionário vira o rótulo "key" (ex.: pedidos por classificador)
+                    values = value.items() if isinstance(value, dict) else [(None, value)]
+                    for label, number in values:
+                        if isinstance(number, bool) or not isinstance(number, (int, float)):
+                            continue
+                        extra = [("instance", index)] + ([("key", label)] if label is not None else [])
+                        lines.append(f"{PREFIX}{kind}_{key}{_format_labels((), extra)} {number}")
+        return "\n".join(lines) + "\n"
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self._reported.clear()
+
+class SamplingProfiler:
+    """
+    Perfila com cProfile uma fração das chamadas e acumula os resultados
+    
+    Só uma chamada é perfilada por vez (cProfile não suporta perfis
+    simultâneos); chamadas sorteadas enquanto outra está sendo perfilada
+    rodam normalmente.
+    """
+    
+    def __init__(self, rate=0.0, output=None):
+        self.rate = rate
+        self.output = output
+        self.calls = 0
+        self._stats = None
+        self._busy = threading.Lock()
+        if output:
+            atexit.register(self.dump)
+    
+    def run(self, function, *args, **kwargs):
+        if random.random() >= self.rate or not self._busy.acquire(blocking=False):
+            return function(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.calls += 1
+            self._busy.release()
+    
+    def report(self, limit=30, sort="cumulative"):
+        """Funções mais caras nas chamadas perfiladas (texto do pstats)"""
+        if self._stats is None:
+            return "Nenhuma chamada perfilada (defina TOXICITY_PROFILE, ex.: 0.001)\n"
+        stream = io.StringIO()
+        with self._busy:
+            self._stats.stream = stream
+            self._stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+    
+    def dump(self, path=None):
+        """Grava o perfil acumulado (abre com pstats ou snakeviz)"""
+        path = path or self.output
+        if path and self._stats is not None:
+            with self._busy:
+                self._stats.dump_stats(path)
+
+metrics = Metrics(
+    enabled=os.environ.get("TOXICITY_METRICS", "0") == "1",
+    sample_rate=_env_float("TOXICITY_METRICS_SAMPLE", 0.01)
+)
+profiler = SamplingProfiler(_env_float("TOXICITY_PROFILE"), os.environ.get("TOXICITY_PROFILE_OUT"))
+
+def profiled(function):
+    """
+    Perfila uma amostra das chamadas do método decorado
+    
+    Sem TOXICITY_PROFILE, devolve a própria função: custo zero.
+    """
+    if profiler.rate <= 0:
+        return function
+    
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return profiler.run(function, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,311 @@
+"""
+Pré-filtro de palavras-chave (Aho-Corasick) para o classificador rápido
+
+Extrai dos padrões regex as palavras literais que obrigatoriamente aparecem
+em qualquer match e monta um autômato Aho-Corasick sobre elas. Uma única
+passada linear pelo texto diz quais padrões *podem* casar; os demais nem
+precisam ser testados.
+"""
+import _sre
+from collections import deque
+from functools import lru_cache
+from itertools import product
+
+try:
+    from re import _parser as sre_parse
+    from re._casefix import _EXTRA_CASES
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_compile import _ignorecase_fixes as _EXTRA_CASES
+
+try:
+    import ahocorasick  # pyahocorasick (opcional, implementação em C)
+except ImportError:
+    ahocorasick = None
+
+# Limite de combinações ao expandir classes como [oa] e alternativas
+MAX_EXPANSION = 64
+
+@lru_cache(maxsize=None)
+def fold_char(char):
+    """
+    Representante do caractere na comparação do re.IGNORECASE.
+    
+    O re compara pela minúscula simples (um caractere: 'İ' -> 'i') e ainda
+    iguala alguns pares extras ('ı' e 'i', 'ſ' e 's', 'µ' e 'μ'); casefold()
+    e lower() não fazem o mesmo.
+    """
+    lower = _sre.unicode_tolower(ord(char))
+    return chr(min((lower,) + _EXTRA_CASES.get(lower, ())))
+
+def fold_case(text):
+    """
+    Normaliza o texto para buscar literais como o re.IGNORECASE os casaria.
+    
+    Troca caractere por caractere, então as posições valem no texto original.
+    """
+    if text.isascii():
+        return text.lower()
+    return text.translate({ord(char): fold_char(char) for char in set(text)})
+
+def _expand(left, right):
+    """Concatena dois conjuntos de strings (produto cartesiano)"""
+    if left is None or right is None or len(left) * len(right) > MAX_EXPANSION:
+        return None
+    return {a + b for a, b in product(left, right)}
+
+def _score(candidates):
+    """Quanto maior o menor literal, mais seletivo é o conjunto"""
+    return (min(len(c) for c in candidates), -len(candidates))
+
+def _analyze(items):
+    """
+    Analisa uma sequência do parser de regex.
+    
+    Returns:
+        tuple: (exact, required)
+            exact: conjunto finito de strings que a sequência pode casar, ou None
+            required: conjunto de literais dos quais ao menos um aparece em
+                      qualquer match, ou None se não for possível garantir
+    """
+    run = {""}
+    exact_possible = True
+    candidates = []
+    
+    def close_run():
+        if run and all(run):
+            candidates.append(run)
+    
+    for op, av in items:
+        exact, required = _analyze_item(op, av)
+        expanded = _expand(run, exact)
+        if expanded is not None:
+            run = expanded
+            continue
+        
+        exact_possible = False
+        close_run()
+        if required:
+            candidates.append(required)
+        run = {""}
+    close_run()
+    
+    exact = run if exact_possible else None
+    required = max(candidates, key=_score) if candidates else None
+    return exact, required
+
+def _analyze_item(op, av):
+    """Analisa um único nó do parser de regex"""
+    if op is sre_parse.LITERAL:
+        return {fold_char(chr(av))}, {fold_char(chr(av))}
+    
+    if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        # Asserções não consomem texto
+        return {""}, None
+    
+    if op is sre_parse.IN:
+        chars = set()
+        for item_op, item_av in av:
+            if item_op is sre_parse.LITERAL:
+                chars.add(fold_char(chr(item_av)))
+            elif item_op is sre_parse.RANGE and item_av[1] - item_av[0] < 16:
+                chars.update(fold_char(chr(c)) for c in range(item_av[0], item_av[1] + 1))
+            else:
+                return None, None
+        return chars, chars
+    
+    if op is sre_parse.SUBPATTERN:
+        return _analyze(av[-1])
+    
+    if op is sre_parse.BRANCH:
+        results = [_analyze(branch) for branch in av[1]]
+        exact = set()
+        for branch_exact, _ in results:
+            if exact is None or branch_exact is None:
+                exact = None
+            else:
+                exact |= branch_exact
+        if exact is not None and len(exact) > MAX_EXPANSION:
+            exact = None
+        
+        required = set()
+        for branch_exact, branch_required in results:
+            options = branch_exact if branch_exact and all(branch_exact) else branch_required
+            if not options:
+                required = None
+                break
+            required |= options
+        return exact, required
+    
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+        low, high, sub = av
+        sub_exact, sub_required = _analyze(sub)
+        if low == 0:
+            if high == 1 and sub_exact is not None:
+                return sub_exact | {""}, None
+            return None, None
+        return None, sub_required
+    
+    return None, None
+
+def extract_literals(pattern):
+    """
+    Extrai os literais obrigatórios de um padrão regex.
+    
+    Args:
+        pattern (str): Padrão regex
+    
+    Returns:
+        set: Literais (em fold_case) dos quais ao menos um aparece em qualquer
+             match do padrão, ou None se o padrão não puder ser pré-filtrado
+    """
+    try:
+        exact, required = _analyze(sre_parse.parse(pattern))
+    except Exception:
+        return None
+    
+    if exact is not None and all(exact):
+        return exact
+    return required
+
+class AhoCorasick:
+    """
+    Autômato Aho-Corasick em Python puro.
+    
+    Usado quando o pacote opcional pyahocorasick não está instalado.
+    """
+    
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        
+        for keyword in keywords:
+            self._add(keyword)
+        self._build()
+    
+    def _add(self, keyword):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            node = next_node
+        self._output[node].add(keyword)
+    
+    def _build(self):
+        """Calcula os links de falha em largura (BFS)"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] |= self._output[self._fail[child]]
+    
+    def find(self, text):
+        """Retorna o conjunto de palavras-chave presentes no texto"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found |= output[node]
+        return found
+
+class _PyAhoCorasick:
+    """Adaptador para o autômato em C do pyahocorasick"""
+    
+    def __init__(self, keywords):
+        self._automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            self._automaton.add_word(keyword, keyword)
+        self._automaton.make_automaton()
+    
+    def find(self, text):
+        return {keyword for _, keyword in self._automaton.iter(text)}
+
+class KeywordPrefilter:
+    """
+    Pré-filtro que mapeia palavras-chave encontradas para padrões candidatos.
+    
+    Exemplo:
+        prefilter = KeywordPrefilter([r"(idiota|burr[oa])", r"(porra|merda)"])
+        candidates = prefilter.candidates("você é um idiota")  # {0}
+    """
+    
+    def __init__(self, patterns):
+        self._keyword_patterns = {}
+        self._always = set()
+        
+        for index, pattern in enumerate(patterns):
+            literals = extract_literals(pattern)
+            if not literals:
+                # Sem literal obrigatório: o padrão é sempre testado
+                self._always.add(index)
+                continue
+            for literal in literals:
+                self._keyword_patterns.setdefault(literal, set()).add(index)
+        
+        keywords = list(self._keyword_patterns)
+        if ahocorasick is not None:
+            self._automaton = _PyAhoCorasick(keywords)
+        else:
+            self._automaton = AhoCorasick(keywords)
+    
+    @property
+    def keywords(self):
+        """Palavras-chave indexadas no autômato"""
+        return set(self._keyword_patterns)
+    
+    def candidates(self, text):
+        """
+        Retorna os índices dos padrões que podem casar com o texto.
+        
+        Args:
+            text (str): Texto a ser verificado
+        
+        Returns:
+            set: Índices dos padrões candidatos
+        """
+        found = self._automaton.find(fold_case(text))
+        indices = set(self._always)
+        for keyword in found:
+            indices |= self._keyword_patterns[keyword]
+        return indices
+
+if __name__ == "__main__":
+    # Teste: com e sem pré-filtro, o classificador dá o mesmo resultado,
+    # inclusive com caracteres que o re.IGNORECASE iguala a letras ASCII
+    import sys
+    from simple_classifier import ToxicityClassifier
+    
+    texts = [
+        "Bom dia! Como você está?",
+        "Você é um idiota completo",
+        "Vai se f*der seu lixo",
+        "ıdıota", "idıota", "İDİOTA", "preto ſujo", "mulher na cozınha",
+        "KKK burro", "idiotȧ", "SUA ÉGUA",
+    ]
+    baseline = ToxicityClassifier(use_prefilter=False, linear_time=False)
+    prefiltered = ToxicityClassifier(linear_time=False)
+    failures = 0
+    for text in texts:
+        expected, result = baseline.classify(text), prefiltered.classify(text)
+        if result != expected:
+            failures += 1
+            print(f"[AVISO] {text!r}: pre-filtro {result['label']} x sem pre-filtro {expected['label']}")
+    
+    if failures:
+        sys.exit(1)
+    print("[OK] Resultados com e sem pre-filtro iguais")
@@ -1,32 +1,70 @@
 """
 Script para rotular os dados do mensagens_X_coletadas.xlsx
 """
-import pandas as pd
+import argparse
+import contextlib
+import io
 import json
 import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import load_dataset
+from label_store import LABEL_DB_FILE, SOURCE_AUTO, SOURCE_MANUAL, LabelStore, message_hash
 
 # Caminhos
 XLSX_FILE = "model_training/data/raw/mensagens_X_coletadas.xlsx"
 LABELED_FILE = "model_training/data/processed/mensagens_rotuladas.json"
+CATEGORIES_FILE = "model_training/data/processed/mensagens_categorias.json"
+
+# Mensagens por bloco enviado a cada processo na rotulação automática
+AUTO_CHUNK_SIZE = 20000
+
+# Palavras-chave do --auto antigo (antes do banco de rótulos); só servem para
+# reconhecer, no JSON antigo, os rótulos que não vieram de revisão
+LEGACY_TOXIC_KEYWORDS = [
+    'puto', 'puta', 'caralho', 'merda', 'idiota', 'burro', 'estupido',
+    'imbecil', 'otario', 'desgraca', 'corno', 'viado', 'bicha',
+    'lixo', 'vagabundo', 'fdp', 'filho da puta', 'foder', 'fuder'
+]
 
 def load_messages():
     """Carrega mensagens do Excel"""
     print("Carregando mensagens...")
-    df = pd.read_excel(XLSX_FILE)
+    df = load_dataset(XLSX_FILE, columns=['Mensagem'])
     return df['Mensagem'].tolist()
 
 def load_existing_labels():
-    """Carrega labels já existentes"""
+    """Carrega labels já existentes (JSON exportado)"""
     if os.path.exists(LABELED_FILE):
         with open(LABELED_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     return {}
 
-def save_labels(labels):
-    """Salva labels"""
-    os.makedirs(os.path.dirname(LABELED_FILE), exist_ok=True)
-    with open(LABELED_FILE, 'w', encoding='utf-8') as f:
-        json.dump(labels, f, ensure_ascii=False, indent=2)
+def legacy_keyword_label(message):
+    """Rótulo que o --auto antigo (palavras-chave) dava à mensagem"""
+    msg_lower = str(message).lower()
+    return 'TOXICA' if any(word in msg_lower for word in LEGACY_TOXIC_KEYWORDS) else 'NAO_TOXICA'
+
+def open_store(messages):
+    """Abre o banco de rótulos, importando o JSON antigo na primeira vez"""
+    store = LabelStore()
+    if len(store) == 0 and os.path.exists(LABELED_FILE):
+        # Rótulos iguais aos do --auto antigo serão refeitos pelo --auto;
+        # os diferentes vieram de revisão e ficam como manuais
+        imported = store.import_json(messages, LABELED_FILE, legacy_keyword_label)
+        print(f"{sum(imported.values())} rotulos importados de {LABELED_FILE} "
+              f"({imported.get(SOURCE_MANUAL, 0)} revisados, mantidos como manuais)")
+    return store
+
+def export_labels(store, messages):
+    """Atualiza o JSON lido por prepare_data_transfer_learning.py"""
+    store.export_json(messages, LABELED_FILE)
+    return load_existing_labels()
 
 def label_messages():
     """Interface para rotular mensagens"""
@@ -41,125 +79,188 @@ def label_messages():
     print("=" * 60)
     
     messages = load_messages()
-    labels = load_existing_labels()
+    store = open_store(messages)
+    labeled = store.labeled_hashes()
+    pending = [i for i, msg in enumerate(messages) if message_hash(msg) not in labeled]
     
     print(f"\nTotal de mensagens: {len(messages)}")
-    print(f"Ja rotuladas: {len(labels)}")
-    print(f"Faltam: {len(messages) - len(labels)}\n")
+    print(f"Ja rotuladas: {len(messages) - len(pending)}")
+    print(f"Faltam: {len(pending)}\n")
     
-    for i, msg in enumerate(messages):
-        # Pular se já rotulada
-        if str(i) in labels:
-            continue
-        
-        print(f"\n[{i+1}/{len(messages)}] Mensagem:")
-        print(f"'{msg}'")
-        print("\nClassificacao: ", end='')
-        
-        choice = input().strip().upper()
-        
-        if choice == 'T':
-            labels[str(i)] = 'TOXICA'
-            print("-> TOXICA")
-        elif choice == 'N':
-            labels[str(i)] = 'NAO_TOXICA'
-            print("-> NAO TOXICA")
-        elif choice == 'P':
-            print("-> PULADO")
-            continue
-        elif choice == 'S':
-            print("\nSalvando e saindo...")
-            break
-        else:
-            print("Opcao invalida! Pulando...")
-            continue
+    # Cada rótulo é gravado na hora: sair (ou cair) não perde a sessão
+    try:
+        for i in pending:
+            msg = messages[i]
+            print(f"\n[{i+1}/{len(messages)}] Mensagem:")
+            print(f"'{msg}'")
+            print("\nClassificacao: ", end='')
+            
+            choice = input().strip().upper()
+            
+            if choice == 'T':
+                store.set(msg, 'TOXICA', SOURCE_MANUAL)
+                print("-> TOXICA")
+            elif choice == 'N':
+                store.set(msg, 'NAO_TOXICA', SOURCE_MANUAL)
+                print("-> NAO TOXICA")
+            elif choice == 'P':
+                print("-> PULADO")
+                continue
+            elif choice == 'S':
+                print("\nSalvando e saindo...")
+                break
+            else:
+                print("Opcao invalida! Pulando...")
+                continue
+    except (KeyboardInterrupt, EOFError):
+        print("\n\nInterrompido: rotulos ja gravados foram mantidos")
     
-    save_labels(labels)
+    labels = export_labels(store, messages)
+    store.close()
     print(f"\n{len(labels)} mensagens rotuladas salvas!")
-    print(f"Arquivo: {LABELED_FILE}")
+    print(f"Arquivo: {LABELED_FILE} (banco: {store.path})")
 
-def auto_label_with_keywords():
-    """Rotulação automática inicial usando palavras-chave"""
+_worker_classifier = None
+
+def _init_auto_worker():
+    """Cria o classificador rápido uma vez por processo"""
+    global _worker_classifier
+    from simple_classifier import ToxicityClassifier
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_classifier = ToxicityClassifier()
+
+def _auto_label_chunk(messages):
+    """Rótulo e categorias de um bloco (uma passada vetorizada por regra)"""
+    categories = list(_worker_classifier.toxic_patterns)
+    result = _worker_classifier.classify_series(pd.Series(messages, dtype=object))
+    labels = np.where(result["label"] == "TÓXICA", 'TOXICA', 'NAO_TOXICA').tolist()
+    found = [[] for _ in labels]
+    for category in categories:
+        for row in np.flatnonzero(result[category].to_numpy()).tolist():
+            found[row].append(category)
+    return list(zip(labels, found))
+
+def auto_label(messages, workers=None, chunk_size=AUTO_CHUNK_SIZE):
+    """
+    Rotula as mensagens com as regras do classificador rápido
+    
+    Os blocos são classificados com ToxicityClassifier.classify_series e,
+    com workers > 1, distribuídos num pool de processos.
+    
+    Returns:
+        list: (rótulo, categorias encontradas) de cada mensagem, na ordem
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [messages[i:i + chunk_size] for i in range(0, len(messages), chunk_size)]
+    workers = min(workers, len(chunks)) or 1
+    
+    results = []
+    if workers == 1:
+        _init_auto_worker()
+        for chunk in chunks:
+            results.extend(_auto_label_chunk(chunk))
+            print(f"Processadas: {len(results)}/{len(messages)}")
+        return results
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_auto_worker) as executor:
+        for chunk_results in executor.map(_auto_label_chunk, chunks):
+            results.extend(chunk_results)
+            print(f"Processadas: {len(results)}/{len(messages)}")
+    return results
+
+def auto_label_with_patterns(workers=None, save_categories=False):
+    """Rotulação automática inicial usando as regras do classificador rápido"""
     print("=" * 60)
     print("ROTULACAO AUTOMATICA INICIAL")
     print("=" * 60)
     
     messages = load_messages()
-    labels = {}
-    
-    # Palavras-chave tóxicas
-    toxic_keywords = [
-        'puto', 'puta', 'caralho', 'merda', 'idiota', 'burro', 'estupido',
-        'imbecil', 'otario', 'desgraca', 'corno', 'viado', 'bicha',
-        'lixo', 'vagabundo', 'fdp', 'filho da puta', 'foder', 'fuder'
-    ]
-    
-    print("\nAnalisando mensagens...")
-    for i, msg in enumerate(messages):
-        msg_lower = msg.lower()
-        
-        # Verificar se contém palavras tóxicas
-        toxic_count = sum(1 for word in toxic_keywords if word in msg_lower)
-        
-        if toxic_count >= 1:
-            labels[str(i)] = 'TOXICA'
-        else:
-            labels[str(i)] = 'NAO_TOXICA'
-        
-        if (i + 1) % 100 == 0:
-            print(f"Processadas: {i+1}/{len(messages)}")
     
-    save_labels(labels)
+    print(f"\nAnalisando {len(messages)} mensagens...")
+    start = time.perf_counter()
+    results = auto_label(messages, workers)
+    elapsed = time.perf_counter() - start
+    
+    # Rótulos manuais (--review) são mantidos
+    store = open_store(messages)
+    # Uma vez por mensagem (repetidas contariam duas vezes): o que não for
+    # gravado é rótulo manual
+    items = {message_hash(msg): (msg, label) for msg, (label, _) in zip(messages, results)}
+    written = store.set_many(items.values(), SOURCE_AUTO)
+    kept = len(items) - written
+    labels = export_labels(store, messages)
+    store.close()
+    if save_categories:
+        categories = {str(i): found for i, (_, found) in enumerate(results) if found}
+        with open(CATEGORIES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(categories, f, ensure_ascii=False)
     
     # Estatísticas
     toxic = sum(1 for v in labels.values() if v == 'TOXICA')
     non_toxic = len(labels) - toxic
     
-    print(f"\n{len(labels)} mensagens rotuladas automaticamente!")
-    print(f"  TOXICAS: {toxic} ({toxic/len(labels)*100:.1f}%)")
-    print(f"  NAO TOXICAS: {non_toxic} ({non_toxic/len(labels)*100:.1f}%)")
+    print(f"\n{written} mensagens rotuladas automaticamente em {elapsed:.1f}s!")
+    if kept:
+        print(f"{kept} mantidas com o rotulo manual")
+    print(f"\n{len(labels)} mensagens rotuladas no arquivo:")
+    if labels:
+        print(f"  TOXICAS: {toxic} ({toxic/len(labels)*100:.1f}%)")
+        print(f"  NAO TOXICAS: {non_toxic} ({non_toxic/len(labels)*100:.1f}%)")
+    if save_categories:
+        counts = Counter(c for _, found in results for c in found)
+        for category, count in counts.most_common():
+            print(f"    {category}: {count}")
+        print(f"\nCategorias por mensagem: {CATEGORIES_FILE}")
     print(f"\nArquivo salvo: {LABELED_FILE}")
     print("\nDica: Revise as rotulacoes com 'python label_data.py --review'")
 
 def show_stats():
     """Mostra estatísticas das rotulações"""
-    labels = load_existing_labels()
+    if os.path.exists(LABEL_DB_FILE):
+        with LabelStore() as store:
+            counts = store.counts()
+    else:
+        counts = Counter(load_existing_labels().values())
+    total = sum(counts.values())
     
-    if not labels:
+    if not total:
         print("Nenhuma mensagem rotulada ainda!")
         return
     
-    toxic = sum(1 for v in labels.values() if v == 'TOXICA')
-    non_toxic = len(labels) - toxic
+    toxic = counts.get('TOXICA', 0)
+    non_toxic = total - toxic
     
     print("=" * 60)
     print("ESTATISTICAS DE ROTULACAO")
     print("=" * 60)
-    print(f"\nTotal rotulado: {len(labels)}")
-    print(f"  TOXICAS: {toxic} ({toxic/len(labels)*100:.1f}%)")
-    print(f"  NAO TOXICAS: {non_toxic} ({non_toxic/len(labels)*100:.1f}%)")
+    print(f"\nTotal rotulado: {total}")
+    print(f"  TOXICAS: {toxic} ({toxic/total*100:.1f}%)")
+    print(f"  NAO TOXICAS: {non_toxic} ({non_toxic/total*100:.1f}%)")
 
-if __name__ == "__main__":
-    import sys
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rotulador de mensagens")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--auto", action="store_true", help="Rotulacao automatica (regras do classificador rapido)")
+    mode.add_argument("--review", action="store_true", help="Revisar/rotular manualmente")
+    mode.add_argument("--stats", action="store_true", help="Ver estatisticas")
+    parser.add_argument("--workers", type=int, default=None, help="Processos da rotulacao automatica (padrao: todos os nucleos)")
+    parser.add_argument("--categories", action="store_true",
+                        help=f"Com --auto, grava tambem as categorias encontradas em {CATEGORIES_FILE}")
+    args = parser.parse_args(argv)
     
-    if len(sys.argv) > 1:
-        if sys.argv[1] == '--auto':
-            auto_label_with_keywords()
-        elif sys.argv[1] == '--stats':
-            show_stats()
-        elif sys.argv[1] == '--review':
-            label_messages()
-        else:
-            print("Uso:")
-            print("  python label_data.py --auto    # Rotulacao automatica")
-            print("  python label_data.py --review  # Revisar/rotular manualmente")
-            print("  python label_data.py --stats   # Ver estatisticas")
+    if args.auto:
+        auto_label_with_patterns(args.workers, args.categories)
+    elif args.stats:
+        show_stats()
+    elif args.review:
+        label_messages()
     else:
         print("=" * 60)
         print("ROTULADOR DE MENSAGENS")
         print("=" * 60)
         print("\nOpcoes:")
-        print("  1. Rotulacao automatica (usando palavras-chave)")
+        print("  1. Rotulacao automatica (usando as regras do classificador rapido)")
         print("  2. Rotulacao manual")
         print("  3. Ver estatisticas")
         print("\nEscolha: ", end='')
@@ -167,7 +268,7 @@ if __name__ == "__main__":
         choice = input().strip()
         
         if choice == '1':
-            auto_label_with_keywords()
+            auto_label_with_patterns(args.workers, args.categories)
         elif choice == '2':
             label_messages()
         elif choice == '3':
@@ -175,4 +276,5 @@ if __name__ == "__main__":
         else:
             print("Opcao invalida!")
 
-
+if __name__ == "__main__":
+    main()
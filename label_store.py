@@ -0,0 +1,287 @@
+"""
+Armazenamento incremental dos rótulos (SQLite)
+
+Cada rótulo é gravado (commit) no momento em que é dado, então uma sessão
+interrompida não perde nada. A chave é um hash do conteúdo da mensagem, não
+a posição na planilha: regerar o xlsx (linhas novas, removidas ou em outra
+ordem) não desalinha os rótulos.
+
+O JSON lido por prepare_data_transfer_learning.py ({"índice": rótulo}) é
+gerado por export_json, que só reaplica os rótulos alterados desde a última
+exportação quando a lista de mensagens é a mesma.
+
+Exemplo:
+    store = LabelStore()
+    store.set("Você é um idiota", "TOXICA")
+    "Você é um idiota" in store   # True
+    store.export_json(messages, LABELED_FILE)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+LABEL_DB_FILE = "model_training/data/processed/rotulos.sqlite3"
+
+# Origem do rótulo
+SOURCE_MANUAL = "manual"
+SOURCE_AUTO = "auto"
+SOURCE_IMPORTED = "importado"
+# Rótulos que só um rótulo manual sobrescreve
+PROTECTED_SOURCES = (SOURCE_MANUAL,)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    label TEXT NOT NULL,
+    source TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS labels_seq ON labels (seq);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def message_hash(text):
+    """Chave de uma mensagem: SHA-1 do texto exato"""
+    return hashlib.sha1(("" if text is None else str(text)).encode("utf-8")).hexdigest()
+
+def messages_signature(hashes):
+    """Identifica a lista de mensagens (conteúdo e ordem) de uma exportação"""
+    digest = hashlib.sha1()
+    for key in hashes:
+        digest.update(key.encode("ascii"))
+    return digest.hexdigest()
+
+class LabelStore:
+    """Rótulos por hash de mensagem, gravados um a um em SQLite (modo WAL)"""
+    
+    def __init__(self, path=LABEL_DB_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Sem transação implícita: as escritas usam BEGIN IMMEDIATE (_write)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Com WAL, NORMAL não corrompe o banco numa queda; no máximo perde
+        # o último commit se o sistema operacional cair
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+    
+    def close(self):
+        self._db.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    @contextmanager
+    def _transaction(self, mode=""):
+        """Transação explícita (IMMEDIATE: trava a escrita desde o início)"""
+        self._db.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+    
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+    
+    def __contains__(self, text):
+        return self._db.execute(
+            "SELECT 1 FROM labels WHERE hash = ?", (message_hash(text),)
+        ).fetchone() is not None
+    
+    def get(self, text):
+        """Rótulo da mensagem (ou None)"""
+        row = self._db.execute("SELECT label FROM labels WHERE hash = ?", (message_hash(text),)).fetchone()
+        return row[0] if row else None
+    
+    def labeled_hashes(self):
+        """Hashes de todas as mensagens rotuladas (para filtrar em lote)"""
+        return {row[0] for row in self._db.execute("SELECT hash FROM labels")}
+    
+    def set(self, text, label, source=SOURCE_MANUAL):
+        """Grava (e confirma) o rótulo de uma mensagem"""
+        self.set_many([(text, label)], source)
+    
+    def set_many(self, items, source=SOURCE_AUTO):
+        """
+        Grava vários rótulos numa única transação
+        
+        Args:
+            items (iterable): Pares (texto, rótulo)
+            source (str): Origem; só um rótulo manual sobrescreve rótulos
+                manuais (PROTECTED_SOURCES)
+        
+        Returns:
+            int: Rótulos inseridos ou alterados
+        """
+        now = time.time()
+        protected = ", ".join(f"'{name}'" for name in PROTECTED_SOURCES)
+        condition = "" if source == SOURCE_MANUAL else f"WHERE labels.source NOT IN ({protected})"
+        # seq sai do próprio banco, com a escrita travada: outros LabelStore
+        # abertos no mesmo arquivo nunca repetem um valor
+        with self._transaction("IMMEDIATE"):
+            seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM labels").fetchone()[0]
+            rows = (
+                (message_hash(text), "" if text is None else str(text), label, source, now, seq)
+                for text, label in items
+            )
+            cursor = self._db.executemany(
+                "INSERT INTO labels (hash, text, label, source, updated_at, seq) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (hash) DO UPDATE SET label = excluded.label, source = excluded.source, "
+                f"updated_at = excluded.updated_at, seq = excluded.seq {condition}",
+                rows
+            )
+        return cursor.rowcount
+    
+    def counts(self):
+        """Número de mensagens por rótulo"""
+        return dict(self._db.execute("SELECT label, COUNT(*) FROM labels GROUP BY label"))
+    
+    def import_json(self, messages, path, auto_label=None):
+        """
+        Importa um JSON antigo {"índice": rótulo} (índices em messages)
+        
+        O JSON não diz quais rótulos foram revisados. Com auto_label, os
+        iguais ao que a rotulação automática da época daria são importados
+        como SOURCE_AUTO (o --auto atual os refaz) e os diferentes, que só
+        uma revisão produziria, como SOURCE_MANUAL. Sem auto_label, todos
+        entram como SOURCE_IMPORTED, sem proteção.
+        
+        Args:
+            auto_label (callable): Rótulo automático antigo de uma mensagem
+        
+        Returns:
+            dict: Rótulos importados por origem
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+        by_source = {}
+        for index, label in labels.items():
+            if int(index) >= len(messages):
+                continue
+            message = messages[int(index)]
+            if auto_label is None:
+                source = SOURCE_IMPORTED
+            else:
+                source = SOURCE_AUTO if auto_label(message) == label else SOURCE_MANUAL
+            by_source.setdefault(source, []).append((message, label))
+        return {source: self.set_many(items, source) for source, items in by_source.items()}
+    
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def export_json(self, messages, path):
+        """
+        Gera o JSON {"índice": rótulo} das mensagens (na ordem de messages)
+        
+        Se a lista de mensagens e o arquivo são os da última exportação, só
+        os rótulos gravados desde então são reaplicados; senão o arquivo é
+        refeito do zero. A escrita é atômica (arquivo temporário + troca).
+        
+        Returns:
+            int: Mensagens rotuladas no arquivo
+        """
+        hashes = [message_hash(text) for text in messages]
+        signature = messages_signature(hashes)
+        last_seq = self._meta("export_seq")
+        incremental = (
+            last_seq is not None and self._meta("export_signature") == signature
+            and self._meta("export_path") == os.path.abspath(path) and os.path.exists(path)
+        )
+        
+        # Mesma leitura (snapshot) para o seq exportado e as linhas: o que
+        # for gravado depois tem seq maior e entra na próxima exportação
+        with self._transaction():
+            current_seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM labels").fetchone()[0]
+            if incremental:
+                changed = dict(self._db.execute(
+                    "SELECT hash, label FROM labels WHERE seq > ? AND seq <= ?", (int(last_seq), current_seq)
+                ))
+            else:
+                changed = dict(self._db.execute("SELECT hash, label FROM labels"))
+        
+        if incremental:
+            with open(path, 'r', encoding='utf-8') as f:
+                labels = json.load(f)
+            if not changed:
+                return len(labels)
+        else:
+            labels = {}
+        
+        if changed:
+            for index, key in enumerate(hashes):
+                label = changed.get(key)
+                if label is not None:
+                    labels[str(index)] = label
+            labels = dict(sorted(labels.items(), key=lambda item: int(item[0])))
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(labels, f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+        
+        with self._transaction("IMMEDIATE"):
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("export_seq", str(current_seq)), ("export_signature", signature),
+                 ("export_path", os.path.abspath(path))]
+            )
+        return len(labels)
+
+if __name__ == "__main__":
+    # Teste da migração: JSON do --auto antigo (palavras-chave) com uma
+    # correção manual, importado e rotulado de novo pelo --auto atual
+    import sys
+    import tempfile
+    from label_data import auto_label, legacy_keyword_label
+    
+    messages = [
+        "Bom dia a todos", "esse lixo de celular travou de novo", "cala essa boca",
+        "você é um idiota", "vai se f*der", "vamos jogar bola amanhã",
+    ]
+    corrected = "1"
+    old = {str(i): legacy_keyword_label(msg) for i, msg in enumerate(messages)}
+    old[corrected] = "NAO_TOXICA" if old[corrected] == "TOXICA" else "TOXICA"
+    new = {str(i): label for i, (label, _) in enumerate(auto_label(messages, workers=1))}
+    
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "mensagens_rotuladas.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(old, f)
+        with LabelStore(os.path.join(directory, "rotulos.sqlite3")) as store:
+            store.import_json(messages, json_path, legacy_keyword_label)
+            store.set_many(((messages[int(i)], label) for i, label in new.items()), SOURCE_AUTO)
+            store.export_json(messages, json_path)
+        with open(json_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    
+    # O --auto refaz os rótulos do --auto antigo e mantém a correção manual
+    expected = {**new, corrected: old[corrected]}
+    failures = [i for i in expected if result.get(i) != expected[i]]
+    changed = [i for i in old if i != corrected and result[i] != old[i]]
+    for i in failures:
+        print(f"[AVISO] {messages[int(i)]!r}: {result.get(i)} (esperado {expected[i]})")
+    if not changed:
+        failures.append(None)
+        print("[AVISO] Nenhum rotulo do --auto antigo foi refeito")
+    
+    if failures:
+        sys.exit(1)
+    print(f"[OK] Migracao: {len(changed)} rotulo(s) do --auto antigo refeito(s), correcao manual mantida")
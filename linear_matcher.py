@@ -0,0 +1,197 @@
+"""
+Busca em tempo linear para os padrões com ".*" do classificador rápido
+
+Padrões como \\b(você|vc).*(é|e|eh).*(macaco|gorila)\\b são, na prática, uma
+sequência de trechos literais na mesma linha. No motor de regex, cada ".*"
+volta atrás sobre a linha inteira, e textos longos (ou montados de
+propósito) levam a tempo quadrático ou pior. Aqui cada trecho vira um
+conjunto de literais e a sequência é procurada de forma gulosa: para cada
+trecho, o menor fim possível a partir do fim do anterior. Cada literal só é
+procurado para frente (str.find com cursor), então o custo é linear no
+tamanho do texto.
+
+Texto e literais passam por fold_case, que iguala os caracteres como o
+re.IGNORECASE ('ı' e 'i', 'ſ' e 's'); lower() sozinho não bastaria.
+
+Exemplo:
+    matcher = compile_linear(r'\\b(cala.*(boca|matraca))\\b')
+    matcher.search("cala essa boca")   # True
+"""
+from keyword_prefilter import _analyze, fold_case, sre_parse
+
+# Último texto normalizado: todos os padrões de uma classificação recebem o
+# mesmo objeto str, que então é normalizado uma única vez
+_last_folded = (None, None)
+
+def _fold(text):
+    global _last_folded
+    last_text, folded = _last_folded
+    if text is not last_text:
+        folded = fold_case(text)
+        _last_folded = (text, folded)
+    return folded
+
+def is_word_char(char):
+    """Mesmo critério de \\w do módulo re para str"""
+    return char.isalnum() or char == "_"
+
+def at_boundary(text, index):
+    """Equivalente a \\b na posição index"""
+    left = index > 0 and is_word_char(text[index - 1])
+    right = index < len(text) and is_word_char(text[index])
+    return left != right
+
+def _flatten(items):
+    """Remove os grupos: para saber se há match, capturas não importam"""
+    flat = []
+    for op, av in items:
+        if op is sre_parse.SUBPATTERN:
+            flat.extend(_flatten(av[-1]))
+        else:
+            flat.append((op, av))
+    return flat
+
+def _is_dot_star(op, av):
+    return (
+        op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+        and av[0] == 0 and av[1] == sre_parse.MAXREPEAT
+        and list(av[2]) == [(sre_parse.ANY, None)]
+    )
+
+def _is_boundary(item):
+    return item == (sre_parse.AT, sre_parse.AT_BOUNDARY)
+
+class LinearPattern:
+    """Sequência de conjuntos de literais separados por ".*" (sem quebra de linha)"""
+    
+    def __init__(self, segments, start_boundary=False, end_boundary=False):
+        """
+        Args:
+            segments (list): Um conjunto de literais (em fold_case) por trecho
+            start_boundary (bool): O primeiro trecho começa em \\b
+            end_boundary (bool): O último trecho termina em \\b
+        """
+        self.segments = [sorted(literals) for literals in segments]
+        self.start_boundary = start_boundary
+        self.end_boundary = end_boundary
+    
+    def _find(self, text, folded, k, literal, pos):
+        """Primeira ocorrência válida do literal a partir de pos (ou -1)"""
+        last = len(self.segments) - 1
+        while True:
+            # Busca no texto normalizado; \b é avaliado no original (mesmas posições)
+            start = folded.find(literal, pos)
+            if start < 0:
+                return -1
+            if k == 0 and self.start_boundary and not at_boundary(text, start):
+                pos = start + 1
+                continue
+            if k == last and self.end_boundary and not at_boundary(text, start + len(literal)):
+                pos = start + 1
+                continue
+            return start
+    
+    def _next_end(self, text, folded, k, pos, cursors):
+        """Menor fim de um match do trecho k começando em pos ou depois"""
+        best = None
+        cursor = cursors[k]
+        for i, literal in enumerate(self.segments[k]):
+            start = cursor[i]
+            if start != -1 and start < pos:
+                # Cursores só andam para frente: cada literal percorre o texto uma vez
+                start = cursor[i] = self._find(text, folded, k, literal, pos)
+            if start != -1:
+                end = start + len(literal)
+                if best is None or end < best:
+                    best = end
+        return best
+    
+    def search(self, text):
+        """Diz se o padrão casa em alguma linha do texto"""
+        folded = _fold(text)
+        cursors = [[-2] * len(literals) for literals in self.segments]
+        pos = 0
+        while True:
+            end = self._next_end(text, folded, 0, pos, cursors)
+            if end is None:
+                return False
+            line_end = text.find("\n", end)
+            if line_end < 0:
+                line_end = len(text)
+            
+            for k in range(1, len(self.segments)):
+                end = self._next_end(text, folded, k, end, cursors)
+                if end is None:
+                    # Nem mais adiante: nenhuma escolha posterior ajudaria
+                    return False
+                if end > line_end:
+                    break
+            else:
+                return True
+            # O trecho k só aparece numa linha adiante: nenhum match termina
+            # antes dessa linha, então recomeçar direto no início dela
+            pos = text.rfind("\n", 0, end) + 1
+
+def compile_linear(pattern):
+    """
+    Converte um padrão com ".*" em LinearPattern
+    
+    Returns:
+        LinearPattern: Equivalente ao padrão (para saber se há match), ou
+            None se o padrão não tem ".*" ou tem construções não suportadas
+    """
+    try:
+        items = _flatten(sre_parse.parse(pattern))
+    except Exception:
+        return None
+    
+    segments = [[]]
+    for op, av in items:
+        if _is_dot_star(op, av):
+            segments.append([])
+        else:
+            segments[-1].append((op, av))
+    if len(segments) < 2:
+        return None
+    
+    start_boundary = bool(segments[0]) and _is_boundary(segments[0][0])
+    if start_boundary:
+        segments[0] = segments[0][1:]
+    end_boundary = bool(segments[-1]) and _is_boundary(segments[-1][-1])
+    if end_boundary:
+        segments[-1] = segments[-1][:-1]
+    
+    literal_sets = []
+    for segment in segments:
+        if any(op is sre_parse.AT for op, _ in segment):
+            return None
+        exact, _ = _analyze(segment)
+        if not exact or any("\n" in literal for literal in exact):
+            return None
+        literal_sets.append({fold_case(literal) for literal in exact})
+    return LinearPattern(literal_sets, start_boundary, end_boundary)
+
+if __name__ == "__main__":
+    # Teste: busca linear e regex dão o mesmo resultado, inclusive com
+    # caracteres que o re.IGNORECASE iguala a letras ASCII
+    import sys
+    from simple_classifier import ToxicityClassifier
+    
+    texts = [
+        "cala essa boca", "você é um macaco", "cala a boca\nsua matraca",
+        "preto ſujo", "mulher na cozınha", "MULHER NA COZİNHA", "ſua ıdıota",
+        "cala essa boca" * 50 + "x",
+    ]
+    baseline = ToxicityClassifier(use_prefilter=False, linear_time=False)
+    linear = ToxicityClassifier(use_prefilter=False)
+    failures = 0
+    for text in texts:
+        expected, result = baseline.classify(text), linear.classify(text)
+        if result != expected:
+            failures += 1
+            print(f"[AVISO] {text[:40]!r}: linear {result['label']} {result['confidence']:.2f} "
+                  f"x regex {expected['label']} {expected['confidence']:.2f}")
+    
+    if failures:
+        sys.exit(1)
+    print("[OK] Resultados da busca linear e da regex iguais")
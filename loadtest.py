@@ -0,0 +1,368 @@
+"""
+Teste de carga: repete tráfego realista contra os classificadores
+
+Envia mensagens do corpus coletado (ou variações sintéticas em português)
+numa taxa e concorrência configuráveis, aumentando a carga em degraus.
+Para cada degrau, informa vazão obtida, latência (p50/p95/p99), taxa de
+erros e o tempo por etapa (fila no cliente, serviço, servidor, regex x
+modelo na cascata). O ponto de saturação é o último degrau que ainda
+atende a taxa pedida dentro do SLO.
+
+Alvos:
+    local                     ClassificationService no próprio processo
+    http://127.0.0.1:8765     classification_server.py via HTTP
+    unix:/tmp/toxicidade.sock classification_server.py via socket Unix
+
+Uso:
+    python loadtest.py --classifier rapido --rates 500 1000 2000 4000
+    python loadtest.py --classifier transfer_learning --ramp 5:80:5 --slo-ms 500
+    python loadtest.py --target http://127.0.0.1:8765 --source synthetic -o carga.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import unicodedata
+
+from classification_server import SERVER_CLASSIFIERS, ClassificationService
+
+CORPUS_FILE = "model_training/data/raw/mensagens_X_coletadas.xlsx"
+
+BASE_MESSAGES = (
+    "bom dia gente, hoje o jogo vai ser decidido no segundo tempo",
+    "alguém sabe se vai chover amanhã na praia?",
+    "o preço da gasolina subiu de novo, não dá mais",
+    "que filme incrível, recomendo muito",
+    "parabéns pelo trabalho, ficou excelente",
+    "você é um idiota e não sabe nada de política",
+    "cala a boca seu burro",
+    "esse governo é um lixo completo",
+    "vai pro inferno, otário",
+    "que gente nojenta, não aguento mais",
+)
+SUFFIXES = ("", "!", "!!!", "?", " kkkk", " 😂", " 😡", " #eleicao", " @fulano")
+
+# ============================================================
+# Tráfego
+# ============================================================
+
+def strip_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+def synthetic_variants(base=BASE_MESSAGES, count=1000, seed=42):
+    """Variações das mensagens base: caixa, acentos, letras repetidas, sufixos"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        text = rng.choice(base)
+        if rng.random() < 0.3:
+            text = text.upper()
+        if rng.random() < 0.3:
+            text = strip_accents(text)
+        if rng.random() < 0.2:
+            words = text.split()
+            i = rng.randrange(len(words))
+            words[i] = words[i] + words[i][-1] * rng.randint(1, 4)
+            text = " ".join(words)
+        messages.append(text + rng.choice(SUFFIXES))
+    return messages
+
+def load_messages(source, path=CORPUS_FILE, count=1000, seed=42):
+    """Mensagens a enviar: do corpus (se existir) ou sintéticas"""
+    if source == "corpus":
+        try:
+            from classify_file import read_messages
+            messages = [str(text) for text in read_messages(path, "Mensagem") if text]
+        except FileNotFoundError:
+            print(f"[AVISO] {path} nao encontrado, usando mensagens sinteticas")
+        else:
+            random.Random(seed).shuffle(messages)
+            return messages
+    return synthetic_variants(count=count, seed=seed)
+
+# ============================================================
+# Alvos
+# ============================================================
+
+class LocalTarget:
+    """Chama o ClassificationService no mesmo loop asyncio (sem rede)"""
+    
+    def __init__(self, classifier, **service_options):
+        self.classifier = classifier
+        self.service = ClassificationService(load_model=classifier != "rapido", **service_options)
+    
+    async def start(self):
+        self.service.start()
+    
+    async def send(self, text):
+        start = time.perf_counter()
+        result = await self.service.classify(text, self.classifier)
+        return {**result, "latency_ms": (time.perf_counter() - start) * 1000}
+    
+    async def close(self):
+        await self.service.stop()
+
+class HttpTarget:
+    """Cliente HTTP/1.1 mínimo com conexões keep-alive reaproveitadas"""
+    
+    def __init__(self, url, classifier, connections=16):
+        self.classifier = classifier
+        self.connections = connections
+        if url.startswith("unix:"):
+            self.unix_path, self.host, self.port = url[len("unix:"):], "localhost", None
+        else:
+            address = url.split("://", 1)[-1].rstrip("/")
+            host, _, port = address.partition(":")
+            self.unix_path, self.host, self.port = None, host, int(port or 80)
+        self._idle = asyncio.Queue()
+    
+    async def start(self):
+        pass
+    
+    async def _connect(self):
+        if self.unix_path:
+            return await asyncio.open_unix_connection(self.unix_path)
+        return await asyncio.open_connection(self.host, self.port)
+    
+    async def _acquire(self):
+        if not self._idle.empty():
+            return self._idle.get_nowait()
+        return await self._connect()
+    
+    async def send(self, text):
+        body = json.dumps({"text": text, "classifier": self.classifier}, ensure_ascii=False).encode("utf-8")
+        request = (
+            f"POST /classify HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode("latin-1") + body
+        
+        reader, writer = await self._acquire()
+        try:
+            writer.write(request)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            payload = json.loads(await reader.readexactly(length))
+        except Exception:
+            writer.close()
+            raise
+        
+        if self._idle.qsize() < self.connections:
+            self._idle.put_nowait((reader, writer))
+        else:
+            writer.close()
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}: {payload.get('error')}")
+        return payload
+    
+    async def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait()[1].close()
+
+# ============================================================
+# Execução
+# ============================================================
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def latency_summary(values):
+    return {
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": max(values) if values else None,
+    }
+
+async def run_step(target, messages, rate, duration, concurrency, timeout, poisson, rng, offset=0):
+    """
+    Um degrau de carga: rate pedidos/s durante duration segundos
+    
+    A latência é medida a partir do horário programado de cada pedido (e não
+    de quando ele conseguiu sair), para que a espera por uma vaga de
+    concorrência apareça como latência em vez de sumir da medição.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    records = []
+    
+    async def one(text, scheduled):
+        async with semaphore:
+            sent = time.perf_counter()
+            record = {"queue_ms": (sent - scheduled) * 1000}
+            try:
+                result = await asyncio.wait_for(target.send(text), timeout)
+            except asyncio.TimeoutError:
+                record["error"] = "timeout"
+            except Exception as e:
+                record["error"] = type(e).__name__
+            else:
+                record["server_ms"] = result.get("latency_ms")
+                record["stage"] = result.get("stage")
+            done = time.perf_counter()
+            record["service_ms"] = (done - sent) * 1000
+            record["latency_ms"] = (done - scheduled) * 1000
+            records.append(record)
+    
+    tasks = []
+    start = time.perf_counter()
+    scheduled = start
+    total = max(1, int(rate * duration))
+    for i in range(total):
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(messages[(offset + i) % len(messages)], scheduled)))
+        scheduled += rng.expovariate(rate) if poisson else 1 / rate
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    
+    ok = [r for r in records if "error" not in r]
+    errors = {}
+    for r in records:
+        if "error" in r:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    
+    stages = {}
+    for r in ok:
+        stages.setdefault(r.get("stage") or "direto", []).append(r["latency_ms"])
+    
+    return {
+        "offered_rps": rate,
+        "requests": len(records),
+        "throughput_rps": len(ok) / elapsed,
+        "error_rate": (len(records) - len(ok)) / len(records),
+        "errors": errors,
+        "latency": latency_summary([r["latency_ms"] for r in ok]),
+        "stages": {
+            "fila_cliente": latency_summary([r["queue_ms"] for r in records]),
+            "servico": latency_summary([r["service_ms"] for r in ok]),
+            "servidor": latency_summary([r["server_ms"] for r in ok if r.get("server_ms") is not None]),
+        },
+        "by_result_stage": {
+            name: {"count": len(values), **latency_summary(values)} for name, values in stages.items()
+        },
+    }
+
+def is_saturated(step, slo_ms, max_error_rate=0.01, min_ratio=0.9):
+    """Degrau saturado: não atinge a taxa pedida, estoura o SLO ou falha demais"""
+    p99 = step["latency"]["p99_ms"]
+    return (
+        step["throughput_rps"] < min_ratio * step["offered_rps"]
+        or step["error_rate"] > max_error_rate
+        or p99 is None
+        or p99 > slo_ms
+    )
+
+def print_step(step, saturated):
+    lat = step["latency"]
+    fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+    flag = "  SATURADO" if saturated else ""
+    print(
+        f"{step['offered_rps']:>9.1f}{step['throughput_rps']:>10.1f}"
+        f"{fmt(lat['p50_ms']):>10}{fmt(lat['p95_ms']):>10}{fmt(lat['p99_ms']):>10}"
+        f"{step['error_rate']:>8.1%}{fmt(step['stages']['fila_cliente']['p95_ms']):>12}{flag}"
+    )
+
+async def run(target, messages, rates, duration, concurrency, timeout, slo_ms, poisson=False,
+              stop_on_saturation=True, warmup=20, seed=0):
+    """Executa os degraus de carga e retorna o relatório"""
+    await target.start()
+    rng = random.Random(seed)
+    steps = []
+    saturation = None
+    try:
+        for text in messages[:warmup]:
+            await target.send(text)
+        
+        print(f"{'pedido/s':>9}{'obtido/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erros':>8}{'fila p95':>12}")
+        offset = 0
+        for rate in rates:
+            step = await run_step(target, messages, rate, duration, concurrency, timeout, poisson, rng, offset)
+            offset += step["requests"]
+            saturated = is_saturated(step, slo_ms)
+            step["saturated"] = saturated
+            steps.append(step)
+            print_step(step, saturated)
+            if saturated:
+                if stop_on_saturation:
+                    break
+            elif saturation is None or rate > saturation:
+                saturation = rate
+    finally:
+        await target.close()
+    
+    return {"steps": steps, "saturation_rps": saturation}
+
+def parse_ramp(value):
+    """"início:fim:passo" -> lista de taxas"""
+    start, stop, step = (float(part) for part in value.split(":"))
+    rates = []
+    rate = start
+    while rate <= stop + 1e-9:
+        rates.append(rate)
+        rate += step
+    return rates
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga dos classificadores de toxicidade")
+    parser.add_argument("--target", default="local", help="local, http://host:porta ou unix:/caminho")
+    parser.add_argument("--classifier", choices=SERVER_CLASSIFIERS, default="rapido")
+    parser.add_argument("--source", choices=("corpus", "synthetic"), default="corpus",
+                        help="Mensagens do xlsx coletado ou variacoes sinteticas")
+    parser.add_argument("--corpus", default=CORPUS_FILE, help="Arquivo do corpus")
+    rates = parser.add_mutually_exclusive_group()
+    rates.add_argument("--rates", type=float, nargs="+", help="Taxas (pedidos/s) de cada degrau")
+    rates.add_argument("--ramp", type=parse_ramp, help="Degraus como inicio:fim:passo (ex.: 10:200:10)")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos por degrau")
+    parser.add_argument("--concurrency", type=int, default=64, help="Pedidos simultaneos no maximo")
+    parser.add_argument("--timeout", type=float, default=30, help="Tempo maximo por pedido (s)")
+    parser.add_argument("--slo-ms", type=float, default=200, help="p99 maximo aceito no degrau")
+    parser.add_argument("--poisson", action="store_true", help="Chegadas aleatorias (exponencial) em vez de fixas")
+    parser.add_argument("--no-stop", action="store_true", help="Continua os degraus apos a saturacao")
+    parser.add_argument("--model-path", help="Pasta do modelo (alvo local)")
+    parser.add_argument("--workers", type=int, default=1, help="Processos do modelo (alvo local)")
+    parser.add_argument("-o", "--output", help="Salva o relatorio em JSON")
+    args = parser.parse_args(argv)
+    
+    step_rates = args.rates or args.ramp or [10, 20, 50, 100, 200, 500, 1000]
+    messages = load_messages(args.source, args.corpus)
+    
+    if args.target == "local":
+        target = LocalTarget(args.classifier, model_path=args.model_path, workers=args.workers)
+    else:
+        target = HttpTarget(args.target, args.classifier, connections=args.concurrency)
+    
+    print(f"Alvo: {args.target} | classificador: {args.classifier} | {len(messages)} mensagens ({args.source})")
+    report = asyncio.run(run(
+        target, messages, step_rates, args.duration, args.concurrency, args.timeout, args.slo_ms,
+        poisson=args.poisson, stop_on_saturation=not args.no_stop
+    ))
+    
+    if report["saturation_rps"] is None:
+        print("\n[AVISO] Saturado ja no primeiro degrau: reduza a taxa inicial")
+    else:
+        print(f"\n[OK] Saturacao: ~{report['saturation_rps']:.0f} pedidos/s (ultimo degrau dentro do SLO de {args.slo_ms:.0f} ms)")
+    
+    if args.output:
+        report["config"] = {
+            "target": args.target, "classifier": args.classifier, "source": args.source,
+            "duration": args.duration, "concurrency": args.concurrency, "slo_ms": args.slo_ms,
+            "poisson": args.poisson,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[OK] Relatorio salvo em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Registro de modelos residentes: carrega sob demanda e mantém em memória
+
+Cada modelo é registrado com uma função que o cria (importando torch e
+transformers só quando chamada). O carregamento roda em segundo plano; a
+instância fica em cache, de modo que voltar a um modelo já usado é
+imediato. Se a memória estimada passar do limite, os modelos usados há mais
+tempo são descartados.
+
+Exemplo:
+    registry = ModelRegistry(max_memory_mb=6000)
+    registry.register("rapido", ToxicityClassifier)
+    registry.register("transfer_learning", lambda: load_model("torch"))
+    future = registry.load("transfer_learning")   # não bloqueia
+    classifier = future.result()                  # ou add_done_callback
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+WARMUP_TEXT = "Mensagem de aquecimento do modelo"
+
+def estimate_memory_mb(instance):
+    """
+    Estima a memória ocupada pelos pesos de um classificador
+    
+    Segue os atributos .model (cascata, cache, Transfer Learning) até achar
+    um módulo torch; para o backend ONNX, usa o tamanho do grafo.
+    """
+    model = instance
+    for _ in range(4):
+        if hasattr(model, "parameters"):
+            total = sum(p.numel() * p.element_size() for p in model.parameters())
+            return total / 1024 ** 2
+        if hasattr(model, "session"):
+            from onnx_classifier import MODEL_FILE
+            path = os.path.join(model.model_path, MODEL_FILE)
+            return os.path.getsize(path) / 1024 ** 2 if os.path.exists(path) else 0.0
+        model = getattr(model, "model", None)
+        if model is None:
+            break
+    return 0.0
+
+class ModelRegistry:
+    """Carregamento preguiçoso, em segundo plano, com cache LRU limitado por memória"""
+    
+    def __init__(self, max_memory_mb=None, prewarm=True):
+        """
+        Args:
+            max_memory_mb (float): Limite da soma estimada dos modelos em
+                memória (None = sem limite). O modelo mais recente nunca é
+                descartado, mesmo que sozinho passe do limite.
+            prewarm (bool): Faz uma classificação de aquecimento logo após
+                carregar, para a primeira requisição real não pagar esse custo
+        """
+        self.max_memory_mb = max_memory_mb
+        self.prewarm = prewarm
+        self._factories = {}
+        self._loaded = OrderedDict()   # nome -> (instância, MB estimados)
+        self._loading = {}             # nome -> Future
+        self._lock = threading.Lock()
+        # Uma thread: modelos grandes são carregados um de cada vez
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="carregamento")
+        self.evictions = 0
+    
+    def register(self, name, factory):
+        """Registra a função que cria o modelo (chamada só no primeiro uso)"""
+        with self._lock:
+            self._factories[name] = factory
+    
+    def get(self, name):
+        """Instância já carregada, ou None (não dispara carregamento)"""
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is None:
+                return None
+            self._loaded.move_to_end(name)
+            return entry[0]
+    
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._loaded
+    
+    def load(self, name):
+        """
+        Garante que o modelo esteja carregado
+        
+        Returns:
+            Future: Já concluído se o modelo está em cache; senão, concluído
+                quando o carregamento em segundo plano terminar
+        """
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"Modelo nao registrado: {name}")
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+                future = Future()
+                future.set_result(entry[0])
+                return future
+            future = self._loading.get(name)
+            if future is None:
+                future = self._executor.submit(self._load, name)
+                self._loading[name] = future
+            return future
+    
+    def _load(self, name):
+        try:
+            instance = self._factories[name]()
+            if self.prewarm:
+                instance.classify(WARMUP_TEXT)
+            size = estimate_memory_mb(instance)
+            with self._lock:
+                self._loaded[name] = (instance, size)
+                self._loaded.move_to_end(name)
+                self._evict()
+            return instance
+        finally:
+            with self._lock:
+                self._loading.pop(name, None)
+    
+    def _evict(self):
+        """Descarta os modelos menos usados até caber no limite (com o lock)"""
+        if self.max_memory_mb is None:
+            return
+        # Do menos para o mais usado; o último (recém-usado) é preservado
+        for name in list(self._loaded)[:-1]:
+            if self._memory_mb() <= self.max_memory_mb:
+                break
+            if self._loaded[name][1] > 0:
+                del self._loaded[name]
+                self.evictions += 1
+    
+    def _memory_mb(self):
+        return sum(size for _, size in self._loaded.values())
+    
+    def unload(self, name):
+        """Remove o modelo do cache (a memória é liberada quando não houver referências)"""
+        with self._lock:
+            self._loaded.pop(name, None)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": {name: round(size, 1) for name, (_, size) in self._loaded.items()},
+                "loading": list(self._loading),
+                "memory_mb": round(self._memory_mb(), 1),
+                "max_memory_mb": self.max_memory_mb,
+                "evictions": self.evictions,
+            }
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
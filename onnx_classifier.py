@@ -0,0 +1,167 @@
+"""
+Backend ONNX Runtime do classificador Transfer Learning
+
+Usa o grafo de pontuação gerado por export_onnx.py. Não importa torch nem
+transformers: só onnxruntime, tokenizers e numpy, o que reduz o tempo de
+inicialização e o overhead por chamada em servidores só com CPU.
+
+Exemplo:
+    classifier = OnnxTransferLearningClassifier("models/toxicity_onnx", num_threads=4)
+    classifier.classify("Você é um idiota")
+"""
+import json
+import os
+
+import numpy as np
+
+from instrumentation import metrics, profiled
+from prompt_format import LABELS, build_prompt, combine_probability
+from simple_classifier import ToxicityClassifier
+
+ONNX_PATH = "models/toxicity_onnx"
+MODEL_FILE = "scoring.onnx"
+METADATA_FILE = "scoring.json"
+
+# Threads intra-op fixas: evita disputa entre processos e variação de latência
+DEFAULT_THREADS = min(4, os.cpu_count() or 1)
+
+class OnnxTransferLearningClassifier:
+    """Mesma interface de TransferLearningClassifier (modo score), sobre ONNX Runtime"""
+    
+    def __init__(self, model_path=ONNX_PATH, fast_classifier=None, num_threads=None):
+        """
+        Args:
+            model_path (str): Pasta gerada por export_onnx.py
+            fast_classifier (ToxicityClassifier): Classificador simples a
+                reutilizar como base (padrão: cria um na inicialização)
+            num_threads (int): Threads intra-op do ONNX Runtime
+                (padrão: DEFAULT_THREADS)
+        """
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError("Backend ONNX requer onnxruntime e tokenizers: pip install onnxruntime tokenizers")
+        
+        metadata_file = os.path.join(model_path, METADATA_FILE)
+        if not os.path.exists(metadata_file):
+            raise FileNotFoundError(f"{metadata_file} nao encontrado. Execute primeiro: python export_onnx.py")
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        
+        self.model_path = model_path
+        self.mode = "score"
+        self.simple = fast_classifier if fast_classifier is not None else ToxicityClassifier()
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        
+        self._label_ids = {label: metadata["label_ids"][label] for label in LABELS}
+        self._keep = metadata["keep"]
+        self._max_length = metadata["max_length"]
+        self._tail_length = metadata["tail_length"]
+        self._prepend_ids = metadata["prepend_ids"]
+        self._pad_id = metadata["pad_id"]
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = num_threads or DEFAULT_THREADS
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(model_path, MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+    
+    def _prompt_ids(self, text):
+        """Tokeniza o prompt, truncando a mensagem (e não a marca de resposta)"""
+        ids = self._prepend_ids + self.tokenizer.encode(build_prompt(text)).ids
+        max_prompt = self._max_length - max(len(v) for v in self._label_ids.values())
+        if len(ids) > max_prompt:
+            ids = ids[:max_prompt - self._tail_length] + ids[-self._tail_length:]
+        return ids
+    
+    def _continuation_logprobs(self, sequences, continuation_lengths):
+        """Soma dos log-probs dos últimos tokens de cada sequência (uma chamada)"""
+        max_len = max(len(seq) for seq in sequences)
+        input_ids = np.full((len(sequences), max_len), self._pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(sequences), max_len), dtype=np.int64)
+        for row, seq in enumerate(sequences):
+            input_ids[row, max_len - len(seq):] = seq
+            attention_mask[row, max_len - len(seq):] = 1
+        position_ids = np.clip(attention_mask.cumsum(-1) - 1, 0, None)
+        
+        with metrics.timer("tl_stage_seconds", stage="forward", backend="onnx"):
+            token_logprobs = self.session.run(["token_logprobs"], {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "position_ids": position_ids,
+            })[0]
+        with metrics.timer("tl_stage_seconds", stage="decode", backend="onnx"):
+            return np.array([
+                token_logprobs[row, -length:].sum()
+                for row, length in enumerate(continuation_lengths)
+            ])
+    
+    def toxic_probability(self, text):
+        """Probabilidade de a resposta do modelo ser TOXICA (e não NAO_TOXICA)"""
+        return self.toxic_probabilities([text])[0]
+    
+    def toxic_probabilities(self, texts, batch_size=32):
+        """
+        Probabilidade TOXICA de vários textos, em lotes de tamanho parecido
+        
+        Returns:
+            list: Probabilidade TOXICA (float) de cada texto, na ordem de entrada
+        """
+        with metrics.timer("tl_stage_seconds", stage="tokenize", backend="onnx"):
+            prompts = [self._prompt_ids(text) for text in texts]
+        order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+        lengths = [len(self._label_ids[label]) for label in LABELS]
+        
+        probabilities = [0.0] * len(prompts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            sequences = [
+                prompts[i] + self._label_ids[label] for i in batch for label in LABELS
+            ]
+            scores = self._continuation_logprobs(sequences, lengths * len(batch))
+            if metrics.enabled:
+                metrics.inc("tl_texts_total", len(batch), backend="onnx")
+                metrics.inc("tl_batches_total", backend="onnx")
+            scores = scores.reshape(len(batch), len(LABELS))
+            # Softmax entre as duas respostas
+            scores = np.exp(scores - scores.max(axis=-1, keepdims=True))
+            toxic = scores[:, 0] / scores.sum(axis=-1)
+            for i, probability in zip(batch, toxic.tolist()):
+                probabilities[i] = probability
+        return probabilities
+    
+    @profiled
+    def classify_batch(self, texts, batch_size=32, simple_results=None):
+        """Classifica vários textos (um lote por chamada ao modelo)"""
+        texts = list(texts)
+        if simple_results is None:
+            simple_results = [self.simple.classify(text) for text in texts]
+        
+        try:
+            probabilities = self.toxic_probabilities(texts, batch_size)
+        except Exception as e:
+            # Em caso de erro, usar classificador simples (registrando o motivo)
+            metrics.record_fallback("transfer_learning_onnx", e)
+            return simple_results
+        
+        return [
+            combine_probability(simple_result, probability)
+            for simple_result, probability in zip(simple_results, probabilities)
+        ]
+    
+    @profiled
+    def classify(self, text, simple_result=None):
+        """Classificador híbrido: TL (ONNX) combinado com o classificador simples"""
+        if simple_result is None:
+            simple_result = self.simple.classify(text)
+        
+        try:
+            return combine_probability(simple_result, self.toxic_probability(text))
+        except Exception as e:
+            # Em caso de erro, usar classificador simples (registrando o motivo)
+            metrics.record_fallback("transfer_learning_onnx", e)
+            return simple_result
@@ -0,0 +1,97 @@
+"""
+Estatísticas de acerto e custo por padrão do classificador rápido
+
+Guardam, para cada padrão, quantas vezes foi testado, quantas vezes casou e
+o tempo gasto. Servem para ordenar os padrões: primeiro os que mais acertam
+por unidade de tempo, para que uma mensagem tóxica atinja cedo o número de
+matches que fixa o resultado. São gravadas em JSON, com o próprio padrão
+como chave (padrões novos ou alterados começam do zero).
+"""
+import json
+import os
+import threading
+
+PATTERN_STATS_FILE = "models/pattern_stats.json"
+
+# Prioris para padrões ainda pouco testados
+PRIOR_HIT_RATE = 0.5
+PRIOR_SECONDS = 2e-6
+
+class PatternStats:
+    """Contadores por padrão (testes, acertos, segundos) com persistência em JSON"""
+    
+    def __init__(self, patterns, path=None):
+        """
+        Args:
+            patterns (list): Padrões do classificador, na ordem dos índices
+            path (str): Arquivo JSON a carregar/gravar (None = só em memória)
+        """
+        self.patterns = list(patterns)
+        self.path = path
+        self.evaluations = [0] * len(self.patterns)
+        self.hits = [0] * len(self.patterns)
+        self.seconds = [0.0] * len(self.patterns)
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+    
+    def record(self, index, hit, seconds):
+        # Sem lock: perder uma contagem em corrida entre threads não importa
+        self.evaluations[index] += 1
+        self.hits[index] += bool(hit)
+        self.seconds[index] += seconds
+    
+    def score(self, index):
+        """Acertos esperados por segundo de teste (maior = testar antes)"""
+        evaluations = self.evaluations[index]
+        hit_rate = (self.hits[index] + PRIOR_HIT_RATE) / (evaluations + 1)
+        cost = (self.seconds[index] + PRIOR_SECONDS) / (evaluations + 1)
+        return hit_rate / cost
+    
+    def ranking(self):
+        """Índices dos padrões do mais para o menos promissor"""
+        return sorted(range(len(self.patterns)), key=self.score, reverse=True)
+    
+    def load(self, path=None):
+        with open(path or self.path, 'r', encoding='utf-8') as f:
+            saved = json.load(f).get("patterns", {})
+        for index, pattern in enumerate(self.patterns):
+            entry = saved.get(pattern)
+            if entry:
+                self.evaluations[index] = entry["evaluations"]
+                self.hits[index] = entry["hits"]
+                self.seconds[index] = entry["seconds"]
+    
+    def save(self, path=None):
+        """Grava as estatísticas (arquivo temporário + troca atômica)"""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            data = {"patterns": {
+                pattern: {
+                    "evaluations": self.evaluations[index],
+                    "hits": self.hits[index],
+                    "seconds": self.seconds[index],
+                }
+                for index, pattern in enumerate(self.patterns)
+            }}
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(path + ".tmp", path)
+    
+    def summary(self, limit=10):
+        """Padrões mais bem colocados, com taxa de acerto e custo médio"""
+        rows = []
+        for index in self.ranking()[:limit]:
+            evaluations = self.evaluations[index]
+            rows.append({
+                "pattern": self.patterns[index],
+                "evaluations": evaluations,
+                "hit_rate": self.hits[index] / evaluations if evaluations else None,
+                "mean_us": self.seconds[index] / evaluations * 1e6 if evaluations else None,
+            })
+        return rows
@@ -6,6 +6,8 @@ import json
 from sklearn.model_selection import train_test_split
 import os
 
+from dataset_cache import load_dataset
+
 # Caminhos
 LABELED_FILE = "model_training/data/processed/mensagens_rotuladas.json"
 TRAIN_FILE = "model_training/data/processed/train.json"
@@ -27,7 +29,7 @@ with open(LABELED_FILE, 'r', encoding='utf-8') as f:
     labels = json.load(f)
 
 # Carregar mensagens originais
-df = pd.read_excel("model_training/data/raw/mensagens_X_coletadas.xlsx")
+df = load_dataset("model_training/data/raw/mensagens_X_coletadas.xlsx", columns=['Mensagem'])
 messages = df['Mensagem'].tolist()
 
 print(f"   OK! {len(labels)} mensagens rotuladas")
@@ -0,0 +1,31 @@
+"""
+Formato de prompt e combinação de resultados do Transfer Learning
+
+Compartilhado pelos backends PyTorch (transfer_learning_classifier.py) e
+ONNX Runtime (onnx_classifier.py); não depende de torch nem transformers.
+"""
+
+MAX_LENGTH = 256
+
+# Mesmo formato de prompt usado no treino (prepare_data_transfer_learning.py)
+SYSTEM_PROMPT = "Voce e um classificador de toxicidade. Analise a mensagem e responda apenas TOXICA ou NAO_TOXICA."
+ANSWER_TAG = "</s>\n<|assistant|>\n"
+LABELS = ("TOXICA", "NAO_TOXICA")
+
+def build_prompt(text):
+    """Monta o prompt de chat para uma mensagem"""
+    return f"<|system|>\n{SYSTEM_PROMPT}</s>\n<|user|>\nClassifique: {text}{ANSWER_TAG}"
+
+def combine_probability(simple_result, toxic_probability):
+    """Combina a probabilidade do modelo com o classificador simples"""
+    categories = simple_result.get('categories', [])
+    if toxic_probability >= 0.5:
+        # TL diz que é tóxica
+        return {"label": "TÓXICA", "confidence": toxic_probability, "categories": categories}
+    
+    if simple_result['label'] == "TÓXICA":
+        # Classificador simples discorda - usar simples (mais conservador)
+        return {"label": "TÓXICA", "confidence": simple_result['confidence'] * 0.95, "categories": categories}
+    
+    # Ambos concordam - seguro
+    return {"label": "NÃO TÓXICA", "confidence": 1.0 - toxic_probability, "categories": categories}
@@ -0,0 +1,155 @@
+"""
+Cache LRU de resultados para os classificadores
+
+Mensagens repetidas (retweets, copypasta, spam) são respondidas a partir do
+cache em vez de serem reclassificadas. A chave é a identidade do
+classificador junto com o texto reduzido apenas ao que esse classificador
+leva em conta (ver cache_key): dois textos com a mesma chave sempre têm o
+mesmo resultado, com ou sem cache.
+"""
+import threading
+from collections import OrderedDict
+
+from instrumentation import metrics
+
+def cache_key(classifier, text):
+    """
+    Texto usado como chave de cache para o classificador
+    
+    Classificadores que ignoram parte do texto (ex.: a regex não distingue
+    maiúsculas) expõem cache_key(text); para os demais (Transfer Learning,
+    cascata) a chave é o texto exato. Acentos e espaços nunca são
+    descartados: "sua égua" e "sua egua" podem ter resultados diferentes.
+    """
+    key = getattr(classifier, "cache_key", None)
+    return key(text) if key is not None else text
+
+def classifier_identity(classifier):
+    """Identifica o classificador (classe + modelo carregado, se houver)"""
+    identity = f"{type(classifier).__module__}.{type(classifier).__qualname__}"
+    model_path = getattr(classifier, "model_path", None)
+    if model_path:
+        identity += f":{model_path}"
+    if getattr(classifier, "quantized", False):
+        identity += ":int8"
+    # Com truncamento, o mesmo texto pode ter resultado diferente
+    if getattr(classifier, "max_input_length", None):
+        identity += f":max{classifier.max_input_length}"
+    return identity
+
+class LRUCache:
+    """
+    Cache LRU limitado por número de entradas, seguro entre threads
+    
+    Pode ser compartilhado por vários CachedClassifier: as chaves já
+    incluem a identidade do classificador.
+    """
+    
+    def __init__(self, maxsize=10000):
+        if maxsize <= 0:
+            raise ValueError("maxsize deve ser positivo")
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        metrics.register_source("cache", self)
+    
+    def get(self, key):
+        """Retorna o valor em cache ou None"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        """Guarda o valor, descartando o item menos usado se necessário"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Esvazia o cache e zera os contadores"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        """Contadores de uso do cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class CachedClassifier:
+    """
+    Envolve um classificador com um cache LRU de resultados
+    
+    Exemplo:
+        classifier = CachedClassifier(ToxicityClassifier(), maxsize=50000)
+        classifier.classify("Você é um idiota")   # calcula
+        classifier.classify("VOCÊ É UM IDIOTA")   # vem do cache (regex ignora a caixa)
+        print(classifier.cache.stats())
+    """
+    
+    def __init__(self, classifier, maxsize=10000, cache=None):
+        self.classifier = classifier
+        self.cache = cache if cache is not None else LRUCache(maxsize)
+        self.identity = classifier_identity(classifier)
+    
+    def classify(self, text):
+        """Classifica o texto, consultando o cache antes do classificador"""
+        text = text or ""
+        key = (self.identity, cache_key(self.classifier, text))
+        result = self.cache.get(key)
+        if result is None:
+            result = self.classifier.classify(text)
+            self.cache.put(key, result)
+        # Cópia para que quem chama não altere a entrada em cache
+        return dict(result)
+    
+    def __getattr__(self, name):
+        # Demais atributos/métodos vêm do classificador envolvido
+        if name == "classifier":
+            raise AttributeError(name)
+        return getattr(self.classifier, name)
+
+if __name__ == "__main__":
+    # Teste: com e sem cache, variantes de caixa, acento e espaço têm o mesmo resultado
+    import sys
+    from simple_classifier import ToxicityClassifier
+    
+    plain = ToxicityClassifier()
+    variants = [
+        "sua egua", "sua égua", "SUA ÉGUA",
+        "débil  mental", "débil mental", "DÉBIL MENTAL",
+        "Você é um idiota", "voce e um idiota", "VOCÊ É UM IDIOTA",
+    ]
+    failures = 0
+    # Cada ordem de chegada: o resultado não pode depender de quem entrou primeiro
+    for order in (variants, variants[::-1]):
+        cached = CachedClassifier(plain, maxsize=100)
+        for text in order:
+            expected, result = plain.classify(text), cached.classify(text)
+            if result != expected:
+                failures += 1
+                print(f"[AVISO] {text!r}: cache {result['label']} x sem cache {expected['label']}")
+        print(f"Cache: {cached.cache.stats()}")
+    
+    if failures:
+        sys.exit(1)
+    print("[OK] Resultados com e sem cache iguais")
@@ -69,6 +69,17 @@ def main():
     os.makedirs("models", exist_ok=True)
     print("✓ Diretórios criados")
     
+    # Cache colunar dos dados brutos: os scripts seguintes não releem o xlsx/CSV
+    from dataset_cache import DatasetCache
+    raw_files = [dataset_path, os.path.join("model_training", "data", "raw", "mensagens_X_coletadas.xlsx")]
+    for path in raw_files:
+        if os.path.exists(path):
+            try:
+                DatasetCache(path).build()
+                print(f"✓ Cache gerado: {path}")
+            except Exception as e:
+                print(f"✗ Cache não gerado para {path}: {e}")
+    
     # Conclusão
     print_header("SETUP CONCLUÍDO!")
     
@@ -2,18 +2,184 @@
 Classificador simplificado sem fine-tuning (mais rápido para demonstração)
 Usa análise de palavras-chave e padrões de texto
 """
+import atexit
 import re
+import time
+import warnings
+from itertools import chain
+
+from instrumentation import metrics, profiled
+from keyword_prefilter import KeywordPrefilter
+from linear_matcher import compile_linear
+from pattern_stats import PatternStats
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+def _starts_with_word_char(pattern):
+    """
+    Verifica se todo match do padrão começa com um caractere de palavra (\\w).
+    
+    Permite ancorar a regex combinada apenas em inícios de palavra.
+    Responde False sempre que não for possível garantir.
+    """
+    def check(items):
+        for op, av in items:
+            if op is sre_parse.AT:
+                continue
+            if op is sre_parse.SUBPATTERN:
+                return check(av[-1])
+            if op is sre_parse.BRANCH:
+                return all(check(branch) for branch in av[1])
+            if op is sre_parse.LITERAL:
+                return chr(av).isalnum() or chr(av) == "_"
+            if op is sre_parse.IN:
+                return all(
+                    item_op is sre_parse.LITERAL and chr(item_av).isalnum()
+                    for item_op, item_av in av
+                )
+            return False
+        return False
+    
+    try:
+        return check(sre_parse.parse(pattern))
+    except Exception:
+        return False
+
+LONG_INPUT_POLICIES = ("truncate", "reject")
+
+# A confiança não muda a partir deste número de matches
+MAX_COUNTED_MATCHES = 3
+# Classificações sem detalhe entre duas reordenações dos padrões
+REORDER_EVERY = 1000
 
 class ToxicityClassifier:
-    def __init__(self):
-        """Inicializa o classificador"""
+    def __init__(self, use_prefilter=True, linear_time=True, max_input_length=None, long_input="truncate",
+                 stats_path=None):
+        """
+        Inicializa o classificador
+        
+        Args:
+            use_prefilter (bool): Usa o pré-filtro Aho-Corasick de palavras-chave
+                para só rodar as regex das categorias com palavras encontradas
+            linear_time (bool): Padrões com ".*" são testados pelo matcher
+                linear (linear_matcher) em vez da regex, que volta atrás e
+                fica quadrática ou pior em textos longos
+            max_input_length (int): Tamanho máximo (caracteres) analisado;
+                None = sem limite
+            long_input (str): O que fazer com textos maiores que o limite:
+                "truncate" analisa só o início, "reject" levanta ValueError
+            stats_path (str): JSON com as estatísticas de acerto por padrão
+                usadas para ordenar os testes de classify(detail=False);
+                carregado aqui e gravado por save_stats (None = só em memória)
+        """
+        if long_input not in LONG_INPUT_POLICIES:
+            raise ValueError(f"Politica desconhecida: {long_input} (use 'truncate' ou 'reject')")
+        
         print("Carregando classificador...")
         
+        self.use_prefilter = use_prefilter
+        self.linear_time = linear_time
+        self.max_input_length = max_input_length
+        self.long_input = long_input
+        self.stats_path = stats_path
+        
         # Lista de palavras e padrões tóxicos
         self.toxic_patterns = self._load_toxic_patterns()
         
+        # Compilar todos os padrões uma única vez
+        self._compile_patterns()
+        
         print("[OK] Classificador carregado!")
     
+    def _compile_patterns(self):
+        """
+        Compila os padrões em um motor de varredura única.
+        
+        Cada padrão vira um grupo nomeado (p0, p1, ...) de uma única regex
+        combinada, de modo que uma mensagem limpa é percorrida uma só vez.
+        """
+        self._all_patterns = []
+        self._pattern_categories = []
+        for category, patterns in self.toxic_patterns.items():
+            for pattern in patterns:
+                self._all_patterns.append(pattern)
+                self._pattern_categories.append(category)
+        
+        # Padrões com ".*" que o matcher linear cobre ficam fora da regex combinada
+        self._linear = {}
+        if self.linear_time:
+            for index, pattern in enumerate(self._all_patterns):
+                matcher = compile_linear(pattern)
+                if matcher is not None:
+                    self._linear[index] = matcher
+        
+        self._word_start = re.compile(r"\b(?=\w)")
+        self._engines = {}
+        self._engine(self.toxic_patterns)
+        
+        self._prefilter = None
+        if self.use_prefilter:
+            self._prefilter = KeywordPrefilter(self._all_patterns)
+        
+        # Teste individual de cada padrão, para a avaliação ordenada
+        self._testers = [
+            self._linear[i].search if i in self._linear else re.compile(pattern, re.IGNORECASE).search
+            for i, pattern in enumerate(self._all_patterns)
+        ]
+        self.pattern_stats = PatternStats(self._all_patterns, self.stats_path)
+        self._order = self.pattern_stats.ranking()
+        self._since_reorder = 0
+        if self.stats_path:
+            atexit.register(self.save_stats)
+    
+    def _engine(self, categories):
+        """
+        Retorna o motor (regex combinada, regex de sonda, ancorado) das
+        categorias informadas, compilando-o na primeira vez que é pedido
+        
+        Os padrões cobertos pelo matcher linear não entram; se não sobrar
+        nenhum, o motor é None.
+        """
+        key = frozenset(categories)
+        if key in self._engines:
+            return self._engines[key]
+        
+        indices = [
+            i for i, c in enumerate(self._pattern_categories)
+            if c in key and i not in self._linear
+        ]
+        if not indices:
+            self._engines[key] = None
+            return None
+        patterns = [self._all_patterns[i] for i in indices]
+        
+        # Todos os padrões começam com \b: fatorar a fronteira e, quando
+        # possível, testar as alternativas só em inícios de palavra
+        word_anchored = False
+        if all(p.startswith(r"\b") for p in patterns):
+            anchor = r"\b"
+            if all(_starts_with_word_char(p) for p in patterns):
+                anchor += r"(?=\w)"
+                word_anchored = True
+            alternatives = [f"(?P<p{i}>{self._all_patterns[i][2:]})" for i in indices]
+            combined = anchor + "(?:" + "|".join(alternatives) + ")"
+        else:
+            combined = "|".join(f"(?P<p{i}>{self._all_patterns[i]})" for i in indices)
+        
+        # Sonda: testa todos os padrões que começam numa mesma posição
+        probe = "".join(f"(?=(?P<p{i}>{self._all_patterns[i]}))?" for i in indices)
+        
+        engine = (
+            re.compile(combined, re.IGNORECASE),
+            re.compile(probe, re.IGNORECASE),
+            word_anchored
+        )
+        self._engines[key] = engine
+        return engine
+    
     def _load_toxic_patterns(self):
         """Carrega padrões de toxicidade"""
         return {
@@ -100,44 +266,285 @@ class ToxicityClassifier:
             ]
         }
     
-    def classify(self, text):
+    @profiled
+    def classify(self, text, detail=True):
         """
         Classifica um texto como tóxico ou não-tóxico
         
         Args:
             text (str): Texto a ser classificado
+            detail (bool): Lista todas as categorias encontradas. Com False,
+                os padrões são testados um a um (os de maior acerto por custo
+                primeiro) e a análise para assim que o rótulo e a confiança
+                não podem mais mudar; "categories" traz só as já encontradas
             
         Returns:
-            dict: {"label": "TÓXICA" ou "NÃO TÓXICA", "confidence": float}
+            dict: {"label": "TÓXICA" ou "NÃO TÓXICA", "confidence": float,
+                   "categories": lista de categorias encontradas}
         """
         if not text or len(text.strip()) == 0:
-            return {"label": "NÃO TÓXICA", "confidence": 1.0}
+            return {"label": "NÃO TÓXICA", "confidence": 1.0, "categories": []}
         
-        text_lower = text.lower()
-        
-        # Contar matches por categoria
-        matches = []
-        for category, patterns in self.toxic_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower, re.IGNORECASE):
-                    matches.append(category)
+        text_lower = self._limit_length(text).lower()
+        if not detail:
+            hits = self._match_ordered(text_lower)
+        elif metrics.enabled:
+            hits = self._match_measured(text_lower)
+        else:
+            hits = self._match(text_lower)
         
         # Calcular confiança baseada no número de matches
-        if not matches:
-            return {"label": "NÃO TÓXICA", "confidence": 0.85}
+        if not hits:
+            return {"label": "NÃO TÓXICA", "confidence": 0.85, "categories": []}
         
-        # Múltiplas categorias = mais confiança de toxicidade
-        unique_categories = len(set(matches))
-        total_matches = len(matches)
+        matched = {self._pattern_categories[i] for i in hits}
+        categories = [c for c in self.toxic_patterns if c in matched]
+        total_matches = len(hits)
         
-        if total_matches >= 3:
+        if total_matches >= MAX_COUNTED_MATCHES:
             confidence = 0.98
         elif total_matches == 2:
             confidence = 0.90
         else:
             confidence = 0.75
         
-        return {"label": "TÓXICA", "confidence": confidence}
+        return {"label": "TÓXICA", "confidence": confidence, "categories": categories}
+    
+    def classify_batch(self, texts):
+        """
+        Classifica uma lista de textos de uma só vez
+        
+        Args:
+            texts (list): Textos a serem classificados
+            
+        Returns:
+            pd.DataFrame: Uma linha por texto (ver classify_series)
+        """
+        import pandas as pd
+        
+        return self.classify_series(pd.Series(list(texts), dtype=object))
+    
+    def classify_series(self, texts):
+        """
+        Classifica uma coluna inteira com operações vetorizadas do pandas
+        
+        Uma passada do pré-filtro marca, linha a linha, os padrões que podem
+        casar; depois cada padrão roda como uma operação de coluna apenas
+        sobre as suas linhas candidatas.
+        
+        Args:
+            texts (pd.Series): Textos a serem classificados
+            
+        Returns:
+            pd.DataFrame: Mesmo índice de texts, com as colunas "label",
+                "confidence" e uma coluna booleana por categoria
+        """
+        import numpy as np
+        import pandas as pd
+        
+        lower = texts.fillna("").astype(str)
+        if self.max_input_length is not None:
+            too_long = lower.str.len() > self.max_input_length
+            if self.long_input == "reject" and too_long.any():
+                raise ValueError(f"{int(too_long.sum())} texto(s) excedem o limite de {self.max_input_length} caracteres")
+            lower = lower.str.slice(0, self.max_input_length)
+        lower = lower.str.lower()
+        empty = (lower.str.strip() == "").to_numpy()
+        
+        # Matriz linhas x padrões com os candidatos de cada linha
+        candidates = np.zeros((len(lower), len(self._all_patterns)), dtype=bool)
+        with warnings.catch_warnings():
+            # As regex têm grupos de captura; aqui só importa se houve match
+            warnings.simplefilter("ignore", UserWarning)
+            if self._prefilter is not None:
+                # Índices (linha, padrão) de todos os candidatos de uma vez
+                found = lower.map(self._prefilter.candidates).tolist()
+                counts = np.fromiter(map(len, found), dtype=np.int64, count=len(found))
+                columns = np.fromiter(chain.from_iterable(found), dtype=np.int64, count=int(counts.sum()))
+                candidates[np.repeat(np.arange(len(found)), counts), columns] = True
+            else:
+                # Sem pré-filtro: a regex combinada marca as linhas para os
+                # padrões de regex; os do matcher linear são testados em todas
+                engine = self._engine(self.toxic_patterns)
+                if engine is not None:
+                    regex_columns = [i for i in range(len(self._all_patterns)) if i not in self._linear]
+                    matched = lower.str.contains(engine[0], na=False).to_numpy()
+                    candidates[np.ix_(matched, regex_columns)] = True
+                candidates[:, list(self._linear)] = True
+            candidates[empty] = False
+            
+            total_matches = np.zeros(len(lower), dtype=np.int64)
+            category_hits = {
+                category: np.zeros(len(lower), dtype=bool)
+                for category in self.toxic_patterns
+            }
+            for index, pattern in enumerate(self._all_patterns):
+                rows = candidates[:, index]
+                if not rows.any():
+                    continue
+                hits = np.zeros(len(lower), dtype=bool)
+                if index in self._linear:
+                    hits[rows] = lower[rows].map(self._linear[index].search).to_numpy(dtype=bool)
+                else:
+                    hits[rows] = lower[rows].str.contains(
+                        pattern, flags=re.IGNORECASE, regex=True, na=False
+                    ).to_numpy()
+                total_matches += hits
+                category_hits[self._pattern_categories[index]] |= hits
+        
+        confidence = np.select(
+            [empty, total_matches == 0, total_matches >= MAX_COUNTED_MATCHES, total_matches == 2],
+            [1.0, 0.85, 0.98, 0.90],
+            default=0.75
+        )
+        result = pd.DataFrame({
+            "label": np.where(total_matches > 0, "TÓXICA", "NÃO TÓXICA"),
+            "confidence": confidence,
+            **category_hits
+        }, index=texts.index)
+        return result
+    
+    def cache_key(self, text):
+        """
+        Forma do texto que determina o resultado (chave de cache)
+        
+        classify só analisa o texto (já limitado) em minúsculas; acentos e
+        espaços são mantidos porque mudam o que as regras encontram.
+        """
+        return self._limit_length(text).lower()
+    
+    def _limit_length(self, text):
+        """Aplica a política de tamanho máximo de entrada"""
+        if self.max_input_length is None or len(text) <= self.max_input_length:
+            return text
+        if self.long_input == "reject":
+            raise ValueError(f"Texto com {len(text)} caracteres excede o limite de {self.max_input_length}")
+        return text[:self.max_input_length]
+    
+    def _match(self, text_lower):
+        """Índices dos padrões encontrados no texto (já em minúsculas)"""
+        # Pré-filtro: só categorias com palavras-chave presentes vão para a regex
+        categories = self.toxic_patterns
+        candidates = None
+        if self._prefilter is not None:
+            candidates = self._prefilter.candidates(text_lower)
+            if not candidates:
+                return set()
+            categories = {self._pattern_categories[i] for i in candidates}
+        
+        # Varredura única: índices dos padrões encontrados
+        return self._scan(text_lower, categories, candidates)
+    
+    def _match_ordered(self, text_lower):
+        """
+        Testa os padrões candidatos um a um, na ordem adaptativa, até
+        MAX_COUNTED_MATCHES acertos (a partir daí o resultado não muda)
+        """
+        candidates = None
+        if self._prefilter is not None:
+            candidates = self._prefilter.candidates(text_lower)
+            if not candidates:
+                return set()
+        
+        stats = self.pattern_stats
+        hits = set()
+        for index in self._order:
+            if candidates is not None and index not in candidates:
+                continue
+            start = time.perf_counter()
+            found = self._testers[index](text_lower)
+            stats.record(index, found, time.perf_counter() - start)
+            if found:
+                hits.add(index)
+                if len(hits) >= MAX_COUNTED_MATCHES:
+                    break
+        
+        self._since_reorder += 1
+        if self._since_reorder >= REORDER_EVERY:
+            self.reorder()
+        return hits
+    
+    def reorder(self):
+        """Reordena os padrões pelas estatísticas acumuladas"""
+        self._order = self.pattern_stats.ranking()
+        self._since_reorder = 0
+    
+    def save_stats(self, path=None):
+        """Grava as estatísticas por padrão (em stats_path, se path não for dado)"""
+        self.pattern_stats.save(path)
+    
+    def _match_measured(self, text_lower):
+        """
+        Mesmo que _match, registrando tempos e acertos em metrics
+        
+        O tempo por categoria exige varrer cada uma separadamente, então só
+        é medido numa amostra das chamadas (metrics.sample_rate).
+        """
+        start = time.perf_counter()
+        categories = self.toxic_patterns
+        candidates = None
+        if self._prefilter is not None:
+            candidates = self._prefilter.candidates(text_lower)
+            metrics.observe("regex_stage_seconds", time.perf_counter() - start, stage="prefilter")
+            if not candidates:
+                metrics.inc("regex_prefilter_rejections_total")
+                metrics.observe("regex_classify_seconds", time.perf_counter() - start)
+                return set()
+            categories = {self._pattern_categories[i] for i in candidates}
+        
+        scan_start = time.perf_counter()
+        hits = self._scan(text_lower, categories, candidates)
+        end = time.perf_counter()
+        metrics.observe("regex_stage_seconds", end - scan_start, stage="scan")
+        metrics.observe("regex_classify_seconds", end - start)
+        for category in {self._pattern_categories[i] for i in hits}:
+            metrics.inc("regex_category_hits_total", category=category)
+        
+        if metrics.sampled():
+            for category in categories:
+                category_start = time.perf_counter()
+                self._scan(text_lower, {category})
+                metrics.observe("regex_category_seconds", time.perf_counter() - category_start, category=category)
+        return hits
+    
+    def _scan(self, text_lower, categories, candidates=None):
+        """
+        Percorre o texto uma vez e retorna os índices dos padrões encontrados.
+        
+        A regex combinada não devolve matches sobrepostos: um padrão só pode
+        ter ficado escondido se começar dentro de um trecho já encontrado.
+        Esses trechos são sondados posição a posição com a regex de sonda.
+        Os padrões do matcher linear são testados à parte (só os candidatos
+        do pré-filtro, quando informados).
+        """
+        hits = {
+            index for index, matcher in self._linear.items()
+            if self._pattern_categories[index] in categories
+            and (candidates is None or index in candidates)
+            and matcher.search(text_lower)
+        }
+        
+        engine = self._engine(categories)
+        if engine is None:
+            return hits
+        combined_regex, probe_regex, word_anchored = engine
+        
+        for match in combined_regex.finditer(text_lower):
+            start, end = match.span()
+            if word_anchored:
+                positions = [start] + [
+                    m.start() for m in self._word_start.finditer(text_lower, start + 1, end)
+                ]
+            else:
+                positions = range(start, end)
+            
+            for pos in positions:
+                probe = probe_regex.match(text_lower, pos)
+                hits.update(
+                    int(name[1:]) for name, value in probe.groupdict().items()
+                    if value is not None
+                )
+        return hits
 
 if __name__ == "__main__":
     # Teste
@@ -158,4 +565,6 @@ if __name__ == "__main__":
         result = classifier.classify(text)
         print(f"\nTexto: {text}")
         print(f"Classificação: {result['label']} (confiança: {result['confidence']:.2%})")
+        if result['categories']:
+            print(f"Categorias: {', '.join(result['categories'])}")
 
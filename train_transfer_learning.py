@@ -4,6 +4,7 @@ Transfer Learning com TinyLlama usando mensagens_X_coletadas.xlsx
 import os
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'  # Desabilitar warnings
 
+import argparse
 import json
 import torch
 from transformers import (
@@ -25,6 +26,15 @@ BATCH_SIZE = 8
 EPOCHS = 3
 LEARNING_RATE = 2e-3
 
+parser = argparse.ArgumentParser(description="Transfer Learning com TinyLlama")
+parser.add_argument("--profile", action="store_true",
+                    help="Mede tempo por fase, tokens/s e memoria; grava relatorio em <saida>/profile")
+parser.add_argument("--profile-window", default="5:10",
+                    help="Passos (inicio:fim) gravados pelo torch.profiler ('' para nao gravar trace)")
+parser.add_argument("--max-steps", type=int, default=-1,
+                    help="Interrompe apos N passos (util com --profile)")
+args = parser.parse_args()
+
 print("=" * 60)
 print("TRANSFER LEARNING - CLASSIFICADOR DE TOXICIDADE")
 print("=" * 60)
@@ -137,14 +147,22 @@ training_args = TrainingArguments(
     load_best_model_at_end=True,
     report_to="none",
     gradient_accumulation_steps=2,
+    max_steps=args.max_steps,
 )
 
+callbacks = []
+if args.profile:
+    from training_profiler import TrainingProfilerCallback
+    window = tuple(int(step) for step in args.profile_window.split(":")) if args.profile_window else None
+    callbacks.append(TrainingProfilerCallback(os.path.join(OUTPUT_DIR, "profile"), window=window))
+
 trainer = Trainer(
     model=model,
     args=training_args,
     train_dataset=train_dataset,
     eval_dataset=val_dataset,
-    data_collator=DataCollatorForLanguageModeling(tokenizer, mlm=False)
+    data_collator=DataCollatorForLanguageModeling(tokenizer, mlm=False),
+    callbacks=callbacks
 )
 
 print("   OK! Configuracao completa")
@@ -153,6 +171,8 @@ print(f"   - Epocas: {EPOCHS}")
 print(f"   - Batch Size: {BATCH_SIZE}")
 print(f"   - Learning Rate: {LEARNING_RATE}")
 print(f"   - Dispositivo: {device}")
+if args.profile:
+    print(f"   - Perfil de desempenho: {os.path.join(OUTPUT_DIR, 'profile')}")
 
 # Treinar
 print("\n6. Iniciando Fine-Tuning...")
@@ -169,6 +189,11 @@ except Exception as e:
     print(f"\n\n   ERRO: {e}")
     exit(1)
 
+# Execução curta só para medir desempenho: não sobrescrever o modelo treinado
+if args.profile and args.max_steps > 0:
+    print("\n   Execucao de perfil (--max-steps): modelo nao salvo")
+    exit(0)
+
 # Salvar modelo
 print("\n7. Salvando modelo treinado...")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -0,0 +1,253 @@
+"""
+Perfil de desempenho do treinamento (callback do Trainer)
+
+Mede, por passo de otimização:
+    data       espera pelos lotes (dataloader + collator)
+    forward    chamadas forward do modelo em modo treino
+    backward   do fim do forward até o próximo forward ou o otimizador
+               (inclui o clip de gradiente)
+    optimizer  optimizer.step, scheduler e zero_grad
+além de tokens/s (reais e com padding), pico de RSS e memória de tensores.
+Uma janela de passos pode ser gravada com torch.profiler (trace do Chrome).
+O relatório JSON é gravado ao fim do treinamento.
+
+Uso:
+    python train_transfer_learning.py --profile --profile-window 5:10 --max-steps 30
+"""
+import json
+import os
+import sys
+import time
+
+import torch
+from transformers import TrainerCallback
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (None se não houver como medir)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 ** 2
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: KB no Linux, bytes no macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def tensors_mb(tensors):
+    return sum(t.numel() * t.element_size() for t in tensors if isinstance(t, torch.Tensor)) / 1024 ** 2
+
+def _summary(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "mean": sum(values) / len(values),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "max": ordered[-1],
+        "total": sum(values),
+    }
+
+class TrainingProfilerCallback(TrainerCallback):
+    """
+    Callback que cronometra cada passo e grava um relatório ao final
+    
+    Exemplo:
+        trainer = Trainer(..., callbacks=[TrainingProfilerCallback("models/perfil", window=(5, 10))])
+    """
+    
+    PHASES = ("data", "forward", "backward", "optimizer")
+    
+    def __init__(self, output_dir, window=None, skip_first=1):
+        """
+        Args:
+            output_dir (str): Pasta do relatório (training_profile.json) e do trace
+            window (tuple): Passos (início, fim) gravados pelo torch.profiler,
+                ou None para não gravar trace
+            skip_first (int): Passos iniciais fora do resumo (aquecimento)
+        """
+        self.output_dir = output_dir
+        self.window = window
+        self.skip_first = skip_first
+        self.steps = []
+        self._hooks = []
+        self._profiler = None
+        self._profiler_table = None
+        self._tensor_memory = None
+        self._optimizer = None
+        self._reset_step()
+        self._mark = None
+        self._step_start = self._optimizer_start = None
+    
+    def _reset_step(self):
+        self._current = {phase: 0.0 for phase in self.PHASES}
+        self._current.update(tokens=0, padded_tokens=0)
+        self._forward_start = None
+        self._forward_end = None
+    
+    # ---------------- Ganchos no modelo ----------------
+    
+    def _before_forward(self, module, args, kwargs):
+        if not module.training or self._mark is None:
+            return
+        now = time.perf_counter()
+        if self._forward_end is not None:
+            # Entre dois micro-lotes (acúmulo de gradiente): backward do anterior
+            self._current["backward"] += now - self._forward_end
+            self._forward_end = None
+        self._forward_start = now
+        
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        attention_mask = kwargs.get("attention_mask")
+        if isinstance(input_ids, torch.Tensor):
+            self._current["padded_tokens"] += input_ids.numel()
+            self._current["tokens"] += int(attention_mask.sum()) if attention_mask is not None else input_ids.numel()
+    
+    def _after_forward(self, module, args, kwargs, output):
+        if not module.training or self._forward_start is None:
+            return
+        self._forward_end = time.perf_counter()
+        self._current["forward"] += self._forward_end - self._forward_start
+        self._forward_start = None
+    
+    # ---------------- Eventos do Trainer ----------------
+    
+    def on_train_begin(self, args, state, control, model=None, **kwargs):
+        self._hooks = [
+            model.register_forward_pre_hook(self._before_forward, with_kwargs=True),
+            model.register_forward_hook(self._after_forward, with_kwargs=True),
+        ]
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        self._mark = time.perf_counter()
+    
+    def on_step_begin(self, args, state, control, **kwargs):
+        now = time.perf_counter()
+        self._reset_step()
+        self._current["data"] = now - self._mark
+        self._step_start = now
+        
+        if self.window and state.global_step == self.window[0] and self._profiler is None:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._profiler = torch.profiler.profile(activities=activities, record_shapes=True, profile_memory=True)
+            self._profiler.start()
+    
+    def on_pre_optimizer_step(self, args, state, control, model=None, optimizer=None, **kwargs):
+        now = time.perf_counter()
+        if self._forward_end is not None:
+            self._current["backward"] += now - self._forward_end
+            self._forward_end = None
+        self._optimizer_start = now
+        
+        # Pesos + gradientes + estado do otimizador (constante após o 1º passo)
+        if self._tensor_memory is None and model is not None:
+            parameters = list(model.parameters())
+            self._tensor_memory = {
+                "parameters_mb": tensors_mb(parameters),
+                "gradients_mb": tensors_mb(p.grad for p in parameters),
+                "optimizer_state_mb": None,
+            }
+            self._optimizer = optimizer
+    
+    def on_step_end(self, args, state, control, **kwargs):
+        now = time.perf_counter()
+        self._current["optimizer"] = now - self._optimizer_start
+        self._current["step"] = state.global_step
+        self._current["wall"] = self._current["data"] + now - self._step_start
+        self._current["rss_mb"] = peak_rss_mb()
+        if torch.cuda.is_available():
+            self._current["cuda_peak_mb"] = torch.cuda.max_memory_allocated() / 1024 ** 2
+        self.steps.append(self._current)
+        
+        # O estado do otimizador (ex.: momentos do AdamW) só existe após o 1º step
+        if self._tensor_memory is not None and self._tensor_memory["optimizer_state_mb"] is None:
+            state_tensors = []
+            for param_state in getattr(self._optimizer, "state", {}).values():
+                state_tensors.extend(param_state.values())
+            self._tensor_memory["optimizer_state_mb"] = tensors_mb(state_tensors)
+        
+        if self._profiler is not None and self._profiler_table is None and state.global_step >= self.window[1]:
+            self._stop_profiler()
+        
+        self._reset_step()
+        self._mark = time.perf_counter()
+    
+    def _idle(self, *args, **kwargs):
+        # Log, avaliação e checkpoint não contam como espera por dados
+        self._mark = time.perf_counter()
+    
+    on_log = on_evaluate = on_save = _idle
+    
+    def _stop_profiler(self):
+        self._profiler.stop()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._profiler.export_chrome_trace(os.path.join(self.output_dir, "trace.json"))
+        sort_by = "cuda_time_total" if torch.cuda.is_available() else "cpu_time_total"
+        self._profiler_table = self._profiler.key_averages().table(sort_by=sort_by, row_limit=25)
+    
+    def on_train_end(self, args, state, control, **kwargs):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        if self._profiler is not None and self._profiler_table is None:
+            self._stop_profiler()
+        path = self.write_report()
+        self.print_summary()
+        print(f"   Relatorio de desempenho: {path}")
+    
+    # ---------------- Relatório ----------------
+    
+    def summary(self):
+        """Tempos por fase (após o aquecimento), vazão e memória"""
+        steps = self.steps[self.skip_first:] or self.steps
+        wall = sum(step["wall"] for step in steps)
+        tokens = sum(step["tokens"] for step in steps)
+        padded = sum(step["padded_tokens"] for step in steps)
+        return {
+            "steps": len(steps),
+            "seconds_per_step": _summary([step["wall"] for step in steps]),
+            "phases": {phase: _summary([step[phase] for step in steps]) for phase in self.PHASES},
+            "phase_fraction": {
+                phase: sum(step[phase] for step in steps) / wall if wall else 0.0
+                for phase in self.PHASES
+            },
+            "tokens_per_second": tokens / wall if wall else 0.0,
+            "padded_tokens_per_second": padded / wall if wall else 0.0,
+            "padding_fraction": 1 - tokens / padded if padded else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            "cuda_peak_mb": torch.cuda.max_memory_allocated() / 1024 ** 2 if torch.cuda.is_available() else None,
+            "tensor_memory": self._tensor_memory,
+        }
+    
+    def write_report(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, "training_profile.json")
+        report = {
+            "summary": self.summary(),
+            "steps": self.steps,
+            "torch_profiler": {
+                "window": list(self.window) if self.window else None,
+                "trace": os.path.join(self.output_dir, "trace.json") if self._profiler_table else None,
+                "top_operations": self._profiler_table,
+            },
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+    
+    def print_summary(self):
+        summary = self.summary()
+        if not summary["steps"]:
+            return
+        print("\n   Desempenho por passo (media):")
+        for phase in self.PHASES:
+            print(f"   - {phase:10} {summary['phases'][phase]['mean'] * 1000:9.1f} ms ({summary['phase_fraction'][phase]:.0%})")
+        print(f"   - tokens/s   {summary['tokens_per_second']:9.1f} (com padding: {summary['padded_tokens_per_second']:.1f})")
+        if summary["peak_rss_mb"] is not None:
+            print(f"   - pico RSS   {summary['peak_rss_mb']:9.1f} MB")
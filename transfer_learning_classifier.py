@@ -0,0 +1,464 @@
+"""
+Classificador Transfer Learning (TinyLlama ajustado com train_transfer_learning.py)
+"""
+import copy
+import inspect
+import os
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForCausalLM
+
+from instrumentation import metrics, profiled
+from prompt_format import ANSWER_TAG, LABELS, MAX_LENGTH, build_prompt, combine_probability
+from simple_classifier import ToxicityClassifier
+
+MODEL_PATH = "models/toxicity_transfer_learning"
+# Cópia do modelo com as camadas lineares em int8, gravada na pasta do modelo
+QUANTIZED_FILE = "model_int8.pt"
+# Pesos float32 gravados para leitura via mmap, compartilhados entre processos
+SHARED_FILE = "model_mmap.pt"
+
+def _is_fresh(model_path, cache_path):
+    """O arquivo derivado existe e é mais novo que os pesos originais?"""
+    if not os.path.exists(cache_path):
+        return False
+    weights = [
+        os.path.join(model_path, name) for name in os.listdir(model_path)
+        if name.endswith((".safetensors", ".bin"))
+    ]
+    newest = max((os.path.getmtime(path) for path in weights), default=0)
+    return os.path.getmtime(cache_path) >= newest
+
+def load_quantized_model(model_path=MODEL_PATH):
+    """
+    Carrega o modelo para CPU com quantização dinâmica int8 das camadas lineares
+    
+    Na primeira vez o modelo float32 é quantizado e gravado em
+    QUANTIZED_FILE, na pasta do modelo; nas seguintes, a cópia quantizada é
+    lida direto (é refeita se os pesos originais forem mais novos).
+    """
+    cache_path = os.path.join(model_path, QUANTIZED_FILE)
+    if _is_fresh(model_path, cache_path):
+        # Arquivo gerado localmente por esta função (objeto completo, não só pesos)
+        model = torch.load(cache_path, map_location="cpu", weights_only=False)
+    else:
+        from torch.ao.quantization import quantize_dynamic
+        
+        model = AutoModelForCausalLM.from_pretrained(
+            model_path, trust_remote_code=True, torch_dtype=torch.float32
+        )
+        model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        try:
+            torch.save(model, cache_path)
+        except OSError as e:
+            print(f"[AVISO] Nao foi possivel gravar {cache_path}: {e}")
+    
+    model.eval()
+    return model
+
+def prepare_shared_weights(model_path=MODEL_PATH):
+    """
+    Grava (se necessário) os pesos em SHARED_FILE para load_shared_model
+    
+    Deve ser chamada uma vez antes de iniciar os processos, para que eles
+    não convertam o modelo ao mesmo tempo.
+    """
+    cache_path = os.path.join(model_path, SHARED_FILE)
+    if _is_fresh(model_path, cache_path):
+        return cache_path
+    
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path, trust_remote_code=True, torch_dtype=torch.float32
+    )
+    state_dict = model.state_dict()
+    # Buffers não persistentes (ex.: frequências do RoPE) também são necessários
+    buffers = {name: buffer for name, buffer in model.named_buffers() if name not in state_dict}
+    
+    temp_path = cache_path + ".tmp"
+    torch.save({"state_dict": state_dict, "buffers": buffers}, temp_path)
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+def load_shared_model(model_path=MODEL_PATH):
+    """
+    Carrega o modelo para CPU com os pesos mapeados em memória (somente leitura)
+    
+    O esqueleto do modelo é criado no device "meta" (sem alocar pesos) e
+    recebe diretamente os tensores de torch.load(mmap=True). Vários processos
+    que carregam o mesmo arquivo compartilham as páginas do cache do sistema
+    operacional, em vez de cada um manter sua própria cópia.
+    """
+    cache_path = prepare_shared_weights(model_path)
+    config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+    with torch.device("meta"):
+        model = AutoModelForCausalLM.from_config(config, trust_remote_code=True)
+    
+    saved = torch.load(cache_path, map_location="cpu", mmap=True, weights_only=True)
+    model.load_state_dict(saved["state_dict"], assign=True)
+    for name, buffer in saved["buffers"].items():
+        module_name, _, buffer_name = name.rpartition(".")
+        model.get_submodule(module_name)._buffers[buffer_name] = buffer
+    
+    model.eval()
+    return model
+
+class TransferLearningClassifier:
+    def __init__(self, model_path=MODEL_PATH, mode="score", fast_classifier=None, prefix_cache=True,
+                 quantize=False, shared_weights=False):
+        """
+        Args:
+            model_path (str): Pasta do modelo treinado
+            mode (str): "score" compara, em uma única passada do modelo, a
+                probabilidade das respostas TOXICA e NAO_TOXICA (determinístico);
+                "generate" gera a resposta com amostragem (comportamento antigo)
+            fast_classifier (ToxicityClassifier): Classificador simples a
+                reutilizar como base (padrão: cria um na inicialização)
+            prefix_cache (bool): Pré-calcula uma vez o KV cache do início fixo
+                do prompt (system + "Classifique:") e o reutiliza em todas as
+                chamadas, codificando só a mensagem e a marca de resposta
+            quantize (bool): Em CPU, usa o modelo com camadas lineares em
+                int8 (cerca de 4x menos memória e inferência mais rápida)
+            shared_weights (bool): Em CPU, lê os pesos via mmap (ver
+                load_shared_model), compartilhando-os entre processos; não
+                combina com quantize
+        """
+        if mode not in ("score", "generate"):
+            raise ValueError(f"Modo desconhecido: {mode} (use 'score' ou 'generate')")
+        if quantize and shared_weights:
+            # O modelo int8 é criado em memória a cada carga: não há pesos a mapear
+            raise ValueError("quantize e shared_weights nao podem ser usados juntos")
+        self.model_path = model_path
+        self.mode = mode
+        self.simple = fast_classifier if fast_classifier is not None else ToxicityClassifier()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+        # Quantização dinâmica int8 só existe para CPU
+        self.quantized = quantize and not torch.cuda.is_available()
+        if self.quantized:
+            self.model = load_quantized_model(model_path)
+        elif shared_weights and not torch.cuda.is_available():
+            self.model = load_shared_model(model_path)
+        else:
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_path,
+                trust_remote_code=True,
+                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+                device_map="auto" if torch.cuda.is_available() else None
+            )
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        
+        self._prepare_scoring()
+        self._prefix_ids = []
+        self._prefix_cache = None
+        if prefix_cache:
+            self._prepare_prefix_cache()
+    
+    def _prepare_scoring(self):
+        """Pré-calcula os tokens das respostas e do final do prompt"""
+        reference = self.tokenizer(build_prompt("x"))["input_ids"]
+        self._label_ids = {}
+        for label in LABELS:
+            full = self.tokenizer(build_prompt("x") + label)["input_ids"]
+            if full[:len(reference)] != reference:
+                raise ValueError(f"Tokenização instável na fronteira da resposta {label}")
+            self._label_ids[label] = full[len(reference):]
+        
+        # Tokens finais ("</s><|assistant|>") preservados ao truncar mensagens longas
+        tail = self.tokenizer(ANSWER_TAG, add_special_tokens=False)["input_ids"]
+        self._tail_length = len(tail)
+        
+        self._pad_id = self.tokenizer.pad_token_id
+        if self._pad_id is None:
+            self._pad_id = self.tokenizer.eos_token_id
+        
+        # Calcular logits só das últimas posições, se o modelo suportar
+        parameters = inspect.signature(self.model.forward).parameters
+        self._keep_logits_arg = next(
+            (name for name in ("logits_to_keep", "num_logits_to_keep") if name in parameters),
+            None
+        )
+    
+    def _prepare_prefix_cache(self):
+        """Calcula o KV cache do trecho inicial comum a todos os prompts"""
+        # Prefixo = tokens comuns a dois prompts quaisquer (termina em "Classifique:")
+        first = self.tokenizer(build_prompt("a"))["input_ids"]
+        second = self.tokenizer(build_prompt("0 b"))["input_ids"]
+        length = 0
+        while length < min(len(first), len(second)) and first[length] == second[length]:
+            length += 1
+        # O último token do prefixo pode se fundir com o texto; deixá-lo de fora
+        length -= 1
+        if length <= 0:
+            return
+        
+        prefix_ids = first[:length]
+        input_ids = torch.tensor([prefix_ids], dtype=torch.long, device=self.model.device)
+        with torch.no_grad():
+            outputs = self.model(input_ids=input_ids, use_cache=True)
+        if outputs.past_key_values is None:
+            return
+        self._prefix_ids = prefix_ids
+        self._prefix_cache = outputs.past_key_values
+    
+    def _expand_prefix_cache(self, batch_size):
+        """Cópia do KV cache do prefixo repetida para o lote"""
+        if isinstance(self._prefix_cache, tuple):
+            # Formato antigo (tupla de (key, value) por camada)
+            return tuple(
+                tuple(tensor.expand(batch_size, *tensor.shape[1:]) for tensor in layer)
+                for layer in self._prefix_cache
+            )
+        # O modelo acrescenta as novas posições ao cache: trabalhar numa cópia
+        cache = copy.deepcopy(self._prefix_cache)
+        cache.batch_repeat_interleave(batch_size)
+        return cache
+    
+    def _prompt_ids(self, text):
+        """Tokeniza o prompt, truncando a mensagem (e não a marca de resposta)"""
+        ids = self.tokenizer(build_prompt(text))["input_ids"]
+        max_prompt = MAX_LENGTH - max(len(v) for v in self._label_ids.values())
+        if len(ids) > max_prompt:
+            ids = ids[:max_prompt - self._tail_length] + ids[-self._tail_length:]
+        return ids
+    
+    def _continuation_logprobs(self, sequences, continuation_lengths):
+        """
+        Soma dos log-probs dos últimos tokens de cada sequência
+        
+        Todas as sequências são avaliadas numa única chamada ao modelo,
+        com padding à esquerda e position_ids corrigidos. Se todas começam
+        pelo prefixo fixo do prompt, só o restante é enviado ao modelo, que
+        reaproveita o KV cache pré-calculado do prefixo.
+        
+        Args:
+            sequences (list): Listas de ids (prompt + continuação)
+            continuation_lengths (list): Nº de tokens de continuação de cada uma
+        
+        Returns:
+            torch.Tensor: Log-prob total da continuação de cada sequência
+        """
+        keep = max(continuation_lengths) + 1
+        prefix_length = len(self._prefix_ids)
+        use_prefix = self._prefix_cache is not None and all(
+            len(seq) >= prefix_length + keep and seq[:prefix_length] == self._prefix_ids
+            for seq in sequences
+        )
+        if use_prefix:
+            sequences = [seq[prefix_length:] for seq in sequences]
+        else:
+            prefix_length = 0
+        
+        max_len = max(len(seq) for seq in sequences)
+        input_ids = torch.full((len(sequences), max_len), self._pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), max_len), dtype=torch.long)
+        for row, seq in enumerate(sequences):
+            input_ids[row, max_len - len(seq):] = torch.tensor(seq, dtype=torch.long)
+            attention_mask[row, max_len - len(seq):] = 1
+        
+        # Com o prefixo em cache: [prefixo][padding][resto do prompt]
+        attention_mask = torch.cat(
+            [torch.ones((len(sequences), prefix_length), dtype=torch.long), attention_mask], dim=1
+        )
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)[:, prefix_length:]
+        
+        device = self.model.device
+        inputs = {
+            "input_ids": input_ids.to(device),
+            "attention_mask": attention_mask.to(device),
+            "position_ids": position_ids.to(device),
+        }
+        if use_prefix:
+            inputs["past_key_values"] = self._expand_prefix_cache(len(sequences))
+            inputs["use_cache"] = True
+        else:
+            inputs["use_cache"] = False
+        if self._keep_logits_arg:
+            inputs[self._keep_logits_arg] = keep
+        
+        with metrics.timer("tl_stage_seconds", stage="forward", backend="torch"), torch.no_grad():
+            logits = self.model(**inputs).logits[:, -keep:]
+        
+        with metrics.timer("tl_stage_seconds", stage="decode", backend="torch"):
+            # logits[t] prevê o token t+1: alinhar com os tokens de continuação
+            logprobs = torch.log_softmax(logits[:, :-1].float(), dim=-1)
+            targets = input_ids[:, -(keep - 1):].to(logprobs.device)
+            token_logprobs = logprobs.gather(-1, targets.unsqueeze(-1)).squeeze(-1)
+            
+            totals = []
+            for row, length in enumerate(continuation_lengths):
+                totals.append(token_logprobs[row, -length:].sum())
+            return torch.stack(totals)
+    
+    def toxic_probability(self, text):
+        """
+        Probabilidade de a resposta do modelo ser TOXICA (e não NAO_TOXICA)
+        
+        Uma única chamada ao modelo avalia as duas continuações possíveis.
+        """
+        return self.toxic_probabilities([text])[0]
+    
+    def toxic_probabilities(self, texts, batch_size=32):
+        """
+        Probabilidade TOXICA de vários textos, em lotes
+        
+        Os textos são ordenados pelo tamanho em tokens e agrupados em lotes
+        de tamanho parecido para desperdiçar pouco padding; cada lote é uma
+        única chamada ao modelo. O resultado volta na ordem de entrada.
+        
+        Args:
+            texts (list): Textos a serem avaliados
+            batch_size (int): Textos por chamada ao modelo
+        
+        Returns:
+            list: Probabilidade TOXICA (float) de cada texto
+        """
+        with metrics.timer("tl_stage_seconds", stage="tokenize", backend="torch"):
+            prompts = [self._prompt_ids(text) for text in texts]
+        order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+        lengths = [len(self._label_ids[label]) for label in LABELS]
+        
+        probabilities = [0.0] * len(prompts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            sequences = [
+                prompts[i] + self._label_ids[label] for i in batch for label in LABELS
+            ]
+            scores = self._continuation_logprobs(sequences, lengths * len(batch))
+            if metrics.enabled:
+                metrics.inc("tl_texts_total", len(batch), backend="torch")
+                metrics.inc("tl_batches_total", backend="torch")
+            scores = scores.view(len(batch), len(LABELS))
+            for i, probability in zip(batch, torch.softmax(scores, dim=-1)[:, 0].tolist()):
+                probabilities[i] = probability
+        return probabilities
+    
+    @profiled
+    def classify_batch(self, texts, batch_size=32, simple_results=None):
+        """
+        Classifica vários textos (modo score: um lote por chamada ao modelo)
+        
+        Args:
+            texts (list): Textos a serem classificados
+            batch_size (int): Textos por chamada ao modelo
+            simple_results (list): Resultados do classificador simples, se já
+                calculados
+        
+        Returns:
+            list: Um dict por texto, na ordem de entrada (mesmo formato de classify)
+        """
+        texts = list(texts)
+        if simple_results is None:
+            simple_results = [self.simple.classify(text) for text in texts]
+        
+        if self.mode != "score":
+            return [
+                self.classify(text, simple_result)
+                for text, simple_result in zip(texts, simple_results)
+            ]
+        
+        try:
+            probabilities = self.toxic_probabilities(texts, batch_size)
+        except Exception as e:
+            # Em caso de erro, usar classificador simples (registrando o motivo)
+            metrics.record_fallback("transfer_learning", e)
+            return simple_results
+        
+        return [
+            self._combine_probability(simple_result, probability)
+            for simple_result, probability in zip(simple_results, probabilities)
+        ]
+    
+    @profiled
+    def classify(self, text, simple_result=None):
+        """
+        Classificador híbrido: Combina TL com classificador simples
+        para melhor precisão e robustez
+        
+        Args:
+            text (str): Texto a ser classificado
+            simple_result (dict): Resultado do classificador simples, se já
+                calculado (ex.: pela cascata), para não repetir a análise
+        """
+        # Sempre usar classificador simples como base
+        if simple_result is None:
+            simple_result = self.simple.classify(text)
+        
+        try:
+            if self.mode == "score":
+                return self._combine_probability(simple_result, self.toxic_probability(text))
+            
+            # Tentar com modelo TL para refinamento
+            prompt = build_prompt(text)
+            
+            with metrics.timer("tl_stage_seconds", stage="tokenize", backend="torch"):
+                inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=256)
+            
+            if self.device == "cuda":
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            
+            with metrics.timer("tl_stage_seconds", stage="generate", backend="torch"), torch.no_grad():
+                outputs = self.model.generate(
+                    **inputs,
+                    max_new_tokens=20,
+                    do_sample=True,
+                    temperature=0.7,
+                    top_p=0.9,
+                    pad_token_id=self.tokenizer.eos_token_id
+                )
+            
+            # Decodificar apenas a resposta gerada
+            input_length = inputs['input_ids'].shape[1]
+            generated_ids = outputs[0][input_length:]
+            with metrics.timer("tl_stage_seconds", stage="decode", backend="torch"):
+                response = self.tokenizer.decode(generated_ids, skip_special_tokens=True).strip()
+            
+            # Extrair classificação da resposta (múltiplas estratégias)
+            response_upper = response.upper()
+            response_clean = response_upper.replace("_", " ").replace("-", " ")
+            
+            # Estratégia 1: Buscar palavras-chave diretas
+            is_toxic_in_response = (
+                "TOXICA" in response_clean or 
+                "TÓXICA" in response_clean or
+                "TOXIC" in response_clean
+            )
+            
+            is_safe_in_response = (
+                "NAO TOXICA" in response_clean or
+                "NÃO TOXICA" in response_clean or
+                "NAO TÓXICA" in response_clean or
+                "NÃO TÓXICA" in response_clean or
+                "SEGURA" in response_clean or
+                "NORMAL" in response_clean
+            )
+            
+            # Estratégia 2: Combinar TL com classificador simples
+            if is_safe_in_response:
+                # TL diz que é segura
+                if simple_result['label'] == "TÓXICA":
+                    # Classificador simples discorda - usar simples (mais conservador)
+                    label = "TÓXICA"
+                    confidence = simple_result['confidence'] * 0.95
+                else:
+                    # Ambos concordam - seguro
+                    label = "NÃO TÓXICA"
+                    confidence = 0.93
+            
+            elif is_toxic_in_response:
+                # TL diz que é tóxica
+                label = "TÓXICA"
+                confidence = 0.94
+            
+            else:
+                # Resposta ambígua ou modelo não treinado - usar classificador simples
+                label = simple_result['label']
+                confidence = simple_result['confidence'] * 0.95
+            
+            return {"label": label, "confidence": confidence, "categories": simple_result.get('categories', [])}
+            
+        except Exception as e:
+            # Em caso de erro, usar classificador simples (registrando o motivo)
+            metrics.record_fallback("transfer_learning", e)
+            return simple_result
+    
+    def _combine_probability(self, simple_result, toxic_probability):
+        """Combina a probabilidade do modelo com o classificador simples"""
+        return combine_probability(simple_result, toxic_probability)
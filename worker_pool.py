@@ -0,0 +1,135 @@
+"""
+Pool de processos para o modelo Transfer Learning com pesos compartilhados
+
+Cada processo carrega o modelo com load_shared_model: os pesos vêm de um
+único arquivo mapeado em memória (somente leitura), então a RAM usada pelos
+pesos não cresce com o número de processos. Cada processo recebe sua
+própria cota de threads (torch/OpenMP) para que juntos não disputem os
+núcleos.
+
+Exemplo:
+    pool = ModelWorkerPool(workers=4)          # 4 processos x (núcleos / 4) threads
+    results = pool.classify_batch(mensagens)   # distribuído entre os processos
+    pool.close()
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+_worker_model = None
+
+def _init_worker(model_path, threads, options):
+    """Limita as threads e carrega o modelo (pesos via mmap) no processo"""
+    global _worker_model
+    # Antes de importar torch, para valer também para o OpenMP/MKL
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    
+    from transfer_learning_classifier import TransferLearningClassifier
+    _worker_model = TransferLearningClassifier(model_path, shared_weights=True, **options)
+
+def _classify_batch(texts, batch_size, simple_results):
+    return _worker_model.classify_batch(texts, batch_size=batch_size, simple_results=simple_results)
+
+def _toxic_probabilities(texts, batch_size):
+    return _worker_model.toxic_probabilities(texts, batch_size)
+
+class ModelWorkerPool:
+    """
+    Distribui a classificação entre processos que compartilham os pesos
+    
+    Tem a mesma interface de TransferLearningClassifier para lotes
+    (classify, classify_batch, toxic_probabilities), podendo ser usado no
+    lugar dele pela cascata e pelo serviço de classificação.
+    """
+    
+    def __init__(self, model_path=None, workers=None, threads_per_worker=None, min_chunk=8,
+                 fast_classifier=None, **options):
+        """
+        Args:
+            model_path (str): Pasta do modelo treinado
+            workers (int): Número de processos (padrão: núcleos / 2)
+            threads_per_worker (int): Threads de cada processo
+                (padrão: núcleos / workers)
+            min_chunk (int): Menor número de textos enviado a um processo
+            fast_classifier (ToxicityClassifier): Classificador simples usado
+                quando os resultados dele não são informados
+            **options: Argumentos extras de TransferLearningClassifier
+                (exceto quantize: cada processo teria sua própria cópia int8)
+        """
+        if options.get("quantize"):
+            raise ValueError(
+                "quantize nao e suportado no pool de processos: o modelo int8 nao e "
+                "compartilhado via mmap (use 1 processo ou o modelo sem quantizacao)"
+            )
+        from transfer_learning_classifier import MODEL_PATH, prepare_shared_weights
+        from simple_classifier import ToxicityClassifier
+        
+        cores = os.cpu_count() or 1
+        self.model_path = model_path or MODEL_PATH
+        self.workers = workers or max(1, cores // 2)
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+        self.min_chunk = min_chunk
+        self.simple = fast_classifier if fast_classifier is not None else ToxicityClassifier()
+        
+        # Gravar o arquivo de pesos uma única vez, antes de iniciar os processos
+        prepare_shared_weights(self.model_path)
+        
+        # "spawn": processos novos, sem herdar o estado do torch/OpenMP do pai
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_path, self.threads_per_worker, options)
+        )
+    
+    def _chunks(self, count):
+        """Divide count itens em até um bloco por processo"""
+        size = max(self.min_chunk, -(-count // self.workers))
+        return [(start, min(start + size, count)) for start in range(0, count, size)]
+    
+    def warmup(self):
+        """Inicia todos os processos e espera o modelo carregar em cada um"""
+        futures = [self.executor.submit(_toxic_probabilities, ["ok"], 1) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+    
+    def toxic_probabilities(self, texts, batch_size=32):
+        """Probabilidade TOXICA de cada texto, calculada em paralelo"""
+        texts = list(texts)
+        futures = [
+            self.executor.submit(_toxic_probabilities, texts[start:end], batch_size)
+            for start, end in self._chunks(len(texts))
+        ]
+        return [probability for future in futures for probability in future.result()]
+    
+    def toxic_probability(self, text):
+        return self.toxic_probabilities([text])[0]
+    
+    def classify_batch(self, texts, batch_size=32, simple_results=None):
+        """Classifica vários textos em paralelo; resultados na ordem de entrada"""
+        texts = list(texts)
+        if simple_results is None:
+            simple_results = [self.simple.classify(text) for text in texts]
+        futures = [
+            self.executor.submit(_classify_batch, texts[start:end], batch_size, simple_results[start:end])
+            for start, end in self._chunks(len(texts))
+        ]
+        return [result for future in futures for result in future.result()]
+    
+    def classify(self, text, simple_result=None):
+        simple_results = None if simple_result is None else [simple_result]
+        return self.classify_batch([text], simple_results=simple_results)[0]
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()